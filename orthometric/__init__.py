@@ -1,6 +1,6 @@
 import bpy
 import math
-from . import ui, stage_one, stage_two, stage_three
+from . import ui, stage_one, stage_two, stage_three, backgrounds, calib_cache, characters, drivers, images, importers, loader, manifest, profiler, registry, residency, sequence, server, switcher, thumbnails
 
 bl_info = {
     "name": "SS Vantage Suite",
@@ -14,56 +14,70 @@ bl_info = {
 
 # ... cam update funcs ...
 
+@profiler.timed
 def update_front_cam_pos(self, context):
     # updates front cam y pos
-    cam_obj = bpy.data.objects.get("Ortho_Cam_Front")
+    if self.use_drivers: return # the rig drives itself
+    cam_obj = registry.primary_obj(self, 'FRONT', 'cam')
     if cam_obj:
         base_dist = 2.0
         ratio = self.focal_length_front / 50.0
         target_y = ratio * (base_dist + self.front_cam_y)
         cam_obj.location.y = target_y
 
+@profiler.timed
 def update_front_cam(self, context):
     # updates front lens and forces y update
-    cam = bpy.data.cameras.get("Ortho_Cam_Front")
-    if cam:
-        cam.lens = self.focal_length_front
+    if self.use_drivers: return
+    cam_obj = registry.primary_obj(self, 'FRONT', 'cam')
+    if cam_obj:
+        cam_obj.data.lens = self.focal_length_front
     update_front_cam_pos(self, context)
 
+@profiler.timed
 def update_side_cam_pos(self, context):
     # updates side cam x pos based on fl/offset
-    cam_obj = bpy.data.objects.get("Ortho_Cam_Side")
+    if self.use_drivers: return
+    cam_obj = registry.primary_obj(self, 'SIDE', 'cam')
     if cam_obj:
         base_dist = 2.0
         ratio = self.focal_length_side / 50.0
         target_x = ratio * (base_dist + self.side_cam_x)
         cam_obj.location.x = target_x
 
+@profiler.timed
 def update_side_cam(self, context):
     # updates side lens and forces x update
-    cam = bpy.data.cameras.get("Ortho_Cam_Side")
-    if cam:
-        cam.lens = self.focal_length_side
+    if self.use_drivers: return
+    cam_obj = registry.primary_obj(self, 'SIDE', 'cam')
+    if cam_obj:
+        cam_obj.data.lens = self.focal_length_side
     update_side_cam_pos(self, context)
 
+@profiler.timed
 def update_stage_3_master(self, context):
     # rotates master controller via sliders
     if self.stage != 'STAGE_3_SETUP': return
     
     try:
         item = self.custom_views[self.active_view_index]
-        master = bpy.data.objects.get(item.obj_name_master)
-        if master:
+        master = item.obj_master
+        if master and not self.use_drivers:
             # x: -90 to 90, z: -180 to 180
             master.rotation_euler.x = math.radians(self.stage_3_rot_x)
             master.rotation_euler.z = math.radians(self.stage_3_rot_z)
+        # turntables show the frame shot from this angle
+        if item.view_type == 'SEQUENCE':
+            sequence.show_angle(self, item, self.stage_3_rot_z)
     except:
         pass
 
+@profiler.timed
 def update_item_cam_settings(self, context):
     # update func for orthoviewitem
     # updates lens and dist without dolly zoom formula
-    cam_obj = bpy.data.objects.get(self.obj_name_cam)
+    if self.id_data.orthometric.use_drivers: return # driven: no callback work, no forced view layer update
+    cam_obj = self.obj_cam
     if cam_obj:
         # 1. update lens
         if cam_obj.data:
@@ -82,56 +96,121 @@ def update_item_cam_settings(self, context):
         if context: 
             context.view_layer.update()
 
-def hide_hierarchy(obj, visible):
-    if obj:
-        obj.hide_viewport = not visible
-        for child in obj.children:
-            hide_hierarchy(child, visible)
+@profiler.timed
+def update_use_drivers(self, context):
+    # swap between drivers and the update callbacks above
+    scene = self.id_data
+    item = registry.active(self)
+    if self.use_drivers:
+        drivers.apply(scene)
+        if item and self.stage == 'STAGE_3_SETUP':
+            drivers.drive_master(scene, item)
+    else:
+        drivers.clear(scene)
+        drivers.release_master(self, item)
+        # write the values the drivers held through the callbacks, one view layer update for all
+        update_front_cam(self, context)
+        update_side_cam(self, context)
+        for view in self.custom_views:
+            if view.view_type not in ('FRONT', 'SIDE'):
+                update_item_cam_settings(view, None)
+        context.view_layer.update()
+
+@profiler.timed
+def update_image_display(self, context):
+    backgrounds.apply(self.id_data)
+
+@profiler.timed
+def update_active_character(self, context):
+    if 0 <= self.active_character_index < len(self.characters):
+        characters.activate(context, self.characters[self.active_character_index])
 
+@profiler.timed
+def update_sequence_frame(self, context):
+    # update func for orthoviewitem, frame mapping changed
+    # the view's own master angle, the stage 3 slider only follows the active view
+    props = context.scene.orthometric
+    master = self.obj_master
+    angle = math.degrees(master.rotation_euler.z) if master else props.stage_3_rot_z
+    sequence.show_angle(props, self, angle)
+
+@profiler.timed
 def update_view_visibility(self, context):
 
-    if not self.custom_views:
+    props = context.scene.orthometric
+    item = registry.active(props)
+    if item is None:
         return
 
-    # Loop through all views in list
-    for idx, item in enumerate(self.custom_views):
-        # is_selected?
-        is_active = (idx == self.active_view_index)
-        
-        # Find the master of selected
-        master = bpy.data.objects.get(item.obj_name_master)
-        
-        if master:
-            hide_hierarchy(master, is_active)
-    props = context.scene.orthometric
-    item = props.custom_views[props.active_view_index]
+    # only the old and the new view collection change, not every rig
+    registry.show_view(context.scene, item)
 
-    cam = bpy.data.objects.get(item.obj_name_cam)
-    if cam:
+    # pixels follow the active view, hidden ones past the recent few are freed
+    residency.activate(props, item)
+
+    cam = item.obj_cam
+    if cam and context.scene.camera != cam:
         context.scene.camera = cam
         
-    for area in context.screen.areas:
-        if area.type == 'VIEW_3D':
-            area.spaces[0].region_3d.view_perspective = 'CAMERA'
+    stage_one.camera_viewports(context)
 
 # Property Group
 
+class LandmarkResidual(bpy.types.PropertyGroup):
+    # per landmark error left after the last calibration (name = anchor key)
+    error: bpy.props.FloatProperty(name="Error", subtype='DISTANCE')
+
+class ViewLandmark(bpy.types.PropertyGroup):
+    # landmark marked on a view's photo (name = anchor key), image local coords
+    co: bpy.props.FloatVectorProperty(size=2)
+
+class SequenceFrame(bpy.types.PropertyGroup):
+    # one image of a turntable view
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH')
+
 class OrthoViewItem(bpy.types.PropertyGroup):
     # stores data for each custom view
     name: bpy.props.StringProperty(name="View Name", default="New View")
     
     # diff between kind of item in template list
     view_type: bpy.props.EnumProperty(
-            items=[('CUSTOM', "Custom", ""), ('FRONT', "Front", ""), ('SIDE', "Side", "")],
+            items=[('CUSTOM', "Custom", ""), ('FRONT', "Front", ""), ('SIDE', "Side", ""), ('SEQUENCE', "Turntable", "")],
             default='CUSTOM'
         )
 
     # obj refs
+    obj_master: bpy.props.PointerProperty(type=bpy.types.Object)
+    obj_minor: bpy.props.PointerProperty(type=bpy.types.Object)
+    obj_cam: bpy.props.PointerProperty(type=bpy.types.Object)
+    obj_img: bpy.props.PointerProperty(type=bpy.types.Object)
+    collection: bpy.props.PointerProperty(type=bpy.types.Collection) # holds the whole rig
+    character: bpy.props.IntProperty(default=0) # uid of the character the view belongs to
+
+    # legacy obj names, only read to fill the pointers when an older file loads
     obj_name_master: bpy.props.StringProperty()
     obj_name_minor: bpy.props.StringProperty()
     obj_name_cam: bpy.props.StringProperty()
     obj_name_img: bpy.props.StringProperty()
 
+    # landmarks placed during the last calibration, used by solve all
+    landmarks: bpy.props.CollectionProperty(type=ViewLandmark)
+
+    # turntable frames, evenly spread over 360 degrees of z rotation
+    frames: bpy.props.CollectionProperty(type=SequenceFrame)
+    seq_start_angle: bpy.props.FloatProperty(
+        name="First Frame Angle",
+        description="Z rotation the first frame was shot from",
+        default=0.0, min=-180, max=180,
+        update=update_sequence_frame
+    )
+    seq_reverse: bpy.props.BoolProperty(
+        name="Reverse",
+        description="Frames turn clockwise",
+        default=False,
+        update=update_sequence_frame
+    )
+    seq_frame: bpy.props.IntProperty(name="Frame")
+
     # per-view settings
     fov: bpy.props.FloatProperty(
         name="Focal Length", 
@@ -144,6 +223,23 @@ class OrthoViewItem(bpy.types.PropertyGroup):
         update=update_item_cam_settings
     )
 
+class OrthoCharacter(bpy.types.PropertyGroup):
+    # one character of a lineup (name = display name)
+    uid: bpy.props.IntProperty()
+    namespace: bpy.props.StringProperty() # object name prefix, "" for the first character
+    collection: bpy.props.PointerProperty(type=bpy.types.Collection) # its view collections + assets
+    assets: bpy.props.PointerProperty(type=bpy.types.Collection) # its own OM_Assets (cage + anchors)
+
+    # scene settings of the character, held here while another character is active
+    has_front: bpy.props.BoolProperty(default=False)
+    has_side: bpy.props.BoolProperty(default=False)
+    active_view_index: bpy.props.IntProperty(default=0)
+    shown_collection: bpy.props.PointerProperty(type=bpy.types.Collection)
+    focal_length_front: bpy.props.FloatProperty(default=50.0)
+    front_cam_y: bpy.props.FloatProperty(default=0.0)
+    focal_length_side: bpy.props.FloatProperty(default=50.0)
+    side_cam_x: bpy.props.FloatProperty(default=0.0)
+
 class OrthoMetricProperties(bpy.types.PropertyGroup):
     stage: bpy.props.EnumProperty(
         items=[
@@ -163,6 +259,92 @@ class OrthoMetricProperties(bpy.types.PropertyGroup):
     has_side: bpy.props.BoolProperty(default=False)
     
     is_centering: bpy.props.BoolProperty(default=False)
+
+    # calibration props
+    calib_solve_rotation: bpy.props.BoolProperty(
+        name="Solve Rotation",
+        description="Also rotate the image in its plane to best fit the landmarks",
+        default=False
+    )
+    landmark_residuals: bpy.props.CollectionProperty(type=LandmarkResidual)
+    auto_align_side: bpy.props.BoolProperty(
+        name="Auto Align on Import",
+        description="Match a new side image to the front image and pre-place the calibration dups",
+        default=True
+    )
+
+    # reference image props
+    async_import: bpy.props.BoolProperty(
+        name="Load in Background",
+        description="Build views straight away with a placeholder and load their images between redraws",
+        default=True
+    )
+    use_proxies: bpy.props.BoolProperty(
+        name="Viewport Proxies",
+        description="Show downscaled copies of big reference images, the original is swapped in for calibration or on demand",
+        default=True
+    )
+    proxy_max_edge: bpy.props.IntProperty(
+        name="Proxy Size",
+        description="Longest edge in pixels of the viewport proxies made on import",
+        default=2048, min=256, soft_max=8192
+    )
+    resident_views: bpy.props.IntProperty(
+        name="Recent Views",
+        description="Views besides the active one that keep their image pixels loaded",
+        default=2, min=0, soft_max=16
+    )
+    image_budget: bpy.props.IntProperty(
+        name="Memory Budget (MB)",
+        description="Recent views are freed early once their image pixels need more than this",
+        default=2048, min=64, soft_max=32768
+    )
+
+    # turntable frames kept loaded
+    seq_cache_size: bpy.props.IntProperty(
+        name="Frame Cache",
+        description="Turntable frames kept loaded, least recently shown ones are freed first",
+        default=12, min=1, soft_max=72
+    )
+
+    # how view references are drawn
+    image_display: bpy.props.EnumProperty(
+        name="Image Display",
+        items=[('EMPTY', "Image Empties", "Each reference is an image empty in the scene"),
+               ('CAMERA', "Camera Background", "Each reference is a background image of its view camera, "
+                                               "the empties leave the viewport (lighter with many views)")],
+        default='EMPTY',
+        update=update_image_display
+    )
+
+    # slider -> rig relations as native drivers instead of update callbacks
+    use_drivers: bpy.props.BoolProperty(
+        name="Use Drivers",
+        description="Drive camera lens/distance and the stage 3 rotation with drivers, "
+                    "smoother scrubbing and the rigs keep working without the add-on",
+        default=False,
+        update=update_use_drivers
+    )
+
+    # calibrations stored on disk by image content, restored when the same photo comes back
+    use_calibration_cache: bpy.props.BoolProperty(
+        name="Calibration Cache",
+        description="Store finished calibrations by image content and restore them "
+                    "when the same image is imported again",
+        default=True
+    )
+
+    # joint solve props
+    solve_view_rotation: bpy.props.BoolProperty(
+        name="Solve View Rotation",
+        description="Let Solve All re-orient custom views (needs 4+ landmarks)",
+        default=True
+    )
+    solve_anchor_weight: bpy.props.FloatProperty(
+        name="Anchor Weight",
+        description="How strongly the solved landmarks are pulled back to the base anchors",
+        default=0.1, min=0.001, soft_max=10.0
+    )
     
     focal_length_front: bpy.props.FloatProperty(
         name="Front Focal Length",
@@ -192,7 +374,15 @@ class OrthoMetricProperties(bpy.types.PropertyGroup):
 
     # stage 3 props
     custom_views: bpy.props.CollectionProperty(type=OrthoViewItem)
+    view_serial: bpy.props.IntProperty(default=0) # last number used in custom view object names
+    shown_collection: bpy.props.PointerProperty(type=bpy.types.Collection) # view collection currently visible
     active_view_index: bpy.props.IntProperty(name="Index", default=0, update=update_view_visibility)
+
+    # characters (lineups), empty while the file holds a single one
+    characters: bpy.props.CollectionProperty(type=OrthoCharacter)
+    active_character_index: bpy.props.IntProperty(name="Character", default=0, update=update_active_character)
+    character_uid: bpy.props.IntProperty(default=0) # character the props currently work on
+    character_serial: bpy.props.IntProperty(default=0) # next character uid
     
     stage_3_rot_x: bpy.props.FloatProperty(
         name="Rotation X", min=0, max=180, default=0, update=update_stage_3_master
@@ -209,13 +399,18 @@ class OrthoMetricProperties(bpy.types.PropertyGroup):
     # )
 
 classes = (
+    LandmarkResidual,
+    ViewLandmark,
+    SequenceFrame,
     OrthoViewItem,
+    OrthoCharacter,
     OrthoMetricProperties,
 
     # stage 1
     stage_one.ORTHOMETRIC_OT_init_front,
     stage_one.ORTHOMETRIC_OT_center_tool,
     stage_one.ORTHOMETRIC_OT_confirm_center,
+    stage_one.ORTHOMETRIC_OT_auto_center,
     stage_one.ORTHOMETRIC_OT_start_calibration,
     stage_one.ORTHOMETRIC_OT_apply_calibration,
     stage_one.ORTHOMETRIC_OT_finish_stage_one,
@@ -224,6 +419,7 @@ classes = (
     # stage 2
     stage_two.ORTHOMETRIC_OT_init_side,
     stage_two.ORTHOMETRIC_OT_mirror_side,
+    stage_two.ORTHOMETRIC_OT_auto_align_side,
     stage_two.ORTHOMETRIC_OT_start_calibration_side,
     stage_two.ORTHOMETRIC_OT_apply_calibration_side,
     stage_two.ORTHOMETRIC_OT_finish_stage_two,
@@ -233,22 +429,97 @@ classes = (
 
     # stage 3
     stage_three.ORTHOMETRIC_OT_add_custom_view,
+    stage_three.ORTHOMETRIC_OT_add_sequence_view,
     stage_three.ORTHOMETRIC_OT_remove_custom_view,
     stage_three.ORTHOMETRIC_OT_enter_config,
     stage_three.ORTHOMETRIC_OT_finish_stage_three,
     stage_three.ORTHOMETRIC_OT_start_calibration_s3,
     stage_three.ORTHOMETRIC_OT_apply_calibration_s3,
+    stage_three.ORTHOMETRIC_OT_solve_all,
+    stage_three.ORTHOMETRIC_OT_estimate_lens,
+
+    # importers
+    importers.ORTHOMETRIC_OT_import_sheet,
+    importers.ORTHOMETRIC_OT_import_batch,
+    importers.ORTHOMETRIC_OT_full_resolution,
+    importers.ORTHOMETRIC_OT_clear_load_errors,
+
+    # view cycling
+    switcher.ORTHOMETRIC_OT_cycle_view,
+
+    # calibration cache, manifests, command server
+    calib_cache.ORTHOMETRIC_OT_clear_calibration_cache,
+    manifest.ORTHOMETRIC_OT_export_manifest,
+    manifest.ORTHOMETRIC_OT_import_manifest,
+    server.ORTHOMETRIC_OT_toggle_server,
+
+    # instrumentation
+    profiler.ORTHOMETRIC_OT_toggle_profiling,
+    profiler.ORTHOMETRIC_OT_reset_profile,
+    profiler.ORTHOMETRIC_OT_dump_profile,
+
+    # characters
+    characters.ORTHOMETRIC_OT_add_character,
+    characters.ORTHOMETRIC_OT_remove_character,
 
     ui.ORTHOMETRIC_UL_view_list, 
+    ui.ORTHOMETRIC_MT_view_pie,
     ui.ORTHOMETRIC_PT_main,
+    ui.ORTHOMETRIC_PT_debug,
 )
 
+# hotkeys: ctrl+alt+arrows cycle (hold ctrl+alt and keep stepping), ctrl+alt+v pie
+addon_keymaps = []
+
+def register_keymaps():
+    kc = bpy.context.window_manager.keyconfigs.addon
+    if kc is None: return # background runs
+    km = kc.keymaps.new(name="3D View", space_type='VIEW_3D')
+    kmi = km.keymap_items.new("orthometric.cycle_view", 'RIGHT_ARROW', 'PRESS', ctrl=True, alt=True)
+    kmi.properties.direction = 'NEXT'
+    addon_keymaps.append((km, kmi))
+    kmi = km.keymap_items.new("orthometric.cycle_view", 'LEFT_ARROW', 'PRESS', ctrl=True, alt=True)
+    kmi.properties.direction = 'PREV'
+    addon_keymaps.append((km, kmi))
+    kmi = km.keymap_items.new("wm.call_menu_pie", 'V', 'PRESS', ctrl=True, alt=True)
+    kmi.properties.name = ui.ORTHOMETRIC_MT_view_pie.bl_idname
+    addon_keymaps.append((km, kmi))
+
 def register():
     for cls in classes:
-        bpy.utils.register_class(cls)
+        bpy.utils.register_class(profiler.instrument(cls))
     bpy.types.Scene.orthometric = bpy.props.PointerProperty(type=OrthoMetricProperties)
+    bpy.app.handlers.load_post.append(registry.on_load_post)
+    bpy.app.handlers.load_post.append(switcher.on_load_post)
+    bpy.app.handlers.load_post.append(images.on_file_change)
+    bpy.app.handlers.load_post.append(loader.on_load_post)
+    bpy.app.handlers.undo_post.append(images.on_file_change)
+    bpy.app.handlers.redo_post.append(images.on_file_change)
+    bpy.app.handlers.depsgraph_update_post.append(backgrounds.on_depsgraph_update)
+    thumbnails.register()
+    register_keymaps()
 
 def unregister():
+    for km, kmi in addon_keymaps:
+        km.keymap_items.remove(kmi)
+    addon_keymaps.clear()
+    if registry.on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(registry.on_load_post)
+    if switcher.on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(switcher.on_load_post)
+    if loader.on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(loader.on_load_post)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if images.on_file_change in handlers:
+            handlers.remove(images.on_file_change)
+    if backgrounds.on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(backgrounds.on_depsgraph_update)
+    server.stop()
+    profiler.enable(False)
+    loader.cancel()
+    sequence.clear()
+    switcher.invalidate()
+    thumbnails.unregister()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.orthometric
\ No newline at end of file
@@ -0,0 +1,228 @@
+import os
+import re
+import numpy as np
+
+# bpy-free image analysis on plain pixel arrays, and view types read from file names
+# pixels are (H, W, C) float arrays, row 0 at the bottom like blender stores them
+
+# longest edge images get reduced to before any analysis
+ANALYSIS_EDGE = 1024
+
+# symmetry_axis score below which the line is a guess (featureless / asymmetric photos)
+MIN_SYMMETRY = 0.3
+
+
+def block_reduce(pixels, factor):
+    # box downsample by an integer factor, trailing rows/cols that do not fill a block are dropped
+    if factor <= 1:
+        return pixels
+    h, w = pixels.shape[0] // factor, pixels.shape[1] // factor
+    # rows then columns, much faster than one mean over a 5d view
+    rows = pixels[:h * factor, :w * factor].reshape(h, factor, w * factor, -1).sum(axis=1, dtype=np.float32)
+    return rows.reshape(h, w, factor, -1).sum(axis=2) / (factor * factor)
+
+
+def reduce_to(pixels, max_edge):
+    # downsample so the longest edge is at most max_edge, returns (pixels, factor)
+    factor = max(1, int(np.ceil(max(pixels.shape[:2]) / max_edge)))
+    return block_reduce(pixels, factor), factor
+
+
+def to_gray(pixels):
+    # luminance with transparent pixels pulled to 0
+    channels = pixels.shape[-1]
+    if channels >= 3:
+        gray = pixels[..., 0] * 0.2126 + pixels[..., 1] * 0.7152 + pixels[..., 2] * 0.0722
+    else:
+        gray = pixels[..., 0]
+    if channels in (2, 4):
+        gray = gray * pixels[..., -1]
+    return gray.astype(np.float32)
+
+
+def edges(gray):
+    # gradient magnitude, mirror invariant so it suits symmetry tests
+    gy, gx = np.gradient(gray)
+    return np.hypot(gx, gy)
+
+
+def _parabola_peak(values, i):
+    # sub-sample offset of a peak at i
+    if 0 < i < len(values) - 1:
+        y0, y1, y2 = values[i - 1:i + 2]
+        denom = y0 - 2 * y1 + y2
+        if denom < 0:
+            return 0.5 * (y0 - y2) / denom
+    return 0.0
+
+
+def symmetry_axis(gray, margin=0.2):
+    # best vertical mirror line of an image by column-flip correlation
+    # every candidate axis is scored at once: summed over rows, the self
+    # convolution of each row peaks where the row mirrors onto itself
+    # returns (axis as a fraction of the width, normalized score 0..1)
+    feat = edges(gray)
+    feat = feat - feat.mean(axis=1, keepdims=True)
+    h, w = feat.shape
+    n = 1 << int(np.ceil(np.log2(2 * w)))
+
+    spec = np.fft.rfft(feat, n, axis=1)
+    num = np.fft.irfft((spec * spec).sum(axis=0), n)[:2 * w - 1]
+
+    # energy in the overlapping part, keeps edge shifts from winning by default
+    energy = np.fft.rfft(feat * feat, n, axis=1).sum(axis=0)
+    ones = np.fft.rfft(np.ones(w), n)
+    den = np.fft.irfft(energy * ones, n)[:2 * w - 1]
+    score = num / np.maximum(den, 1e-12)
+
+    # only look at axes away from the borders, s = 2 * axis in pixel index space
+    lo, hi = int(2 * w * margin), int(2 * w * (1 - margin))
+    if hi <= lo:
+        return float('nan'), 0.0
+    best = lo + int(np.argmax(score[lo:hi]))
+    shift = best + _parabola_peak(score, best)
+
+    # pixel centers sit at index + 0.5
+    return (shift / 2 + 0.5) / w, float(score[best])
+
+
+def vertical_profile(gray):
+    # per row strength of horizontal features (brows, eyes, mouth, chin line)
+    # zero mean, unit norm so photos with different exposure compare
+    gy = np.abs(np.diff(gray, axis=0, prepend=gray[:1]))
+    profile = gy.mean(axis=1)
+    profile = profile - profile.mean()
+    return profile / max(np.linalg.norm(profile), 1e-12)
+
+
+def match_profiles(ref, ref_z, moving, moving_z, pivot=0.0, scales=None, samples=2048, min_overlap=0.5):
+    # scale (about pivot) and shift that best line the moving profile up with ref
+    # ref/moving: per row profiles, ref_z/moving_z: world height of each row (increasing)
+    # every scale is tried at once, shifts come from one fft cross-correlation per scale
+    # placements overlapping less than min_overlap of the shorter profile are skipped
+    # returns (scale, shift, normalized score)
+    if scales is None:
+        scales = np.geomspace(0.6, 1.6, 81)
+    scales = np.asarray(scales, dtype=np.float64)
+
+    # common height grid covering ref and every scaled moving profile
+    ends = pivot + (np.array([moving_z[0], moving_z[-1]])[:, None] - pivot) * scales
+    span = np.concatenate([[ref_z[0], ref_z[-1]], ends.ravel()])
+    grid = np.linspace(span.min(), span.max(), samples)
+    step = grid[1] - grid[0]
+
+    ref_g = np.interp(grid, ref_z, ref, left=0.0, right=0.0)
+    ref_mask = ((grid >= ref_z[0]) & (grid <= ref_z[-1])).astype(np.float64)
+
+    # moving profile scaled about pivot: row at z lands on pivot + s * (z - pivot)
+    src_z = pivot + (grid[None] - pivot) / scales[:, None]
+    mov_g = np.interp(src_z, moving_z, moving, left=0.0, right=0.0)
+    mov_mask = ((src_z >= moving_z[0]) & (src_z <= moving_z[-1])).astype(np.float64)
+
+    n = 1 << int(np.ceil(np.log2(2 * samples)))
+    fr = np.fft.rfft(ref_g, n)
+    fm = np.fft.rfft(mov_g, n, axis=-1)
+    num = np.fft.irfft(fr[None] * np.conj(fm), n, axis=-1)
+
+    # energy of each signal inside the overlap, for a normalized correlation
+    e_ref = np.fft.irfft(np.fft.rfft(ref_g ** 2, n)[None] * np.conj(np.fft.rfft(mov_mask, n, axis=-1)), n, axis=-1)
+    e_mov = np.fft.irfft(np.fft.rfft(ref_mask, n)[None] * np.conj(np.fft.rfft(mov_g ** 2, n, axis=-1)), n, axis=-1)
+    score = num / np.sqrt(np.maximum(e_ref * e_mov, 1e-12))
+
+    fr_mask = np.fft.rfft(ref_mask, n)
+    fm_mask = np.fft.rfft(mov_mask, n, axis=-1)
+    overlap = np.fft.irfft(fr_mask[None] * np.conj(fm_mask), n, axis=-1)
+    needed = min_overlap * np.minimum(ref_mask.sum(), mov_mask.sum(axis=-1))
+    score = np.where(overlap >= needed[:, None] - 0.5, score, -np.inf)
+
+    # lag l means moving shifted up by l samples, lags past n/2 wrap to negative
+    best = np.unravel_index(int(np.argmax(score)), score.shape)
+    row = score[best[0]]
+    lag = best[1] + _parabola_peak(row, best[1])
+    if lag > n / 2:
+        lag -= n
+    return float(scales[best[0]]), float(lag * step), float(row[best[1]])
+
+
+## Sheet panels
+
+def foreground_mask(pixels, tol=0.08):
+    # True where a pixel belongs to a drawing: alpha when the sheet has any
+    # transparency, otherwise distance from the border colour (paper/backdrop)
+    channels = pixels.shape[-1]
+    if channels in (2, 4):
+        alpha = pixels[..., -1]
+        if alpha.min() < 1.0 - tol:
+            return alpha > tol
+        pixels = pixels[..., :-1]
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    background = np.median(border, axis=0)
+    return np.abs(pixels - background).max(axis=-1) > tol
+
+
+def _runs(active, min_gap, min_size):
+    # (start, end) of True runs, runs split by gaps shorter than min_gap are merged
+    steps = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(steps == 1), np.flatnonzero(steps == -1)
+    if not len(starts):
+        return []
+    split = np.flatnonzero(starts[1:] - ends[:-1] >= min_gap)
+    starts = starts[np.concatenate([[0], split + 1])]
+    ends = ends[np.concatenate([split, [len(ends) - 1]])]
+    keep = ends - starts >= min_size
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def find_panels(pixels, min_gap_frac=0.01, min_size_frac=0.05, fill=0.002):
+    # split a character sheet into its drawings by empty gaps in the
+    # foreground column profile, then the row profile inside each column band
+    # returns normalized (u0, v0, u1, v1) rects (v from the bottom), in reading
+    # order: bands left to right, panels top to bottom
+    small, _ = reduce_to(pixels, ANALYSIS_EDGE)
+    mask = foreground_mask(small)
+    h, w = mask.shape
+    pad_u, pad_v = max(1, int(min_gap_frac * w)), max(1, int(min_gap_frac * h))
+
+    panels = []
+    for c0, c1 in _runs(mask.mean(axis=0) > fill, pad_u, min_size_frac * w):
+        band = mask[:, c0:c1].mean(axis=1) > fill
+        for r0, r1 in reversed(_runs(band, pad_v, min_size_frac * h)):
+            # half a gap of margin so stray strokes at the border survive
+            panels.append((max(0, c0 - pad_u // 2) / w, max(0, r0 - pad_v // 2) / h,
+                           min(w, c1 + pad_u // 2) / w, min(h, r1 + pad_v // 2) / h))
+    return panels
+
+
+## View names
+
+# name / metadata words marking the primary views
+FRONT_WORDS = {'front', 'frontal'}
+SIDE_WORDS = {'side', 'profile', 'lateral'}
+# words with a known angle, degrees from the front turning towards the side (+x)
+ANGLE_WORDS = {'front': 0, 'frontal': 0, 'threequarter': 45, 'quarter': 45, '3q': 45,
+               'side': 90, 'profile': 90, 'lateral': 90, 'back': 180, 'rear': 180}
+# explicit angles: "angle30", "rot_-45", "yaw 60", "30deg", "135°"
+# both forms start a token and take the whole number, "triangle3", "carrot_2" or "IMG_1045deg" are not angles
+ANGLE_PATTERN = re.compile(r'(?<![a-z0-9])(?:angle|rot|yaw)[ _-]?(-?\d{1,3})(?!\d)'
+                           r'|(?<![a-z0-9])(-?\d{1,3}) ?(?:deg|°)')
+
+
+def classify(name, extra=""):
+    # (view type, angle or None) from a filename plus any metadata text
+    # an explicit angle (angle30, 3q, back..) wins over the plain front / side words whatever the word order
+    text = f"{os.path.splitext(name)[0]} {extra}".lower()
+    words = [word for word in re.split(r'[^a-z0-9]+', text) if word]
+    front = bool(FRONT_WORDS.intersection(words))
+    side = bool(SIDE_WORDS.intersection(words))
+
+    match = ANGLE_PATTERN.search(text)
+    angle = float(match.group(1) or match.group(2)) if match else None
+    if angle is None:
+        angle = next((float(ANGLE_WORDS[word]) for word in words
+                      if word in ANGLE_WORDS and word not in FRONT_WORDS | SIDE_WORDS), None)
+
+    if front and angle in (None, 0):
+        return 'FRONT', 0.0
+    if side and angle in (None, 90):
+        return 'SIDE', 90.0
+    return 'CUSTOM', angle
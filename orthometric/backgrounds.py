@@ -0,0 +1,201 @@
+import math
+import mathutils
+from bpy.app.handlers import persistent
+from . import images, registry
+
+# "Camera Background" image display: each view's reference is drawn as a background image of its
+# own camera instead of by its image empty. the empty stays as the calibration handle (its
+# transform is still what calibration solves) but is disabled in viewports, so it leaves the
+# depsgraph, and looking through a view's camera is what shows its image.
+# offset / scale / rotation are worked out from where the empty sits in front of the camera,
+# for the active view only and only written when they changed, so the handler does not feed itself
+# (Solve All refreshes the stored matrix of every view first, refresh_matrices).
+# the handler syncs on updates of the view's camera (object / lens data) or the objects above it and
+# the image (sliders, master rotation), or when the view, its empty's own transform / image / opacity or
+# the render size changed since the last sync (view switches, calibration: the disabled empty sends no updates)
+# sheet cards keep drawing as cards (a background image can't show just a crop)
+
+EPS = 1e-5
+
+# state the active view's background was last synced for (sync_key)
+_synced = {'key': None}
+
+
+def _set(owner, attr, value):
+    # write only when different, every write is a depsgraph update
+    current = getattr(owner, attr)
+    if isinstance(value, (float, int)) and not isinstance(value, bool):
+        if abs(current - value) > EPS:
+            setattr(owner, attr, value)
+    elif hasattr(current, "__len__") and not isinstance(current, str):
+        if any(abs(a - b) > EPS for a, b in zip(current, value)):
+            setattr(owner, attr, value)
+    elif current != value:
+        setattr(owner, attr, value)
+
+
+def image_world(img_obj):
+    # world matrix from the parent, disabled objects are not re-evaluated when their parent moves
+    if img_obj.parent:
+        return img_obj.parent.matrix_world @ img_obj.matrix_parent_inverse @ img_obj.matrix_basis
+    return img_obj.matrix_basis.copy()
+
+
+def background_entry(cam, image, create=True):
+    # the camera's background image entry showing this view (proxy or original)
+    variants = {image, images.full_image(image), images.proxy_image(image)}
+    for bg in cam.data.background_images:
+        if bg.image in variants:
+            return bg
+    if not create:
+        return None
+    bg = cam.data.background_images.new()
+    bg.frame_method = 'FIT'
+    bg.display_depth = 'BACK'
+    return bg
+
+
+def frame(scene, cam):
+    # camera frame in the normalized plane: width, height, center (camera shift)
+    corners = [corner / -corner.z if cam.data.type != 'ORTHO' else corner
+               for corner in cam.data.view_frame(scene=scene)]
+    xs = [corner.x for corner in corners]
+    ys = [corner.y for corner in corners]
+    return max(xs) - min(xs), max(ys) - min(ys), mathutils.Vector(((max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2))
+
+
+def placement(scene, cam, img_obj):
+    # (offset, scale, rotation, flip x) of the image empty as seen through cam
+    to_cam = cam.matrix_world.inverted() @ image_world(img_obj)
+    ortho = cam.data.type == 'ORTHO'
+
+    def project(u, v):
+        point = to_cam @ images.image_to_local(img_obj, u, v)
+        if ortho:
+            return point.xy / cam.data.ortho_scale
+        return point.xy / max(-point.z, EPS)
+
+    center = project(0.5, 0.5)
+    axis_x = project(1.0, 0.5) - project(0.0, 0.5)
+    axis_y = project(0.5, 1.0) - project(0.5, 0.0)
+    # seen from behind (mirrored side image): flip, the angle is read off the flipped x axis
+    flip = axis_x.x * axis_y.y - axis_x.y * axis_y.x < 0
+    if flip:
+        axis_x = -axis_x
+    width, height = axis_x.length, axis_y.length
+    if width < EPS or height < EPS:
+        return None
+
+    cam_w, cam_h, cam_center = frame(scene, cam)
+    if ortho:
+        cam_w, cam_h, cam_center = cam_w / cam.data.ortho_scale, cam_h / cam.data.ortho_scale, cam_center / cam.data.ortho_scale
+    image_aspect, cam_aspect = width / height, cam_w / cam_h
+
+    # 'FIT' sizing and the offset units as the viewport draws them
+    base = cam_w if image_aspect > cam_aspect else cam_h * image_aspect
+    shift = center - cam_center
+    offset = (shift.x / min(1.0, cam_aspect),
+              shift.y * max(1.0, cam_aspect) * (image_aspect / cam_aspect))
+    return offset, width / base, -math.atan2(axis_x.y, axis_x.x), flip
+
+
+def sync_view(scene, item):
+    # move the view's reference onto its camera background (no-op for cards / missing rigs)
+    cam, img_obj = item.obj_cam, item.obj_img
+    if not (cam and img_obj and img_obj.type == 'EMPTY' and img_obj.data):
+        return
+    fit = placement(scene, cam, img_obj)
+    if fit is None:
+        return
+    offset, scale, rotation, flip = fit
+
+    bg = background_entry(cam, img_obj.data)
+    _set(bg, "image", img_obj.data)
+    _set(bg, "offset", offset)
+    _set(bg, "scale", scale)
+    _set(bg, "rotation", rotation)
+    _set(bg, "use_flip_x", flip)
+    _set(bg, "alpha", img_obj.color[3])
+    _set(cam.data, "show_background_images", True)
+
+    # keep the stored matrix current for calibration, then take the empty out of the viewport
+    refresh_matrix(img_obj)
+    _set(img_obj, "hide_viewport", True)
+
+
+def refresh_matrix(img_obj):
+    # write the empty's world matrix from its parent, only when it is stale
+    world = image_world(img_obj)
+    if any(abs(a - b) > EPS for row_a, row_b in zip(world, img_obj.matrix_world) for a, b in zip(row_a, row_b)):
+        img_obj.matrix_world = world
+
+
+def refresh_matrices(props):
+    # the handler only syncs the active view, the other disabled empties keep the matrix of their
+    # last sync while their rigs move: refresh every one before reading them all (Solve All)
+    for item in props.custom_views:
+        if item.obj_img:
+            refresh_matrix(item.obj_img)
+
+
+def release_view(item):
+    # back to the image empty
+    cam, img_obj = item.obj_cam, item.obj_img
+    if img_obj:
+        img_obj.hide_viewport = False
+    image = images.object_image(img_obj)
+    if cam and image:
+        bg = background_entry(cam, image, create=False)
+        if bg:
+            cam.data.background_images.remove(bg)
+        if not cam.data.background_images:
+            cam.data.show_background_images = False
+
+
+def apply(scene):
+    # display mode changed: every view of every character
+    props = scene.orthometric
+    for item in props.custom_views:
+        if props.image_display == 'CAMERA':
+            sync_view(scene, item)
+        else:
+            release_view(item)
+
+
+def watched(item):
+    # ids whose updates can move the view's background: camera, its lens data, both objects and their parents
+    ids = set()
+    for obj in (item.obj_cam, item.obj_img):
+        while obj:
+            ids.add(obj)
+            obj = obj.parent
+    if item.obj_cam:
+        ids.add(item.obj_cam.data)
+    return ids
+
+
+def sync_key(scene, item):
+    # what a sync depends on that sends no depsgraph update of the watched ids
+    img_obj = item.obj_img
+    image = images.object_image(img_obj)
+    render = scene.render
+    return (item.obj_cam.name, img_obj.name, image.name if image else None, img_obj.color[3],
+            tuple(value for row in img_obj.matrix_basis for value in row),
+            render.resolution_x, render.resolution_y, render.pixel_aspect_x, render.pixel_aspect_y)
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    props = scene.orthometric
+    if props.image_display != 'CAMERA':
+        return
+    item = registry.active(props)
+    if not (item and item.obj_cam and item.obj_img):
+        return
+    key = sync_key(scene, item)
+    if key == _synced['key']:
+        ids = watched(item)
+        if not any(update.id.original in ids for update in depsgraph.updates):
+            return
+    _synced['key'] = key
+    sync_view(scene, item)
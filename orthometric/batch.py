@@ -0,0 +1,98 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+
+# command line batch builder: one .blend per manifest, built by a pool of background blender processes
+#
+#   blender --background --python orthometric/batch.py -- --out builds --jobs 4 cast/*.json
+#
+# the first blender only hands out work, each manifest is built by its own
+# "blender --background --factory-startup" child (the add-on is registered from this folder,
+# it does not need to be installed) and saved as <out>/<manifest name>.blend
+# exit code is the number of manifests that failed
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE = os.path.basename(ADDON_DIR)
+
+
+def script_args():
+    # arguments after "--", blender keeps the ones before for itself
+    return sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser(prog="blender --background --python batch.py --",
+                                     description="Build OrthoMetric scenes from manifests")
+    parser.add_argument("manifests", nargs="*", help="manifest .json files")
+    parser.add_argument("--out", default="", help="output folder (default: next to each manifest)")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="blender processes building at once")
+    parser.add_argument("--worker", nargs=2, metavar=("MANIFEST", "BLEND"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def output_path(manifest, out_dir):
+    name = os.path.splitext(os.path.basename(manifest))[0] + ".blend"
+    return os.path.join(out_dir or os.path.dirname(os.path.abspath(manifest)), name)
+
+
+## Worker
+
+def build(manifest, blend):
+    # child process: empty scene, add-on from this folder, manifest in, .blend out
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    addon = importlib.import_module(PACKAGE)
+    addon.register()
+
+    result = bpy.ops.orthometric.import_manifest(filepath=os.path.abspath(manifest))
+    if 'FINISHED' not in result:
+        raise RuntimeError(f"could not build {manifest}")
+    os.makedirs(os.path.dirname(os.path.abspath(blend)), exist_ok=True)
+    bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(blend))
+
+
+## Pool
+
+def run_one(manifest, blend):
+    # one child blender, returns (manifest, exit code, output tail)
+    cmd = [bpy.app.binary_path, "--background", "--factory-startup", "--python-exit-code", "1",
+           "--python", os.path.abspath(__file__), "--", "--worker", manifest, blend]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return manifest, proc.returncode, proc.stdout[-2000:]
+
+
+def run_pool(manifests, out_dir, jobs):
+    # the children do the work, threads here only wait on them
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        runs = [pool.submit(run_one, manifest, output_path(manifest, out_dir)) for manifest in manifests]
+        for run in runs:
+            manifest, code, output = run.result()
+            if code:
+                failed += 1
+                print(f"OrthoMetric batch: FAILED {manifest}\n{output}")
+            else:
+                print(f"OrthoMetric batch: built {output_path(manifest, out_dir)}")
+    print(f"OrthoMetric batch: {len(manifests) - failed}/{len(manifests)} built")
+    return failed
+
+
+def main():
+    args = parse(script_args())
+    if args.worker:
+        build(*args.worker)
+        return 0
+    if not args.manifests:
+        print("OrthoMetric batch: no manifests given")
+        return 1
+    return run_pool(args.manifests, args.out, args.jobs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
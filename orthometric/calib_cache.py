@@ -0,0 +1,194 @@
+import bpy
+import hashlib
+import json
+import os
+import tempfile
+import mathutils
+from . import calibration, images, registry
+
+# calibrations kept on disk across files, keyed by the image content hash (images.HASH_KEY)
+# an entry holds the image transform (parent relative), the view's lens / distance offset,
+# the master rotation and the marked landmarks. importing the same photo again through
+# init front / side, + or a batch restores the view as it was calibrated
+# entries remember the anchors they were solved against and are skipped once those change,
+# "Clear Calibration Cache" drops everything
+# several blenders (eg. batch.py workers) share the file: a save re-reads it and only writes this
+# blender's new entries over it, through a temp file swapped in whole, unchanged entries are not saved again
+
+CACHE_FILE = "calibration_cache.json"
+
+# loaded on first use
+_cache = None
+# digests stored since the last save
+_dirty = set()
+
+
+def cache_path():
+    folder = bpy.utils.user_resource('DATAFILES', path="orthometric", create=True)
+    return os.path.join(folder, CACHE_FILE)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _entries():
+    global _cache
+    if _cache is None:
+        _cache = _read(cache_path())
+    return _cache
+
+
+def save():
+    # merge this blender's new entries into the file as it is now, returns an error message or None
+    if not _dirty:
+        return None
+    path = cache_path()
+    entries = _read(path)
+    cache = _entries()
+    entries.update((digest, cache[digest]) for digest in _dirty if digest in cache)
+    # a temp file of our own in the same folder, so the swap is atomic and no other blender writes into it
+    tmp = None
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), prefix=CACHE_FILE, suffix=".tmp",
+                                         delete=False) as f:
+            tmp = f.name
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError as err:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        return f"Could not write the calibration cache: {err}"
+    # other blenders' entries come along
+    cache.update(entries)
+    _dirty.clear()
+    return None
+
+
+def anchor_signature():
+    # short hash of the base anchors (keys + positions), calibrations only hold against these
+    digest = hashlib.blake2b(digest_size=8)
+    for key, obj in calibration.get_anchors():
+        digest.update(key.encode())
+        digest.update(str([round(c, 5) for c in obj.matrix_world.translation]).encode())
+    return digest.hexdigest()
+
+
+def view_lens(props, item):
+    # (lens, distance offset) of a view, front / side keep theirs on the scene props
+    if item.view_type == 'FRONT':
+        return props.focal_length_front, props.front_cam_y
+    if item.view_type == 'SIDE':
+        return props.focal_length_side, props.side_cam_x
+    return item.fov, item.dist_off
+
+
+def set_view_lens(props, item, fov, dist_off):
+    # through the props, their update callbacks (or drivers) move the camera
+    if item.view_type == 'FRONT':
+        props.focal_length_front, props.front_cam_y = fov, dist_off
+    elif item.view_type == 'SIDE':
+        props.focal_length_side, props.side_cam_x = fov, dist_off
+    else:
+        item.fov, item.dist_off = fov, dist_off
+
+
+def image_digest(img_obj):
+    # content hash of the full resolution image a view shows, None for cards / unhashed images
+    if not (img_obj and img_obj.type == 'EMPTY'):
+        return None
+    image = images.full_image(img_obj.data)
+    return image.get(images.HASH_KEY) if image else None
+
+
+def store(scene, item, write=True):
+    # remember item's calibration, write=False leaves the save to the caller (one per batch)
+    # returns an error message when the file could not be written, None otherwise
+    props = scene.orthometric
+    if not (props.use_calibration_cache and item):
+        return None
+    img_obj = item.obj_img
+    digest = image_digest(img_obj)
+    if digest is None:
+        return None
+    fov, dist_off = view_lens(props, item)
+    master = item.obj_master
+    entry = {
+        'view_type': item.view_type,
+        'anchors': anchor_signature(),
+        'matrix': [list(row) for row in img_obj.matrix_local],
+        'fov': fov,
+        'dist_off': dist_off,
+        'master_rotation': list(master.rotation_euler) if master else None,
+        'landmarks': {landmark.name: list(landmark.co) for landmark in item.landmarks},
+    }
+    # compared as json would read it back (tuples -> lists)
+    entry = json.loads(json.dumps(entry))
+    cache = _entries()
+    if cache.get(digest) != entry:
+        cache[digest] = entry
+        _dirty.add(digest)
+    return save() if write else None
+
+
+def restore(scene, item, image):
+    # put a cached calibration of image back on item, True when there was one
+    props = scene.orthometric
+    img_obj = item.obj_img
+    if not (props.use_calibration_cache and img_obj and img_obj.type == 'EMPTY'):
+        return False
+    full = images.full_image(image)
+    entry = _entries().get(full.get(images.HASH_KEY)) if full else None
+    if not entry or entry['view_type'] != item.view_type or entry['anchors'] != anchor_signature():
+        return False
+
+    master = item.obj_master
+    if master and entry['master_rotation']:
+        master.rotation_euler = entry['master_rotation']
+    img_obj.matrix_local = mathutils.Matrix(entry['matrix'])
+    set_view_lens(props, item, entry['fov'], entry['dist_off'])
+
+    item.landmarks.clear()
+    for key, co in entry['landmarks'].items():
+        landmark = item.landmarks.add()
+        landmark.name = key
+        landmark.co = co
+    return True
+
+
+def restore_object(scene, img_obj, image):
+    # loader side: the view is found from its image object once the file is in
+    for _, item in registry.character_views(scene.orthometric):
+        if item.obj_img == img_obj:
+            return restore(scene, item, image)
+    return False
+
+
+def clear():
+    global _cache
+    _cache = {}
+    _dirty.clear()
+    try:
+        os.remove(cache_path())
+    except OSError:
+        pass
+
+
+class ORTHOMETRIC_OT_clear_calibration_cache(bpy.types.Operator):
+    # forget every stored calibration (eg. after editing the base anchors)
+    bl_idname = "orthometric.clear_calibration_cache"
+    bl_label = "Clear Calibration Cache"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        count = len(_entries())
+        clear()
+        self.report({'INFO'}, f"Cleared {count} stored calibrations")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_confirm(self, event)
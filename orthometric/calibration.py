@@ -0,0 +1,275 @@
+import bpy
+import math
+import mathutils
+import numpy as np
+from . import core, registry
+
+# scene side of calibration: reads world positions, hands them to core
+# and writes the result back with a single matrix_world assignment
+
+ANCHOR_PREFIX = "OM_Anchor_"
+# landmark key stored on namespaced anchors (their names carry the character prefix)
+ANCHOR_KEY = "om_anchor"
+DUP_PREFIX = "OM_Dup_"
+
+# anchors closer than this to x=0 sit on the symmetry line
+MIDLINE_EPS = 0.001
+
+
+def world_matrix(obj):
+    return np.array(obj.matrix_world, dtype=np.float64)
+
+
+def write_world_matrix(obj, mat, parent_world=None):
+    # one write, no helper objects, no view layer update
+    # parent_world: parent matrix to solve against when it changed this tick
+    mat = mathutils.Matrix(np.asarray(mat).tolist())
+    if parent_world is None:
+        obj.matrix_world = mat
+    else:
+        obj.matrix_basis = (parent_world @ obj.matrix_parent_inverse).inverted() @ mat
+
+
+## Landmarks
+
+def anchor_key(obj):
+    # "TearDuct", "Chin", "NoseTip".. from the stored key or the name without prefix, None if not an anchor
+    if ANCHOR_KEY in obj:
+        return obj[ANCHOR_KEY]
+    if obj.name.startswith(ANCHOR_PREFIX):
+        return obj.name[len(ANCHOR_PREFIX):]
+    return None
+
+
+def get_anchors():
+    # every OM_Anchor_* in the active character's OM_Assets, as (key, obj) sorted by key
+    col = registry.asset_collection(bpy.context.scene.orthometric)
+    if not col:
+        return []
+    anchors = [(anchor_key(obj), obj) for obj in col.all_objects if anchor_key(obj)]
+    return sorted(anchors, key=lambda pair: pair[0])
+
+
+def dup_name(key, suffix=""):
+    return f"{DUP_PREFIX}{key}{suffix}"
+
+
+def spawn_dups(context, view_type, suffix=""):
+    # duplicate every anchor for the user to line up with the image
+    # front: depth locked, midline anchors also locked in x
+    # side: x (depth) locked. custom: free
+    # residuals of the previous run no longer apply
+    context.scene.orthometric.landmark_residuals.clear()
+
+    dups = []
+    for key, anchor in get_anchors():
+        dup = anchor.copy()
+        if anchor.data: dup.data = anchor.data.copy()
+        dup.name = dup_name(key, suffix)
+        if ANCHOR_KEY in dup: del dup[ANCHOR_KEY]
+        context.collection.objects.link(dup)
+
+        if view_type == 'FRONT':
+            on_midline = abs(anchor.matrix_world.translation.x) < MIDLINE_EPS
+            dup.lock_location = (on_midline, True, False)
+        elif view_type == 'SIDE':
+            dup.lock_location = (True, False, False)
+        else:
+            dup.lock_location = (False, False, False)
+        dups.append(dup)
+    return dups
+
+
+def gather_pairs(suffix=""):
+    # anchors with a placed dup, returns keys, dups (K, 3), anchors (K, 3)
+    keys, src, dst = [], [], []
+    for key, anchor in get_anchors():
+        dup = bpy.data.objects.get(dup_name(key, suffix))
+        if not dup: continue
+        keys.append(key)
+        src.append(dup.matrix_world.translation[:])
+        dst.append(anchor.matrix_world.translation[:])
+    return keys, np.array(src).reshape(-1, 3), np.array(dst).reshape(-1, 3)
+
+
+def remove_dups(keys, suffix=""):
+    for key in keys:
+        dup = bpy.data.objects.get(dup_name(key, suffix))
+        if dup:
+            bpy.data.objects.remove(dup, do_unlink=True)
+
+
+def fit_image(img_obj, src, dst, view_type, pivot=core.HEAD_PIVOT, rotate=False):
+    # n-landmark similarity calibration of img_obj, written once
+    # returns the core.SimilarityFit (scale is nan if it could not be solved)
+    axes = core.VIEW_AXES[view_type]
+    img_mat = world_matrix(img_obj)
+    basis = core.view_basis(view_type, img_mat)
+
+    fit = core.fit_similarity(src, dst, basis, pivot, rotate=rotate,
+                              scale_axes=axes['scale_axes'], move_axes=axes['move_axes'])
+    if math.isfinite(fit.scale):
+        write_world_matrix(img_obj, core.apply_transform(fit.matrix, img_mat))
+    return fit
+
+
+def store_residuals(props, keys, residuals):
+    # keep per landmark error of the last calibration for the panel
+    props.landmark_residuals.clear()
+    for key, err in zip(keys, residuals):
+        entry = props.landmark_residuals.add()
+        entry.name = key
+        entry.error = float(err)
+
+
+def store_observations(item, img_obj, keys, src):
+    # remember where each landmark sits on the photo, in image local coords
+    # so the joint solve can re-fit the view later without the dups
+    inv = np.linalg.inv(world_matrix(img_obj))
+    local = core.transform_points(inv, src)
+    item.landmarks.clear()
+    for key, co in zip(keys, local):
+        entry = item.landmarks.add()
+        entry.name = key
+        entry.co = co[:2]
+
+
+def run_calibration(op, context, img_obj, view_type, suffix="", pivot=core.HEAD_PIVOT, item=None):
+    # shared apply step for all stages, returns True when the image was moved
+    props = context.scene.orthometric
+    keys, src, dst = gather_pairs(suffix)
+
+    if len(keys) < 2:
+        op.report({'ERROR'}, "Need at least 2 placed anchor duplicates")
+        return False
+
+    if item is not None:
+        store_observations(item, img_obj, keys, src)
+
+    fit = fit_image(img_obj, src, dst, view_type, pivot, rotate=props.calib_solve_rotation)
+    if not math.isfinite(fit.scale):
+        op.report({'ERROR'}, "Duplicates are too close together!")
+        return False
+
+    store_residuals(props, keys, fit.residuals)
+    remove_dups(keys, suffix)
+
+    worst = int(np.argmax(fit.residuals))
+    op.report({'INFO'}, f"Calibration Complete! Worst landmark: {keys[worst]} ({fit.residuals[worst]:.4f})")
+    return True
+
+
+## Joint solve
+
+def gather_view(item, keys):
+    # (K, 3) world pos of the item's marked landmarks and (K,) weights
+    img_obj = item.obj_img
+    index = {key: i for i, key in enumerate(keys)}
+    local = np.zeros((len(keys), 3))
+    weights = np.zeros(len(keys))
+    for entry in item.landmarks:
+        i = index.get(entry.name)
+        if i is None: continue
+        local[i, :2] = entry.co
+        weights[i] = 1.0
+    return core.transform_points(world_matrix(img_obj), local), weights
+
+
+def write_master_rotation(item, delta):
+    # turn the master so its view axis follows delta, returns the masters
+    # old and new world matrix (rigs keep y rotation at 0)
+    master = item.obj_master
+    old_world = master.matrix_world.copy()
+    normal = np.asarray(delta) @ np.array(old_world.to_3x3()) @ np.array((0.0, 0.0, 1.0))
+
+    rot_x = math.acos(max(-1.0, min(1.0, normal[2])))
+    rot_z = math.atan2(normal[0], -normal[1])
+    master.rotation_euler = (rot_x, 0.0, rot_z)
+
+    new_world = mathutils.Matrix.LocRotScale(master.location, master.rotation_euler, master.scale)
+    return old_world, new_world
+
+
+def solve_all_views(context, orient=True, rotate=False, anchor_weight=0.1):
+    # joint re-fit of every view that has stored landmarks
+    # returns (views solved, landmark keys, (V, K) residuals, view names)
+    props = context.scene.orthometric
+    keys = [key for key, _ in get_anchors()]
+    anchors = np.array([obj.matrix_world.translation[:] for _, obj in get_anchors()]).reshape(-1, 3)
+
+    items = [item for _, item in registry.character_views(props)
+             if len(item.landmarks) >= 2 and item.obj_img]
+    if not items or len(keys) < 2:
+        return 0, keys, np.zeros((0, len(keys))), []
+
+    features, weights, bases, pivots, scale_axes, move_axes, free, orient_pivots = ([] for _ in range(8))
+    for item in items:
+        img_mat = world_matrix(item.obj_img)
+        pts, w = gather_view(item, keys)
+        axes = core.VIEW_AXES[item.view_type]
+        master = item.obj_master
+        custom = item.view_type in ('CUSTOM', 'SEQUENCE')
+
+        features.append(pts)
+        weights.append(w)
+        bases.append(np.broadcast_to(core.view_basis(item.view_type, img_mat), (2, 3)))
+        pivots.append(img_mat[:3, 3] if custom else core.HEAD_PIVOT)
+        scale_axes.append(axes['scale_axes'])
+        move_axes.append(axes['move_axes'])
+        # a turntable's frames follow its z rotation, it is not re-oriented
+        free.append(orient and item.view_type == 'CUSTOM' and master is not None)
+        orient_pivots.append(master.matrix_world.translation[:] if master else core.HEAD_PIVOT)
+
+    solve = core.solve_joint(
+        np.array(features), np.array(weights), anchors, np.array(bases), np.array(pivots),
+        np.array(scale_axes, dtype=float), np.array(move_axes, dtype=float),
+        orient=np.array(free), orient_pivots=np.array(orient_pivots),
+        anchor_weight=anchor_weight, rotate=rotate)
+
+    active = registry.active(props)
+    for item, transform, delta, is_free in zip(items, solve.transforms, solve.rotations, free):
+        img_obj = item.obj_img
+        new_mat = core.apply_transform(transform, world_matrix(img_obj))
+
+        if is_free and not np.allclose(delta, np.eye(3)):
+            # master turns first, the image is then solved against its moved parent
+            old_world, new_world = write_master_rotation(item, delta)
+            parent_world = None
+            if img_obj.parent:
+                parent_world = new_world @ old_world.inverted() @ img_obj.parent.matrix_world
+            write_world_matrix(img_obj, new_mat, parent_world)
+
+            # keep the stage 3 sliders in sync with the active view
+            if item == active:
+                master = item.obj_master
+                props.stage_3_rot_x = math.degrees(master.rotation_euler.x)
+                props.stage_3_rot_z = math.degrees(master.rotation_euler.z)
+        else:
+            write_world_matrix(img_obj, new_mat)
+
+    store_residuals(props, keys, solve.residuals.max(axis=0))
+    return len(items), keys, solve.residuals, [item.name for item in items]
+
+
+## Lens estimate
+
+def estimate_view_lens(item, rotate=False):
+    # perspective solve of a custom view from its stored landmarks
+    # returns (core.PerspectiveFit, plane normal) or None without 3+ landmarks
+    img_obj = item.obj_img
+    cam_obj = item.obj_cam
+    anchors = get_anchors()
+    if not (img_obj and cam_obj) or len(anchors) < 3:
+        return None
+
+    keys = [key for key, _ in anchors]
+    landmarks = np.array([obj.matrix_world.translation[:] for _, obj in anchors])
+    features, weights = gather_view(item, keys)
+    if (weights > 0).sum() < 3:
+        return None
+
+    img_mat = world_matrix(img_obj)
+    basis = core.view_basis('CUSTOM', img_mat)
+    result = core.estimate_distance(landmarks, features, img_mat[:3, 3], basis,
+                                    cam_obj.matrix_world.translation[:], weights, rotate)
+    return result, np.cross(basis[0], basis[1])
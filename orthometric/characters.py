@@ -0,0 +1,190 @@
+import bpy
+import re
+from . import drivers, registry, residency, stage_one, stage_three, switcher
+
+# several characters in one scene (lineup sheets)
+# every view item carries the uid of its character, the list shows the active character's views only
+# each character has a collection under OrthoMetric holding its view collections and its own
+# namespaced copy of OM_Assets (cage + anchors), objects are prefixed with its namespace
+# the scene props keep working on the active character: its few scalar settings are stored on
+# its entry when switching away and written back when switching to it, so a switch is
+# two collection flips and a handful of property writes whatever the number of views
+# (with drivers on, plus re-targeting the drivers of the two characters' front / side views)
+
+# per character settings that live on the scene props while the character is active
+SAVED = ('has_front', 'has_side', 'active_view_index', 'shown_collection',
+         'focal_length_front', 'front_cam_y', 'focal_length_side', 'side_cam_x')
+
+CHARACTER_PREFIX = "OM_Char_"
+
+
+def clean_name(name):
+    return re.sub(r'[^A-Za-z0-9]+', "_", name).strip("_") or "Character"
+
+
+def new_entry(scene, name, namespace):
+    props = scene.orthometric
+    entry = props.characters.add()
+    entry.name = name
+    entry.uid = props.character_serial
+    props.character_serial += 1
+    entry.namespace = namespace
+    entry.collection = bpy.data.collections.new(CHARACTER_PREFIX + clean_name(name))
+    registry.parent_collection(scene).children.link(entry.collection)
+    return entry
+
+
+def ensure_default(scene):
+    # the views made before there were characters become the first character (uid 0, plain names)
+    props = scene.orthometric
+    if props.characters:
+        return props.characters[0]
+    props.character_serial = 0
+    entry = new_entry(scene, "Character 1", "")
+    parent = registry.parent_collection(scene)
+
+    # its view collections and assets move under its collection once
+    for col in [item.collection for item in props.custom_views if item.collection]:
+        if col.name in parent.children:
+            parent.children.unlink(col)
+            entry.collection.children.link(col)
+    assets = bpy.data.collections.get(registry.ASSET_COLLECTION)
+    if assets:
+        entry.assets = assets
+        if assets.name in scene.collection.children:
+            scene.collection.children.unlink(assets)
+        entry.collection.children.link(assets)
+    props.character_uid = entry.uid
+    return entry
+
+
+def save(props, entry):
+    for key in SAVED:
+        setattr(entry, key, getattr(props, key))
+
+
+def load(props, entry):
+    # raw writes, the update callbacks would move rigs that are already where they belong
+    for key in SAVED:
+        value = getattr(entry, key)
+        if key == 'shown_collection':
+            props.shown_collection = value
+        else:
+            props[key] = value
+
+
+def activate(context, entry):
+    # hide the character shown so far, show this one with its last active view
+    scene = context.scene
+    props = scene.orthometric
+    old = registry.character(props)
+    if old == entry:
+        return
+
+    if old:
+        save(props, old)
+        if old.collection:
+            old.collection.hide_viewport = True
+
+    props.character_uid = entry.uid
+    load(props, entry)
+    if entry.collection:
+        entry.collection.hide_viewport = False
+    # every character keeps its drivers, only the front / side sources change hands
+    if props.use_drivers:
+        if old:
+            drivers.retarget(scene, old.uid)
+        drivers.retarget(scene, entry.uid)
+
+    # back to the lobby on the character's own view
+    props.stage = 'START'
+    views = registry.character_views(props)
+    if views:
+        if props.active_view_index not in [idx for idx, _ in views]:
+            props["active_view_index"] = views[0][0]
+        item = props.custom_views[props.active_view_index]
+        registry.show_view(scene, item)
+        residency.activate(props, item)
+        if item.obj_cam:
+            scene.camera = item.obj_cam
+        stage_one.camera_viewports(context)
+
+
+def add(scene, name):
+    # new character under a free name, made active
+    props = scene.orthometric
+    ensure_default(scene)
+
+    names = {entry.name for entry in props.characters}
+    base, n = name, len(props.characters) + 1
+    while name in names:
+        name = f"{base} {n}"
+        n += 1
+
+    entry = new_entry(scene, name, clean_name(name) + "_")
+    props.active_character_index = len(props.characters) - 1
+    return entry
+
+
+class ORTHOMETRIC_OT_add_character(bpy.types.Operator):
+    # new character with its own views, rigs and anchors
+    bl_idname = "orthometric.add_character"
+    bl_label = "Add Character"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    name: bpy.props.StringProperty(name="Name", default="Character")
+
+    def execute(self, context):
+        entry = add(context.scene, self.name)
+        self.report({'INFO'}, f"Added {entry.name}, add its views from the lobby")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
+class ORTHOMETRIC_OT_remove_character(bpy.types.Operator):
+    # remove the active character with all its views, rigs and anchors
+    bl_idname = "orthometric.remove_character"
+    bl_label = "Remove Character"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return len(context.scene.orthometric.characters) > 1
+
+    def execute(self, context):
+        scene = context.scene
+        props = scene.orthometric
+        entry = registry.character(props)
+        if entry is None:
+            return {'CANCELLED'}
+
+        for idx, item in reversed(registry.character_views(props)):
+            stage_three.del_hierarchy(item.obj_master)
+            registry.remove_view_collection(item)
+            props.custom_views.remove(idx)
+            # saved view indices of the other characters shift with the list
+            for other in props.characters:
+                if other.active_view_index > idx:
+                    other.active_view_index -= 1
+
+        if entry.assets:
+            for obj in list(entry.assets.all_objects):
+                bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.collections.remove(entry.assets)
+        if entry.collection and not entry.collection.all_objects:
+            for child in list(entry.collection.children):
+                bpy.data.collections.remove(child)
+            bpy.data.collections.remove(entry.collection)
+
+        index = list(props.characters).index(entry)
+        props.characters.remove(index)
+        # nothing to save for the removed one, switch straight to a neighbour
+        props.character_uid = -1
+        props.active_character_index = max(0, index - 1)
+        switcher.invalidate()
+        # driver paths hold list indices
+        if props.use_drivers:
+            drivers.apply(scene)
+        return {'FINISHED'}
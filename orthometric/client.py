@@ -0,0 +1,55 @@
+import getpass
+import json
+import os
+import sys
+import tempfile
+from multiprocessing.connection import Client
+
+# local client for the command server (server.py), plain python, no blender needed
+# commands are json objects {"cmd": name, ...}, a list of them is sent as one batch
+#
+#   python orthometric/client.py '{"cmd": "ping"}'
+#   python orthometric/client.py '[{"cmd": "add_view", "type": "FRONT", "image": "/shots/front.jpg"},
+#                                  {"cmd": "set_view", "view": 0, "fov": 85}]'
+#   echo '{"cmd": "list_views"}' | python orthometric/client.py
+#
+# every command gets a reply {"ok": true, "result": ..} or {"ok": false, "error": ".."} (plus a "warning" when
+# a calibration it stored could not be written), the exit code is 1 when any of them failed, 2 when no server answers. ORTHOMETRIC_SERVER overrides the address
+
+
+def default_address():
+    # unix socket in the temp folder, a named pipe on windows, one per user
+    if "ORTHOMETRIC_SERVER" in os.environ:
+        return os.environ["ORTHOMETRIC_SERVER"]
+    user = "".join(c for c in getpass.getuser() if c.isalnum()) or "user"
+    if sys.platform == "win32":
+        return rf"\\.\pipe\orthometric-{user}"
+    return os.path.join(tempfile.gettempdir(), f"orthometric-{user}.sock")
+
+
+def family(address):
+    return 'AF_PIPE' if address.startswith("\\\\") else 'AF_UNIX'
+
+
+def send(commands, address=None):
+    # one command (dict) or a batch (list), returns the reply / list of replies
+    address = address or default_address()
+    with Client(address, family(address)) as conn:
+        conn.send_bytes(json.dumps(commands).encode())
+        return json.loads(conn.recv_bytes())
+
+
+def main(argv):
+    text = " ".join(argv) if argv else sys.stdin.read()
+    try:
+        replies = send(json.loads(text))
+    except OSError as err:
+        print(f"No OrthoMetric command server at {default_address()} ({err})", file=sys.stderr)
+        return 2
+    print(json.dumps(replies, indent=1))
+    replies = replies if isinstance(replies, list) else [replies]
+    return 0 if all(reply.get('ok') for reply in replies) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
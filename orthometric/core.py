@@ -0,0 +1,390 @@
+import collections
+import numpy as np
+
+# bpy-free calibration math
+# everything takes plain arrays/lists so it can run outside blender,
+# leading dims are batch dims so a whole library of views solves in one call
+
+# head height the rigs are built around
+HEAD_PIVOT = (0.0, 0.0, 1.47)
+
+# per view type solve settings (matches OrthoViewItem.view_type)
+# dist_axes: axes used to measure anchor distance
+# scale_axes: world axes the image gets scaled on
+# move_axes: world axes the image is allowed to move on
+VIEW_AXES = {
+    'FRONT': {'dist_axes': (1, 0, 1), 'scale_axes': (1, 0, 1), 'move_axes': (0, 0, 1)},
+    'SIDE': {'dist_axes': (1, 1, 1), 'scale_axes': (1, 1, 1), 'move_axes': (0, 1, 1)},
+    'CUSTOM': {'dist_axes': (1, 1, 1), 'scale_axes': (1, 1, 1), 'move_axes': (1, 1, 1)},
+    'SEQUENCE': {'dist_axes': (1, 1, 1), 'scale_axes': (1, 1, 1), 'move_axes': (1, 1, 1)},
+}
+
+# smallest dup distance we still trust
+MIN_DIST = 0.0001
+
+
+def _vec3(a):
+    return np.asarray(a, dtype=np.float64)
+
+
+def solve_two_point(anchor_a, anchor_b, dup_a, dup_b, pivot=HEAD_PIVOT,
+                    dist_axes=(1, 1, 1), move_axes=(1, 1, 1)):
+    # two-point calibration: scale the dups about pivot so their distance
+    # matches the anchors, then offset so their midpoints meet
+    # inputs are (..., 3), returns scale (...) and offset (..., 3)
+    # scale is nan where the dups are too close to solve
+    anchor_a, anchor_b = _vec3(anchor_a), _vec3(anchor_b)
+    dup_a, dup_b = _vec3(dup_a), _vec3(dup_b)
+    pivot = _vec3(pivot)
+    dist_axes = _vec3(dist_axes)
+    move_axes = _vec3(move_axes)
+
+    dist_target = np.linalg.norm((anchor_a - anchor_b) * dist_axes, axis=-1)
+    dist_current = np.linalg.norm((dup_a - dup_b) * dist_axes, axis=-1)
+
+    valid = dist_current >= MIN_DIST
+    scale = np.where(valid, dist_target / np.where(valid, dist_current, 1.0), np.nan)
+
+    # midpoint of the dups after scaling about pivot
+    mid_target = (anchor_a + anchor_b) / 2
+    mid_current = pivot + scale[..., None] * ((dup_a + dup_b) / 2 - pivot)
+
+    offset = (mid_target - mid_current) * move_axes
+    return scale, offset
+
+
+def calibration_matrix(scale, offset, pivot=HEAD_PIVOT, scale_axes=(1, 1, 1)):
+    # world space transform for a solved calibration, (..., 4, 4)
+    # new_world = transform @ old_world
+    scale = _vec3(scale)
+    offset = _vec3(offset)
+    pivot = np.broadcast_to(_vec3(pivot), offset.shape)
+    scale_axes = _vec3(scale_axes)
+
+    # per axis factor, untouched axes stay at 1
+    factors = 1.0 + (scale[..., None] - 1.0) * scale_axes
+
+    mat = np.zeros(offset.shape[:-1] + (4, 4))
+    mat[..., 0, 0] = factors[..., 0]
+    mat[..., 1, 1] = factors[..., 1]
+    mat[..., 2, 2] = factors[..., 2]
+    mat[..., 3, 3] = 1.0
+    # scale about pivot then move: t = pivot + offset - factors * pivot
+    mat[..., :3, 3] = pivot + offset - factors * pivot
+    return mat
+
+
+def apply_transform(transform, matrices):
+    # batched transform @ matrix
+    return np.matmul(_vec3(transform), _vec3(matrices))
+
+
+def calibrate(matrices, anchor_a, anchor_b, dup_a, dup_b, view_type='CUSTOM', pivot=HEAD_PIVOT):
+    # solve and apply in one go, matrices are the current image world matrices
+    # returns (new matrices, scale); rows that could not be solved are left untouched
+    axes = VIEW_AXES[view_type]
+    scale, offset = solve_two_point(anchor_a, anchor_b, dup_a, dup_b, pivot,
+                                    axes['dist_axes'], axes['move_axes'])
+    solved = np.isfinite(scale)
+    safe_scale = np.where(solved, scale, 1.0)
+    safe_offset = np.where(solved[..., None], offset, 0.0)
+
+    transform = calibration_matrix(safe_scale, safe_offset, pivot, axes['scale_axes'])
+    return apply_transform(transform, matrices), scale
+
+
+# n-landmark similarity fit
+# result of fit_similarity, every field keeps the batch dims
+# matrix: (..., 4, 4) world transform, new_world = matrix @ old_world
+# scale/angle: (...), angle is the in-plane rotation in radians
+# offset: (..., 3), residuals: (..., K) in-plane error per landmark after the fit
+SimilarityFit = collections.namedtuple('SimilarityFit', 'matrix scale angle offset residuals')
+
+# fit planes for the fixed views, rows are the in-plane world axes (u, v)
+VIEW_PLANES = {
+    'FRONT': ((1.0, 0.0, 0.0), (0.0, 0.0, 1.0)),
+    'SIDE': ((0.0, 1.0, 0.0), (0.0, 0.0, 1.0)),
+}
+
+
+def view_basis(view_type, image_matrices=None):
+    # (..., 2, 3) fit plane for a view, custom views use the image's own x/y axes
+    if view_type in VIEW_PLANES:
+        return np.array(VIEW_PLANES[view_type])
+
+    mats = _vec3(image_matrices)
+    axes = np.swapaxes(mats[..., :3, :2], -1, -2)
+    return axes / np.linalg.norm(axes, axis=-1, keepdims=True)
+
+
+def fit_similarity(src, dst, basis, pivot=HEAD_PIVOT, weights=None, rotate=False,
+                   scale_axes=(1, 1, 1), move_axes=(1, 1, 1)):
+    # best fit similarity moving src landmarks (dups) onto dst landmarks (anchors)
+    # src/dst: (..., K, 3), basis: (..., 2, 3), pivot: (..., 3), weights: (..., K)
+    # scale & rotation are solved in the basis plane about pivot, zero weights mark
+    # missing landmarks. without rotate the scale matches the rms spread, so two
+    # landmarks give the same result as solve_two_point
+    src, dst = _vec3(src), _vec3(dst)
+    basis = _vec3(basis)
+    pivot = _vec3(pivot)
+    if weights is None:
+        weights = np.ones(src.shape[:-1])
+    weights = _vec3(weights)
+
+    batch = np.broadcast_shapes(src.shape[:-2], dst.shape[:-2], basis.shape[:-2],
+                                pivot.shape[:-1], weights.shape[:-1])
+    basis = np.broadcast_to(basis, batch + (2, 3))
+    pivot = np.broadcast_to(pivot, batch + (3,))
+
+    w_sum = np.maximum(weights.sum(axis=-1), 1e-12)
+    w = weights[..., None]
+
+    # weighted centroids in 3d
+    src_mean = (src * w).sum(axis=-2) / w_sum[..., None]
+    dst_mean = (dst * w).sum(axis=-2) / w_sum[..., None]
+
+    # centered in-plane coords as complex numbers u + iv
+    src_2d = np.einsum('...kj,...ij->...ki', src - src_mean[..., None, :], basis)
+    dst_2d = np.einsum('...kj,...ij->...ki', dst - dst_mean[..., None, :], basis)
+    p = src_2d[..., 0] + 1j * src_2d[..., 1]
+    q = dst_2d[..., 0] + 1j * dst_2d[..., 1]
+
+    spread = (weights * np.abs(p) ** 2).sum(axis=-1)
+    valid = spread >= MIN_DIST ** 2
+    spread = np.where(valid, spread, 1.0)
+
+    if rotate:
+        # least squares scaled rotation q ~ z * p
+        z = (weights * np.conj(p) * q).sum(axis=-1) / spread
+        scale = np.abs(z)
+        angle = np.angle(z)
+    else:
+        scale = np.sqrt((weights * np.abs(q) ** 2).sum(axis=-1) / spread)
+        angle = np.zeros(batch)
+
+    scale = np.where(valid, scale, np.nan)
+    safe_scale = np.where(valid, scale, 1.0)
+    angle = np.where(valid, angle, 0.0)
+
+    # linear part: scaled rotation in plane, scale_axes decides the normal
+    cos, sin = np.cos(angle), np.sin(angle)
+    rot_2d = np.stack([np.stack([cos, -sin], -1), np.stack([sin, cos], -1)], -2)
+    normal = np.cross(basis[..., 0, :], basis[..., 1, :])
+    normal_scale = 1.0 + (safe_scale - 1.0) * (normal ** 2 * _vec3(scale_axes)).sum(axis=-1)
+
+    linear = safe_scale[..., None, None] * np.einsum('...ai,...ab,...bj->...ij', basis, rot_2d, basis)
+    linear = linear + normal_scale[..., None, None] * normal[..., :, None] * normal[..., None, :]
+
+    # move the fitted centroid onto the target one along the allowed axes
+    moved_mean = pivot + np.einsum('...ij,...j->...i', linear, src_mean - pivot)
+    offset = (dst_mean - moved_mean) * _vec3(move_axes)
+    offset = np.where(valid[..., None], offset, 0.0)
+
+    mat = np.zeros(batch + (4, 4))
+    mat[..., :3, :3] = linear
+    mat[..., :3, 3] = pivot + offset - np.einsum('...ij,...j->...i', linear, pivot)
+    mat[..., 3, 3] = 1.0
+
+    # in-plane error left per landmark
+    moved = np.einsum('...ij,...kj->...ki', mat[..., :3, :3], src) + mat[..., None, :3, 3]
+    err_2d = np.einsum('...kj,...ij->...ki', moved - dst, basis)
+    residuals = np.linalg.norm(err_2d, axis=-1)
+
+    return SimilarityFit(mat, scale, angle, offset, residuals)
+
+
+# joint multi-view solve
+
+# views need this many landmarks before their orientation is re-solved
+MIN_ORIENT_LANDMARKS = 4
+
+# result of solve_joint
+# transforms: (V, 4, 4), rotations: (V, 3, 3) orientation change of each view's plane
+# landmarks: (K, 3) solved shared positions, residuals: (V, K) in-plane error (0 if unmarked)
+JointSolve = collections.namedtuple('JointSolve', 'transforms rotations landmarks residuals')
+
+
+def rotate_about(rotation, pivot):
+    # (..., 4, 4) rotation about a world pivot
+    rotation = _vec3(rotation)
+    pivot = np.broadcast_to(_vec3(pivot), rotation.shape[:-2] + (3,))
+    mat = np.zeros(rotation.shape[:-2] + (4, 4))
+    mat[..., :3, :3] = rotation
+    mat[..., :3, 3] = pivot - np.einsum('...ij,...j->...i', rotation, pivot)
+    mat[..., 3, 3] = 1.0
+    return mat
+
+
+def transform_points(matrices, points):
+    # (..., 4, 4) applied to (..., K, 3)
+    matrices = _vec3(matrices)
+    return np.einsum('...ij,...kj->...ki', matrices[..., :3, :3], _vec3(points)) + matrices[..., None, :3, 3]
+
+
+def weak_perspective_axes(points, coords, weights):
+    # orthographic camera orientation from 3d landmarks and their 2d plane coords
+    # points: (..., K, 3), coords: (..., K, 2), weights: (..., K)
+    # returns axes (..., 2, 3) with orthonormal rows and ok (...) for solvable rows
+    points, coords, weights = _vec3(points), _vec3(coords), _vec3(weights)
+    w = weights[..., None]
+    w_sum = np.maximum(weights.sum(axis=-1), 1e-12)[..., None, None]
+    pc = points - (points * w).sum(axis=-2, keepdims=True) / w_sum
+    cc = coords - (coords * w).sum(axis=-2, keepdims=True) / w_sum
+
+    # linear 2x3 camera by least squares, then snap its rows to scaled orthonormal
+    xtx = np.einsum('...ki,...kj->...ij', pc * w, pc)
+    xty = np.einsum('...ki,...kj->...ij', pc * w, cc)
+    enough = (weights > 0).sum(axis=-1) >= MIN_ORIENT_LANDMARKS
+    ok = enough & (np.linalg.cond(xtx) < 1e6)
+
+    safe_xtx = np.where(ok[..., None, None], xtx, np.eye(3))
+    cam = np.swapaxes(np.linalg.solve(safe_xtx, xty), -1, -2)
+    u, _, vt = np.linalg.svd(cam, full_matrices=False)
+    return np.matmul(u, vt), ok
+
+
+def solve_joint(features, weights, anchors, bases, pivots, scale_axes, move_axes,
+                orient=None, orient_pivots=HEAD_PIVOT, anchor_weight=0.1,
+                rotate=False, iterations=100, tol=1e-7):
+    # fit every view of a character together against shared landmarks
+    # features: (V, K, 3) current world pos of each view's marked photo features
+    # weights: (V, K) 1 where a view marked the landmark, anchors: (K, 3)
+    # bases/pivots/scale_axes/move_axes: per view fit settings as in fit_similarity
+    # orient: (V,) views whose plane orientation may change (rotated about orient_pivots)
+    # alternates per view similarity fits with a least squares update of the shared landmarks,
+    # anchor_weight pulls them back to the anchors and fixes the overall scale/height
+    # stops once the landmarks move less than tol, returns a JointSolve (new_world = transforms @ old_world)
+    features, weights = _vec3(features), _vec3(weights)
+    anchors = _vec3(anchors)
+    bases = _vec3(bases).copy()
+    views = features.shape[0]
+    if orient is None:
+        orient = np.zeros(views, dtype=bool)
+    orient = np.asarray(orient, dtype=bool)
+
+    transforms = np.broadcast_to(np.eye(4), (views, 4, 4)).copy()
+    rotations = np.broadcast_to(np.eye(3), (views, 3, 3)).copy()
+    landmarks = anchors.copy()
+    points = features.copy()
+
+    for _ in range(iterations):
+        # a. re-orient free views so the landmarks project onto their marks
+        if orient.any():
+            coords = np.einsum('vkj,vij->vki', points, bases)
+            axes, ok = weak_perspective_axes(landmarks[None], coords, weights)
+            ok &= orient
+
+            normals = np.cross(bases[:, 0], bases[:, 1])
+            new_axes = np.where(ok[:, None, None], axes, bases)
+            new_normals = np.cross(new_axes[:, 0], new_axes[:, 1])
+            old_frame = np.concatenate([bases, normals[:, None]], axis=1)
+            new_frame = np.concatenate([new_axes, new_normals[:, None]], axis=1)
+            delta = np.matmul(np.swapaxes(new_frame, -1, -2), old_frame)
+
+            step = rotate_about(delta, orient_pivots)
+            points = transform_points(step, points)
+            transforms = np.matmul(step, transforms)
+            rotations = np.matmul(delta, rotations)
+            bases = new_axes
+
+        # b. in-plane similarity per view
+        fit = fit_similarity(points, landmarks[None], bases, pivots, weights, rotate,
+                             scale_axes, move_axes)
+        points = transform_points(fit.matrix, points)
+        transforms = np.matmul(fit.matrix, transforms)
+
+        # c. shared landmarks: each view pins the in-plane part of its marks
+        proj = np.einsum('vai,vaj->vij', bases, bases)
+        lhs = np.einsum('vk,vij->kij', weights, proj) + anchor_weight * np.eye(3)
+        rhs = np.einsum('vk,vij,vkj->ki', weights, proj, points) + anchor_weight * anchors
+        new_landmarks = np.linalg.solve(lhs, rhs[..., None])[..., 0]
+        moved = np.abs(new_landmarks - landmarks).max() if landmarks.size else 0.0
+        landmarks = new_landmarks
+        if moved < tol:
+            break
+
+    err = np.einsum('vkj,vij->vki', points - landmarks[None], bases)
+    residuals = np.linalg.norm(err, axis=-1) * (weights > 0)
+    return JointSolve(transforms, rotations, landmarks, residuals)
+
+
+# perspective distance estimate for custom views
+
+# framing the rigs are built with: 50mm lens at 2m
+BASE_LENS = 50.0
+BASE_DIST = 2.0
+
+# result of estimate_distance
+# distance: camera to image plane, fit: SimilarityFit moving the photo onto the
+# perspective projection at that distance, rms: weighted rms error, ok: well conditioned
+PerspectiveFit = collections.namedtuple('PerspectiveFit', 'distance fit rms ok')
+
+
+def _perspective_cost(distances, x_t, x_n, c_t, features, weights, basis, plane_point, rotate):
+    # project landmarks through a camera at each distance onto the plane, then fit the photo to it
+    ratio = distances[:, None] / (distances[:, None] - x_n[None])
+    proj = c_t + ratio[..., None] * (x_t[None] - c_t)
+    dst = plane_point + np.einsum('dka,ai->dki', proj, basis)
+    fit = fit_similarity(features, dst, basis, plane_point, weights, rotate)
+    cost = (weights * fit.residuals ** 2).sum(axis=-1)
+    return cost, fit
+
+
+def estimate_distance(landmarks, features, plane_point, basis, camera, weights=None,
+                      rotate=False, samples=256, max_dist=50.0):
+    # camera distance that best explains the photo's perspective
+    # landmarks: (K, 3) 3d positions, features: (K, 3) where the photo shows them on the
+    # image plane (plane_point, basis (2, 3)), camera: current camera position.
+    # the camera only slides along the plane normal. scans the distance on a log grid
+    # in one batched fit and refines the best sample with a parabola
+    landmarks, features = _vec3(landmarks), _vec3(features)
+    plane_point, basis, camera = _vec3(plane_point), _vec3(basis), _vec3(camera)
+    if weights is None:
+        weights = np.ones(len(landmarks))
+    weights = _vec3(weights)
+
+    normal = np.cross(basis[0], basis[1])
+    rel = landmarks - plane_point
+    x_t = rel @ basis.T
+    x_n = rel @ normal
+    c_t = (camera - plane_point) @ basis.T
+
+    # camera has to stay in front of every landmark
+    near = max(x_n[weights > 0].max(initial=0.0), 0.0) + 0.05
+    grid = np.geomspace(near, max(max_dist, near * 2), samples)
+    args = (x_t, x_n, c_t, features, weights, basis, plane_point, rotate)
+    cost, _ = _perspective_cost(grid, *args)
+    best = int(np.argmin(cost))
+
+    # parabola through the neighbours in log distance
+    distance = grid[best]
+    if 0 < best < samples - 1:
+        y0, y1, y2 = cost[best - 1:best + 2]
+        l0, l1, l2 = np.log(grid[best - 1:best + 2])
+        denom = y0 - 2 * y1 + y2
+        if denom > 0:
+            distance = float(np.exp(l1 + 0.5 * (l1 - l0) * (y0 - y2) / denom))
+
+    final_cost, fit = _perspective_cost(np.array([distance]), *args)
+    fit = SimilarityFit(*(field[0] for field in fit))
+    rms = float(np.sqrt(final_cost[0] / max(weights.sum(), 1e-12)))
+
+    # a flat cost curve means the landmarks have no usable depth spread
+    spread = cost.max() - cost.min()
+    ok = bool(0 < best < samples - 1 and spread > 1e-3 * max(cost.max(), 1e-12))
+    return PerspectiveFit(float(distance), fit, rms, ok)
+
+
+def framing_lens(distance, lens_min=10.0, lens_max=200.0, offset_min=-2.0, offset_max=5.0):
+    # focal length & dist offset that put the camera at distance while keeping the
+    # default framing, same dolly rule as the sliders: dist = (lens / 50) * (2 + offset)
+    # the offset only takes over once the lens is clamped and stays in its slider range,
+    # past both the camera lands short of / beyond distance (dolly_distance tells where)
+    lens = min(max(distance * BASE_LENS / BASE_DIST, lens_min), lens_max)
+    offset = min(max(distance * BASE_LENS / lens - BASE_DIST, offset_min), offset_max)
+    return lens, offset
+
+
+def dolly_distance(lens, offset):
+    # camera distance the sliders give for a lens & offset
+    return lens / BASE_LENS * (BASE_DIST + offset)
@@ -0,0 +1,115 @@
+import math
+
+# optional native drivers ("Use Drivers", lobby) for the dolly zoom and the stage 3 master rotation
+# the rig reads the scene props itself through simple expressions (no python, no auto run needed),
+# so scrubbing a slider is a depsgraph update instead of an update callback + view layer update,
+# and the rigs keep following the sliders with the add-on disabled or on a render farm:
+# variables read id property paths (["orthometric"]["front_cam_y"]), which resolve without the
+# add-on's registered types, so every value they read is written as an id property first
+# all characters keep their drivers, front / side views of inactive characters read the settings
+# saved on their character entry and are re-targeted when a switch moves them to the scene props
+
+# same rule as the update callbacks: distance = (fl / 50) * (2 + offset)
+DOLLY = "fl / 50.0 * (2.0 + off)"
+
+ROOT = '["orthometric"]'
+
+
+def _drive(id_data, path, index, expression, scene, **variables):
+    # (re)build one driver, variables are scene prop paths
+    id_data.driver_remove(path, index)
+    fcurve = id_data.driver_add(path, index)
+    driver = fcurve.driver
+    driver.type = 'SCRIPTED'
+    driver.expression = expression
+    for name, prop_path in variables.items():
+        var = driver.variables.new()
+        var.name = name
+        var.type = 'SINGLE_PROP'
+        target = var.targets[0]
+        target.id_type = 'SCENE'
+        target.id = scene
+        target.data_path = prop_path
+    return fcurve
+
+
+def _prop_path(owner, path, key):
+    # id property path of owner[key], the value is stored raw so the path exists
+    if key not in owner:
+        owner[key] = getattr(owner, key)
+    return f'{path}["{key}"]'
+
+
+def settings_owner(props, item):
+    # (owner, path) of the front / side settings a view reads: the scene props while its
+    # character is active, its character entry otherwise
+    if item.character != props.character_uid:
+        for i, entry in enumerate(props.characters):
+            if entry.uid == item.character:
+                return entry, f'{ROOT}["characters"][{i}]'
+    return props, ROOT
+
+
+def drive_view(scene, item, index=None):
+    # lens + camera distance of one view follow its sliders, index: the item's list index
+    cam = item.obj_cam
+    if not (cam and cam.data):
+        return
+    props = scene.orthometric
+    if item.view_type in ('FRONT', 'SIDE'):
+        owner, path = settings_owner(props, item)
+        keys, axis = (('focal_length_front', 'front_cam_y'), 1) if item.view_type == 'FRONT' else \
+                     (('focal_length_side', 'side_cam_x'), 0)
+    else:
+        # custom views: per item values, camera distance is local z under the minor
+        if index is None:
+            index = list(props.custom_views).index(item)
+        owner, path, keys, axis = item, f'{ROOT}["custom_views"][{index}]', ('fov', 'dist_off'), 2
+    fl, off = (_prop_path(owner, path, key) for key in keys)
+    _drive(cam.data, "lens", -1, "fl", scene, fl=fl)
+    _drive(cam, "location", axis, DOLLY, scene, fl=fl, off=off)
+
+
+def release_view(item):
+    cam = item.obj_cam
+    if cam and cam.data:
+        cam.data.driver_remove("lens")
+        cam.driver_remove("location")
+
+
+def drive_master(scene, item):
+    # stage 3 sliders are shared by all custom views, only the view being configured is driven
+    master = item.obj_master
+    if master:
+        props = scene.orthometric
+        _drive(master, "rotation_euler", 0, "radians(x)", scene, x=_prop_path(props, ROOT, 'stage_3_rot_x'))
+        _drive(master, "rotation_euler", 2, "radians(z)", scene, z=_prop_path(props, ROOT, 'stage_3_rot_z'))
+
+
+def release_master(props, item):
+    # leaving the view: drop its drivers and keep the rotation it was left at
+    master = item.obj_master if item else None
+    if master and master.animation_data and master.animation_data.drivers.find("rotation_euler", index=0):
+        master.driver_remove("rotation_euler")
+        master.rotation_euler.x = math.radians(props.stage_3_rot_x)
+        master.rotation_euler.z = math.radians(props.stage_3_rot_z)
+
+
+def apply(scene):
+    # drivers on every view of every character, again after a view / character removal
+    # since the paths hold list indices
+    for index, item in enumerate(scene.orthometric.custom_views):
+        drive_view(scene, item, index)
+
+
+def retarget(scene, uid):
+    # front / side views of one character after its settings moved between its entry and the scene props
+    props = scene.orthometric
+    for index, item in enumerate(props.custom_views):
+        if item.character == uid and item.view_type in ('FRONT', 'SIDE'):
+            drive_view(scene, item, index)
+
+
+def clear(scene):
+    for item in scene.orthometric.custom_views:
+        release_view(item)
@@ -0,0 +1,64 @@
+import bpy
+import mathutils
+
+# rig objects built straight through bpy.data: no operators, no active object
+# read back, no context needed, so building works from timers and background runs
+# new objects get their matrix_world written at once (like object.empty_add did),
+# parent inverses taken right after creation therefore match the old behaviour
+
+
+def _place(obj, location, rotation, scale):
+    obj.matrix_world = mathutils.Matrix.LocRotScale(location, mathutils.Euler(rotation), scale)
+
+
+def new_empty(name, display='PLAIN_AXES', location=(0, 0, 0), rotation=(0, 0, 0),
+              size=1.0, scale=(1, 1, 1), collection=None):
+    obj = bpy.data.objects.new(name, None)
+    obj.empty_display_type = display
+    obj.empty_display_size = size
+    (collection or bpy.context.scene.collection).objects.link(obj)
+    _place(obj, location, rotation, scale)
+    return obj
+
+
+def new_image_empty(name, image=None, location=(0, 0, 0), rotation=(0, 0, 0), size=1.0, collection=None):
+    obj = new_empty(name, 'IMAGE', location, rotation, size, collection=collection)
+    obj.empty_image_offset = (-0.5, -0.5)
+    obj.data = image
+    return obj
+
+
+def new_camera(name, lens=50.0, location=(0, 0, 0), rotation=(0, 0, 0), collection=None):
+    cam_data = bpy.data.cameras.new(name=name)
+    cam_data.lens = lens
+    obj = bpy.data.objects.new(name, cam_data)
+    (collection or bpy.context.scene.collection).objects.link(obj)
+    _place(obj, location, rotation, (1, 1, 1))
+    return obj
+
+
+def set_parent(obj, parent, keep_transform=True):
+    # keep_transform: parent inverse from the parent's current world matrix (ctrl+p)
+    # otherwise the local transform is read in the parent's space as is
+    obj.parent = parent
+    if parent and keep_transform:
+        obj.matrix_parent_inverse = parent.matrix_world.inverted()
+    else:
+        obj.matrix_parent_inverse = mathutils.Matrix.Identity(4)
+
+
+def clear_parent(obj, keep_transform=True):
+    world = obj.matrix_world.copy()
+    obj.parent = None
+    if keep_transform:
+        obj.matrix_world = world
+
+
+def select_only(view_layer, objs, active=None):
+    # deselect everything, select objs, make active (first of objs by default)
+    for obj in list(view_layer.objects.selected):
+        obj.select_set(False)
+    for obj in objs:
+        obj.select_set(True)
+    if objs:
+        view_layer.objects.active = active or objs[0]
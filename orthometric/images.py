@@ -0,0 +1,416 @@
+import bpy
+import hashlib
+import os
+import mathutils
+import numpy as np
+from bpy.app.handlers import persistent
+from . import analysis
+
+# openimageio ships with blender 3.5+, it decodes proxies on the loader's worker thread
+# without it the original is decoded by blender on the main thread as before
+try:
+    import OpenImageIO as oiio
+except ImportError:
+    oiio = None
+
+# blender side of reference images: loading, pixel access and image empty geometry
+
+# images loaded through load_image store the content hash of their file here
+HASH_KEY = "om_hash"
+PLACEHOLDER_NAME = "OM_Loading"
+
+
+# files are keyed by their size and SAMPLES evenly spaced chunks (first and last included),
+# never more than SAMPLES * SAMPLE_CHUNK bytes read, smaller files are hashed whole
+SAMPLES = 16
+SAMPLE_CHUNK = 1 << 16
+
+# (path, size, mtime) -> digest, a file is read once per session unless it changes
+_hashes = {}
+# digest -> name of the loaded image, filled by load_image, rebuilt by one scan when stale
+_loaded = {}
+_index = {'valid': False}
+
+
+def file_hash(filepath):
+    # content key of a file, the same bytes under any path or name give the same key
+    # None when the file can't be read (packed or moved)
+    path = bpy.path.abspath(filepath)
+    try:
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key in _hashes:
+            return _hashes[key]
+        digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+        with open(path, 'rb') as f:
+            if stat.st_size <= SAMPLES * SAMPLE_CHUNK:
+                digest.update(f.read())
+            else:
+                for i in range(SAMPLES):
+                    f.seek((stat.st_size - SAMPLE_CHUNK) * i // (SAMPLES - 1))
+                    digest.update(f.read(SAMPLE_CHUNK))
+    except OSError:
+        return None
+    _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def _reindex():
+    _loaded.clear()
+    _loaded.update({image[HASH_KEY]: image.name for image in bpy.data.images if HASH_KEY in image})
+    _index['valid'] = True
+
+
+def find_loaded(digest):
+    # image already loaded from a file with these bytes
+    if digest is None:
+        return None
+    if not _index['valid']:
+        _reindex()
+    name = _loaded.get(digest)
+    if name is None:
+        return None
+    image = bpy.data.images.get(name)
+    if image is None or image.get(HASH_KEY) != digest:
+        # renamed or removed since it was indexed
+        _reindex()
+        image = bpy.data.images.get(_loaded.get(digest, ""))
+    return image
+
+
+@persistent
+def on_file_change(_):
+    # load / undo swap the datablocks out from under the index
+    _index['valid'] = False
+
+
+def decode_file(filepath, max_edge):
+    # worker thread, no bpy: (width, height, rgba proxy pixels or None when it needs none)
+    # of a file, None when openimageio is missing or can't read it
+    if oiio is None or not max_edge:
+        return None
+    source = oiio.ImageInput.open(filepath)
+    if not source:
+        return None
+    try:
+        spec = source.spec()
+        if max(spec.width, spec.height) <= max_edge:
+            return spec.width, spec.height, None
+        pixels = source.read_image("float")
+    finally:
+        source.close()
+    if pixels is None:
+        return None
+
+    # rows top first in the file, bottom first in blender
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(spec.height, spec.width, -1)[::-1]
+    pixels, _ = analysis.reduce_to(pixels, max_edge)
+    pixels = _to_rgba(pixels)
+    if spec.format.basetype in (oiio.BASETYPE.HALF, oiio.BASETYPE.FLOAT, oiio.BASETYPE.DOUBLE):
+        pixels[..., :3] = _srgb_encode(pixels[..., :3])
+    return spec.width, spec.height, pixels
+
+
+def prepare(filepath, max_edge=0):
+    # worker thread: everything load_image needs from the file, (digest, decoded)
+    return file_hash(filepath), decode_file(filepath, max_edge)
+
+
+def load_image(filepath, max_edge=0, digest=None, decoded=None):
+    # image datablock for a reference file, None if blender can't read it
+    # the same path or the same bytes under another path reuse the loaded datablock
+    # max_edge > 0: the viewport proxy is returned when the file is bigger
+    # digest, decoded: prepare(filepath) when a worker already read the file, the original is
+    # then never decoded here (its size and the proxy pixels come from the worker)
+    if digest is None:
+        digest = file_hash(filepath)
+    image = find_loaded(digest)
+    if image is None:
+        try:
+            image = bpy.data.images.load(filepath, check_existing=True)
+        except RuntimeError:
+            return None
+        if digest:
+            image[HASH_KEY] = digest
+            _loaded[digest] = image.name
+
+    if not max_edge:
+        return image
+    # an existing proxy first, asking the original for its size would load its pixels
+    proxy = proxy_image(image)
+    if proxy != image:
+        return proxy
+    if decoded:
+        return store_proxy(image, decoded[2]) if decoded[2] is not None else image
+    if image.size[0] and max(image.size) > max_edge:
+        return make_proxy(image, max_edge)
+    return image
+
+
+def placeholder():
+    # small grey image shown by a view while its file loads
+    image = bpy.data.images.get(PLACEHOLDER_NAME)
+    if image is None:
+        image = bpy.data.images.new(PLACEHOLDER_NAME, 8, 8)
+        image.generated_color = (0.5, 0.5, 0.5, 1.0)
+    return image
+
+
+def proxy_edge(props):
+    # longest proxy edge from the scene settings, 0 when proxies are off
+    return props.proxy_max_edge if props.use_proxies else 0
+
+
+def read_pixels(image):
+    # whole pixel buffer in one foreach_get, (H, W, C) float32, row 0 at the bottom
+    width, height = image.size
+    buf = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(buf)
+    return buf.reshape(height, width, image.channels)
+
+
+def _aspect(width, height):
+    if not (width and height):
+        return 1.0, 1.0
+    longest = max(width, height)
+    return width / longest, height / longest
+
+
+def image_aspect(image):
+    # drawn width/height of an image empty relative to its display size
+    return _aspect(*image.size)
+
+
+def image_to_local(img_obj, u, v):
+    # local point of a view image at normalized image coords (u from left, v from bottom)
+    # sheet cards are built like an image empty with the default offset, over their crop
+    if img_obj.type == 'EMPTY':
+        asp_x, asp_y = image_aspect(img_obj.data) if img_obj.data else (1.0, 1.0)
+        size = img_obj.empty_display_size
+        off_x, off_y = img_obj.empty_image_offset
+    else:
+        asp_x, asp_y = _aspect(*object_size(img_obj))
+        size = img_obj.get(CARD_SIZE_KEY, 1.0)
+        off_x, off_y = -0.5, -0.5
+    return mathutils.Vector(((off_x + u) * size * asp_x, (off_y + v) * size * asp_y, 0.0))
+
+
+def image_to_world(img_obj, u, v):
+    return img_obj.matrix_world @ image_to_local(img_obj, u, v)
+
+
+def row_heights(img_obj, rows):
+    # world z of each pixel row center of an image empty, bottom row first
+    bottom = image_to_world(img_obj, 0.5, 0.0).z
+    top = image_to_world(img_obj, 0.5, 1.0).z
+    return bottom + (top - bottom) * (np.arange(rows) + 0.5) / rows
+
+
+## Sheet cards
+
+# custom props of a card: normalized (u0, v0, u1, v1) crop and display size
+CARD_CROP_KEY = "om_crop"
+CARD_SIZE_KEY = "om_size"
+
+
+def object_image(obj):
+    # image shown by a view object: data of an image empty, texture of a card
+    if obj is None:
+        return None
+    if obj.type == 'EMPTY':
+        return obj.data
+    mat = obj.active_material
+    if mat and mat.node_tree:
+        for node in mat.node_tree.nodes:
+            if node.type == 'TEX_IMAGE':
+                return node.image
+    return None
+
+
+def object_crop(obj):
+    return tuple(obj.get(CARD_CROP_KEY, (0.0, 0.0, 1.0, 1.0)))
+
+
+def object_size(obj):
+    # pixel width/height of the part of the image a view object shows
+    image = object_image(obj)
+    if not image:
+        return 0, 0
+    u0, v0, u1, v1 = object_crop(obj)
+    return image.size[0] * (u1 - u0), image.size[1] * (v1 - v0)
+
+
+def is_loading(obj):
+    # the view still shows the grey placeholder of a background import
+    image = object_image(obj)
+    return image is not None and image.name == PLACEHOLDER_NAME
+
+
+def has_pixels(obj):
+    # pixels of the view's own image, the loading placeholder has none worth analysing
+    image = object_image(obj)
+    return bool(image and image.size[0]) and not is_loading(obj)
+
+
+def object_pixels(obj):
+    # pixels a view object shows, a view into the one buffer for cards
+    pixels = read_pixels(object_image(obj))
+    u0, v0, u1, v1 = object_crop(obj)
+    h, w = pixels.shape[:2]
+    return pixels[round(v0 * h):round(v1 * h), round(u0 * w):round(u1 * w)]
+
+
+def card_material(name, image):
+    # emission material of one card, never shared: show_full swaps the image of the card's
+    # own texture node, the other cards of the sheet keep their proxy (the image is still shared)
+    mat = bpy.data.materials.new(f"OM_Card_{name}")
+    mat.use_nodes = True
+    nodes, links = mat.node_tree.nodes, mat.node_tree.links
+    nodes.clear()
+    tex = nodes.new('ShaderNodeTexImage')
+    tex.image = image
+    emit = nodes.new('ShaderNodeEmission')
+    out = nodes.new('ShaderNodeOutputMaterial')
+    links.new(tex.outputs['Color'], emit.inputs['Color'])
+    links.new(emit.outputs['Emission'], out.inputs['Surface'])
+    return mat
+
+
+def make_card(img_obj, image, crop):
+    # swap an image empty for a quad showing only crop of image, keeping its name,
+    # parent and transform. image empties can't crop, the card does it with uvs
+    # so every view cut from a sheet shares the one pixel buffer
+    name = img_obj.name
+    size = img_obj.empty_display_size
+    u0, v0, u1, v1 = crop
+    asp_x, asp_y = _aspect(image.size[0] * (u1 - u0), image.size[1] * (v1 - v0))
+    hx, hy = 0.5 * size * asp_x, 0.5 * size * asp_y
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata([(-hx, -hy, 0), (hx, -hy, 0), (hx, hy, 0), (-hx, hy, 0)], [], [(0, 1, 2, 3)])
+    uv = mesh.uv_layers.new()
+    uv.data.foreach_set("uv", (u0, v0, u1, v0, u1, v1, u0, v1))
+    mesh.materials.append(card_material(name, image))
+
+    card = bpy.data.objects.new(name + "_card", mesh)
+    for col in img_obj.users_collection:
+        col.objects.link(card)
+    card.rotation_mode = img_obj.rotation_mode
+    card.parent = img_obj.parent
+    card.matrix_parent_inverse = img_obj.matrix_parent_inverse.copy()
+    card.matrix_basis = img_obj.matrix_basis.copy()
+    card[CARD_CROP_KEY] = tuple(crop)
+    card[CARD_SIZE_KEY] = size
+
+    bpy.data.objects.remove(img_obj, do_unlink=True)
+    card.name = name
+    return card
+
+
+## Viewport proxies
+
+# proxy images store the name of their full resolution original under this key
+PROXY_FULL_KEY = "om_full"
+PROXY_SUFFIX = "_proxy"
+
+
+def _srgb_encode(rgb):
+    # linear float pixels to display values so the proxy fits in 8 bits
+    rgb = np.clip(rgb, 0.0, 1.0)
+    return np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * np.power(rgb, 1 / 2.4) - 0.055)
+
+
+def _to_rgba(pixels):
+    # any channel count to the rgba layout of bpy.data.images.new
+    h, w, c = pixels.shape
+    rgba = np.ones((h, w, 4), dtype=np.float32)
+    color = pixels[..., :3] if c >= 3 else np.repeat(pixels[..., :1], 3, axis=-1)
+    rgba[..., :3] = color
+    if c in (2, 4):
+        rgba[..., 3] = pixels[..., -1]
+    return rgba
+
+
+def proxy_pixels(image, max_edge):
+    # (H, W, 4) display pixels of image, longest edge at most max_edge (decodes the original)
+    pixels, _ = analysis.reduce_to(read_pixels(image), max_edge)
+    pixels = _to_rgba(pixels)
+    if image.is_float:
+        pixels[..., :3] = _srgb_encode(pixels[..., :3])
+    return pixels
+
+
+def make_proxy(image, max_edge):
+    # 8 bit viewport copy of image
+    return store_proxy(image, proxy_pixels(image, max_edge))
+
+
+def fill_proxy(proxy, pixels):
+    # (re)write a proxy's pixels, eg. after a file load left it blank
+    h, w = pixels.shape[:2]
+    if tuple(proxy.size) != (w, h):
+        proxy.scale(w, h)
+    proxy.pixels.foreach_set(pixels.ravel())
+
+
+def store_proxy(image, pixels):
+    # proxy datablock from (H, W, 4) display pixels
+    # not packed: the .blend only keeps its size, loader.refill_proxies makes the pixels again from the
+    # original on file load, so a library of views doesn't carry a second copy of every photo
+    # the original keeps a fake user with its pixels freed until show_full swaps it in
+    h, w = pixels.shape[:2]
+    proxy = bpy.data.images.new(image.name + PROXY_SUFFIX, w, h, alpha=True)
+    proxy.pixels.foreach_set(pixels.ravel())
+    proxy[PROXY_FULL_KEY] = image.name
+
+    image.use_fake_user = True
+    image.buffers_free()
+    return proxy
+
+
+def is_proxy(image):
+    return image is not None and PROXY_FULL_KEY in image
+
+
+def full_image(image):
+    # full resolution original of a proxy, the image itself otherwise
+    if is_proxy(image):
+        return bpy.data.images.get(image[PROXY_FULL_KEY]) or image
+    return image
+
+
+def proxy_image(image):
+    # viewport proxy of a full resolution image, the image itself if it has none
+    for other in bpy.data.images:
+        if other.get(PROXY_FULL_KEY) == image.name:
+            return other
+    return image
+
+
+def set_object_image(obj, image):
+    if obj.type == 'EMPTY':
+        obj.data = image
+        return
+    mat = obj.active_material
+    if mat and mat.users > 1:
+        # cards of files from before every card had its own material
+        mat = obj.active_material = mat.copy()
+    if mat and mat.node_tree:
+        for node in mat.node_tree.nodes:
+            if node.type == 'TEX_IMAGE':
+                node.image = image
+
+
+def show_full(obj, full=True):
+    # swap a view image between its proxy and the original, returns False if nothing changed
+    # the original's pixels are freed again when the proxy comes back
+    image = object_image(obj)
+    if image is None:
+        return False
+    target = full_image(image) if full else proxy_image(image)
+    if target == image:
+        return False
+    set_object_image(obj, target)
+    if not full:
+        image.buffers_free()
+    return True
@@ -0,0 +1,220 @@
+import bpy
+import math
+import os
+import struct
+from . import analysis, images, loader, registry, sequence, stage_one, stage_two, stage_three
+
+## Character Sheet
+
+def show_textures(context):
+    # cards draw through their material, solid viewports need texture colour to show them
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            shading = area.spaces[0].shading
+            if shading.type == 'SOLID':
+                shading.color_type = 'TEXTURE'
+
+class ORTHOMETRIC_OT_import_sheet(bpy.types.Operator):
+    # load one turnaround sheet and cut it into front, side & custom views
+    bl_idname = "orthometric.import_sheet"
+    bl_label = "Import Character Sheet"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+    panel_order: bpy.props.StringProperty(
+        name="Panel Order",
+        description="View type of each panel in reading order (left to right, top to bottom), extra panels become custom views",
+        default="FRONT, SIDE"
+    )
+
+    def execute(self, context):
+        props = context.scene.orthometric
+
+        if not stage_one.import_assets(self, context):
+            return {'CANCELLED'}
+        if not self.filepath: return {'CANCELLED'}
+
+        # the one image every view shares
+        image = images.load_image(self.filepath, images.proxy_edge(props))
+        if not (image and image.size[0]):
+            self.report({'ERROR'}, "Could not read the sheet image")
+            return {'CANCELLED'}
+
+        panels = analysis.find_panels(images.read_pixels(image))
+        if not panels:
+            self.report({'ERROR'}, "No panels found, the sheet needs transparent or plain gaps between drawings")
+            return {'CANCELLED'}
+
+        order = [token.strip().upper() for token in self.panel_order.split(",")]
+        built = 0
+        for i, crop in enumerate(panels):
+            view_type = order[i] if i < len(order) else 'CUSTOM'
+
+            # primary views only once, a second front/side panel is left out
+            if view_type in ('FRONT', 'SIDE') and registry.primary(props, view_type):
+                continue
+            if view_type == 'FRONT':
+                item, img_obj = stage_one.build_front_view(context, image)
+                props.has_front = True
+            elif view_type == 'SIDE':
+                item, img_obj = stage_two.build_side_view(context, image)
+                props.has_side = True
+            else:
+                item, img_obj = stage_three.build_custom_view(context, image)
+
+            # the card replaces the empty, the view points at the card
+            item.obj_img = images.make_card(img_obj, image, crop)
+            built += 1
+
+        stage_one.camera_viewports(context)
+        show_textures(context)
+
+        props.stage = 'START'
+        self.report({'INFO'}, f"Sheet split into {built} views ({len(panels)} panels found)")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+## Batch Import
+
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.tif', '.tiff', '.exr', '.hdr', '.bmp', '.tga', '.webp'}
+
+# exif tags that carry free text: ImageDescription, XPTitle, XPComment, XPKeywords, XPSubject
+EXIF_TEXT_TAGS = {0x010E, 0x9C9B, 0x9C9C, 0x9C9E, 0x9C9F}
+
+
+def exif_text(filepath):
+    # free text of a jpeg/tiff's first ifd (description, windows title/keywords/...)
+    # only the file head is read, "" when there is none
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(1 << 16)
+    except OSError:
+        return ""
+    if head[:2] == b'\xff\xd8':
+        start = head.find(b'Exif\x00\x00')
+        if start < 0:
+            return ""
+        tiff = head[start + 6:]
+    elif head[:4] in (b'II*\x00', b'MM\x00*'):
+        tiff = head
+    else:
+        return ""
+
+    endian = '<' if tiff[:2] == b'II' else '>'
+    texts = []
+    try:
+        ifd = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd:ifd + 2])[0]
+        for n in range(count):
+            entry = tiff[ifd + 2 + 12 * n:ifd + 14 + 12 * n]
+            tag, kind, length = struct.unpack(endian + 'HHI', entry[:8])
+            # ascii, byte (the XP tags, utf-16) or undefined
+            if tag not in EXIF_TEXT_TAGS or kind not in (1, 2, 7):
+                continue
+            if length <= 4:
+                data = entry[8:8 + length]
+            else:
+                at = struct.unpack(endian + 'I', entry[8:12])[0]
+                data = tiff[at:at + length]
+            text = data.decode('utf-16-le', 'ignore') if tag >= 0x9C9B else data.decode('latin-1')
+            texts.append(text.strip('\x00 '))
+    except struct.error:
+        pass
+    return " ".join(texts)
+
+
+def master_z(angle):
+    # stage 3 master z rotation (radians) looking at the head from angle
+    # front (0) is 180, side (90) is 90, the default custom rig (135) is a 3/4 view
+    return math.radians((180.0 - angle + 180.0) % 360.0 - 180.0)
+
+
+class ORTHOMETRIC_OT_import_batch(bpy.types.Operator):
+    # every picked file (or every image in the folder) becomes a view in one operation
+    bl_idname = "orthometric.import_batch"
+    bl_label = "Import Views"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    directory: bpy.props.StringProperty(subtype='DIR_PATH')
+    files: bpy.props.CollectionProperty(type=bpy.types.OperatorFileListElement)
+    filter_image: bpy.props.BoolProperty(default=True, options={'HIDDEN', 'SKIP_SAVE'})
+    filter_folder: bpy.props.BoolProperty(default=True, options={'HIDDEN', 'SKIP_SAVE'})
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        if not stage_one.import_assets(self, context):
+            return {'CANCELLED'}
+
+        names = [f.name for f in self.files if f.name]
+        if not names and os.path.isdir(self.directory):
+            # only a folder picked: take all of its images
+            names = [name for name in os.listdir(self.directory)
+                     if os.path.splitext(name)[1].lower() in IMAGE_EXTS]
+        if not names:
+            self.report({'ERROR'}, "No images selected")
+            return {'CANCELLED'}
+
+        built = {'FRONT': 0, 'SIDE': 0, 'CUSTOM': 0}
+        for path in sequence.frame_files(self.directory, names):
+            name = os.path.basename(path)
+            view_type, angle = analysis.classify(name, exif_text(path))
+
+            # a second front/side becomes a custom view at that angle
+            if view_type != 'CUSTOM' and registry.primary(props, view_type):
+                view_type = 'CUSTOM'
+
+            if view_type == 'FRONT':
+                loader.build_view(context, stage_one.build_front_view, path)
+                props.has_front = True
+            elif view_type == 'SIDE':
+                loader.build_view(context, stage_two.build_side_view, path)
+                props.has_side = True
+            else:
+                item, _ = loader.build_view(context, stage_three.build_custom_view, path)
+                item.name = os.path.splitext(name)[0]
+                master = item.obj_master
+                if master and angle is not None:
+                    master.rotation_euler.z = master_z(angle)
+            built[view_type] += 1
+
+        stage_one.camera_viewports(context)
+        props.stage = 'START'
+        self.report({'INFO'}, f"Imported {sum(built.values())} views "
+                              f"({built['FRONT']} front, {built['SIDE']} side, {built['CUSTOM']} custom)")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class ORTHOMETRIC_OT_clear_load_errors(bpy.types.Operator):
+    # hide the list of files that could not be loaded
+    bl_idname = "orthometric.clear_load_errors"
+    bl_label = "Dismiss"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        loader.failures().clear()
+        return {'FINISHED'}
+
+## Viewport Proxies
+
+class ORTHOMETRIC_OT_full_resolution(bpy.types.Operator):
+    # swap the active view between its viewport proxy and the full resolution image
+    bl_idname = "orthometric.full_resolution"
+    bl_label = "Full Resolution"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        if len(props.custom_views) == 0: return {'CANCELLED'}
+
+        img_obj = registry.view_obj(registry.active(props), 'img')
+        image = images.object_image(img_obj)
+        if not images.show_full(img_obj, images.is_proxy(image)):
+            self.report({'INFO'}, "This view has no proxy image")
+            return {'CANCELLED'}
+        return {'FINISHED'}
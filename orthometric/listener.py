@@ -0,0 +1,123 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.connection import Client, Listener
+
+# transport of the command server (server.py), plain python, no blender needed
+# connection threads read json commands and queue them with a future each, the server's tick takes
+# them off in batches (take), runs them in the order they came and answers through the futures.
+# a client waits at most REPLY_TIMEOUT for its answers: blender skips timers while a modal
+# dialog or a long operator runs, a command that did not start by then is dropped
+
+REPLY_TIMEOUT = 30.0
+
+_listener = None
+_queue = queue.Queue()
+
+
+def running():
+    return _listener is not None
+
+
+def address():
+    return _listener.address if _listener else None
+
+
+## Queue
+
+def submit(command):
+    future = Future()
+    if isinstance(command, dict) and isinstance(command.get('cmd'), str):
+        _queue.put((command, future))
+    else:
+        future.set_result({'ok': False, 'error': "Commands are objects with a \"cmd\" name"})
+    return future
+
+
+def take(limit):
+    # up to limit queued (command, future), commands whose client gave up are skipped
+    batch = []
+    while len(batch) < limit:
+        try:
+            command, future = _queue.get_nowait()
+        except queue.Empty:
+            break
+        if future.set_running_or_notify_cancel():
+            batch.append((command, future))
+    return batch
+
+
+## Connection threads
+
+def _result(future, deadline):
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except TimeoutError:
+        # dropped unless the tick already took it
+        future.cancel()
+        return {'ok': False, 'error': f"Blender did not answer within {REPLY_TIMEOUT:g}s"}
+
+
+def _serve(conn):
+    # one client: read a command or a batch, wait for the tick, answer
+    with conn:
+        while _listener is not None:
+            try:
+                raw = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            try:
+                commands = json.loads(raw)
+            except ValueError as err:
+                reply = {'ok': False, 'error': f"Invalid json: {err}"}
+            else:
+                single = not isinstance(commands, list)
+                futures = [submit(command) for command in ([commands] if single else commands)]
+                deadline = time.monotonic() + REPLY_TIMEOUT
+                replies = [_result(future, deadline) for future in futures]
+                reply = replies[0] if single else replies
+            try:
+                conn.send_bytes(json.dumps(reply).encode())
+            except OSError:
+                return
+
+
+def _accept(listener):
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            return # closed
+        if _listener is not listener:
+            conn.close()
+            return
+        threading.Thread(target=_serve, args=(conn,), daemon=True).start()
+
+
+## Start / stop
+
+def start(path, family=None):
+    global _listener
+    if _listener:
+        return
+    _listener = Listener(path, family)
+    threading.Thread(target=_accept, args=(_listener,), daemon=True).start()
+
+
+def stop():
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    # accept() does not return on close everywhere, a last connection wakes it
+    try:
+        Client(listener.address).close()
+    except OSError:
+        pass
+    listener.close()
+
+    # whoever still waits gets an answer
+    for _, future in take(float('inf')):
+        future.set_result({'ok': False, 'error': "Server stopped"})
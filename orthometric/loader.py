@@ -0,0 +1,201 @@
+import bpy
+from bpy.app.handlers import persistent
+from concurrent.futures import ThreadPoolExecutor
+from . import calib_cache, images, residency
+
+# background image import: views are built straight away with a placeholder,
+# a worker thread reads & hashes each file and, with openimageio, decodes and reduces
+# it to its proxy (no bpy), a bpy.app.timers tick then only makes the datablocks of one
+# finished file per tick and puts it on its view, so the ui stays usable while a batch
+# streams in. without openimageio, or for files small enough to need no proxy, blender
+# still decodes the pixels on the main thread (when loading / first drawing them)
+# files that fail are listed in the panel (failures()) until dismissed or the next batch starts
+# proxies are not packed into the .blend, on file load the same queue decodes their originals again
+
+TICK = 0.05
+
+_pool = ThreadPoolExecutor(max_workers=2)
+_jobs = []
+_progress = {'done': 0, 'total': 0}
+# (filepath, reason) of the files the current / last batch could not load
+_failed = []
+
+
+def queue(img_obj, filepath, max_edge=0, then=None):
+    # show the placeholder on img_obj and load filepath behind it
+    # then(image) runs on the main thread once the image is attached
+    images.set_object_image(img_obj, images.placeholder())
+    if not _jobs:
+        _failed.clear()
+    filepath = bpy.path.abspath(filepath)
+    _jobs.append({
+        'obj': img_obj.name,
+        'filepath': filepath,
+        'max_edge': max_edge,
+        'then': then,
+        'prepared': _pool.submit(images.prepare, filepath, max_edge),
+    })
+    _progress['total'] += 1
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=TICK)
+
+
+def refill(proxy):
+    # decode the original of a proxy left blank by a file load and put its pixels back
+    full = images.full_image(proxy)
+    filepath = bpy.path.abspath(full.filepath) if full != proxy else ""
+    if not filepath:
+        return
+    if not _jobs:
+        _failed.clear()
+    max_edge = max(proxy.size)
+    _jobs.append({
+        'proxy': proxy.name,
+        'filepath': filepath,
+        'max_edge': max_edge,
+        'prepared': _pool.submit(images.decode_file, filepath, max_edge),
+    })
+    _progress['total'] += 1
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=TICK)
+
+
+def refill_proxies():
+    # packed proxies of older files still have their pixels
+    for image in bpy.data.images:
+        if images.is_proxy(image) and not image.packed_file:
+            refill(image)
+
+
+@persistent
+def on_load_post(_):
+    # jobs of the file that was closed point at objects that are gone
+    cancel()
+    refill_proxies()
+    if bpy.context.scene:
+        residency.measure(bpy.context.scene.orthometric)
+
+
+def read_ahead(filepath, max_edge=0):
+    # prepare filepath on the worker for a load coming soon, the future's result goes to load_image
+    return _pool.submit(images.prepare, bpy.path.abspath(filepath), max_edge)
+
+
+def failed(filepath, reason):
+    # shown in the panel, timers and worker results have no operator to report through
+    _failed.append((filepath, reason))
+
+
+def failures():
+    return _failed
+
+
+def build_view(context, build, filepath, then=None):
+    # build a view rig with build(context, image), its image loaded in the
+    # background when async import is on. then(image) runs once it is attached
+    props = context.scene.orthometric
+    max_edge = images.proxy_edge(props)
+
+    if not (props.async_import and filepath):
+        image = images.load_image(filepath, max_edge) if filepath else None
+        if filepath and image is None:
+            failed(filepath, "unreadable image")
+        item, img_obj = build(context, image)
+        residency.measure(context.scene.orthometric)
+        # a cached calibration of the same photo wins over the follow up (auto align)
+        if image and not calib_cache.restore_object(context.scene, img_obj, image) and then:
+            then(image)
+        return item, img_obj
+
+    item, img_obj = build(context, None)
+    queue(img_obj, filepath, max_edge, then)
+    return item, img_obj
+
+
+def progress():
+    # (done, total) of the current batch, None when nothing is loading
+    if not _jobs:
+        return None
+    return _progress['done'], _progress['total']
+
+
+def _redraw():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
+def window_override():
+    # a window with a 3d view for follow ups that call operators from the timer
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                return {'window': window, 'area': area}
+    return {}
+
+
+def _finish(job):
+    # main thread: decode, attach, follow up
+    _progress['done'] += 1
+    img_obj = bpy.data.objects.get(job['obj'])
+    if img_obj is None:
+        return # view removed while its file was read
+    digest, decoded = job['prepared'].result()
+    image = images.load_image(job['filepath'], job['max_edge'], digest, decoded)
+    if image is None:
+        failed(job['filepath'], "unreadable image")
+        return
+    images.set_object_image(img_obj, image)
+    if calib_cache.restore_object(bpy.context.scene, img_obj, image):
+        return
+    if job['then']:
+        with bpy.context.temp_override(**window_override()):
+            job['then'](image)
+
+
+def _refill(job):
+    # main thread: pixels from the worker, or blender decodes the original when openimageio can't
+    _progress['done'] += 1
+    proxy = bpy.data.images.get(job['proxy'])
+    if proxy is None:
+        return
+    decoded = job['prepared'].result()
+    if decoded and decoded[2] is not None:
+        images.fill_proxy(proxy, decoded[2])
+        return
+    full = images.full_image(proxy)
+    # asking for the size loads the original, (0, 0) when the file is gone
+    if full == proxy or not full.size[0]:
+        failed(job['filepath'], "original missing, its proxy stays blank")
+        return
+    images.fill_proxy(proxy, images.proxy_pixels(full, job['max_edge']))
+    full.buffers_free()
+
+
+def _tick():
+    done = next((job for job in _jobs if job['prepared'].done()), None)
+    if done:
+        _jobs.remove(done)
+        try:
+            (_refill if 'proxy' in done else _finish)(done)
+        except Exception as err:
+            # one bad file must not stop the rest of the batch
+            failed(done['filepath'], str(err))
+        _redraw()
+
+    if _jobs:
+        return TICK
+    # the batch is in, the panels show the memory it takes
+    if bpy.context.scene:
+        residency.measure(bpy.context.scene.orthometric)
+    _progress['done'] = _progress['total'] = 0
+    return None
+
+
+def cancel():
+    # drop everything still queued (unregister / new file)
+    _jobs.clear()
+    _progress['done'] = _progress['total'] = 0
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
@@ -0,0 +1,243 @@
+import bpy
+import json
+import math
+import mathutils
+import os
+from . import calibration, characters, images, importers, registry, sequence, stage_one, stage_two, stage_three
+
+# json manifest of one character: settings, anchors and every view with its image path(s),
+# lens, master rotation, calibrated image transform and landmarks
+# rebuilding it makes the same rigs the stages make (nothing is re-solved), image paths are
+# kept relative to the manifest when they sit below it, so a folder of photos + manifest moves as one
+# batch.py builds many manifests in background blender processes
+
+VERSION = 1
+
+# per character scalar settings, same set the character switch swaps
+SETTINGS = tuple(key for key in characters.SAVED if key not in ('active_view_index', 'shown_collection'))
+
+
+def portable(path, base_dir):
+    # path relative to the manifest folder when it is below it, absolute otherwise
+    path = os.path.abspath(bpy.path.abspath(path))
+    try:
+        rel = os.path.relpath(path, base_dir)
+    except ValueError:
+        return path # another drive
+    return path if rel.startswith("..") else rel.replace(os.sep, "/")
+
+
+def resolve(path, base_dir):
+    return os.path.normpath(os.path.join(base_dir, path))
+
+
+def image_path(img_obj):
+    # file behind a view object (the original of a proxy), "" for generated / missing images
+    image = images.full_image(images.object_image(img_obj))
+    if image is None or image.name == images.PLACEHOLDER_NAME:
+        return ""
+    return image.filepath
+
+
+def view_entry(item, base_dir):
+    img_obj = item.obj_img
+    master = item.obj_master
+    entry = {'name': item.name, 'type': item.view_type}
+
+    if item.view_type == 'SEQUENCE':
+        entry['frames'] = [portable(frame.filepath, base_dir) for frame in item.frames]
+        entry['start_angle'] = item.seq_start_angle
+        entry['reverse'] = item.seq_reverse
+    else:
+        path = image_path(img_obj)
+        entry['image'] = portable(path, base_dir) if path else ""
+        if img_obj and img_obj.type != 'EMPTY':
+            entry['crop'] = list(images.object_crop(img_obj))
+
+    # front / side lenses are character settings
+    if item.view_type not in ('FRONT', 'SIDE'):
+        entry['fov'] = item.fov
+        entry['dist_off'] = item.dist_off
+    if master:
+        entry['rotation'] = list(master.rotation_euler)
+    if img_obj:
+        entry['matrix'] = [list(row) for row in img_obj.matrix_world]
+    entry['landmarks'] = {landmark.name: list(landmark.co) for landmark in item.landmarks}
+    return entry
+
+
+def export(scene, base_dir):
+    # manifest dict of the active character
+    props = scene.orthometric
+    entry = registry.character(props)
+    views = registry.character_views(props)
+    indices = [idx for idx, _ in views]
+    return {
+        'version': VERSION,
+        'character': entry.name if entry else "",
+        'settings': {key: getattr(props, key) for key in SETTINGS},
+        'anchors': {key: list(obj.matrix_world.translation) for key, obj in calibration.get_anchors()},
+        'active_view': indices.index(props.active_view_index) if props.active_view_index in indices else 0,
+        'views': [view_entry(item, base_dir) for _, item in views],
+    }
+
+
+def build_view(context, entry, base_dir):
+    # one rig from its manifest entry, returns (item, missing image count)
+    props = context.scene.orthometric
+    view_type = entry.get('type', 'CUSTOM')
+    missing = 0
+
+    image = None
+    if entry.get('image'):
+        image = images.load_image(resolve(entry['image'], base_dir), images.proxy_edge(props))
+        missing += image is None
+
+    if view_type == 'FRONT':
+        item, img_obj = stage_one.build_front_view(context, image)
+    elif view_type == 'SIDE':
+        item, img_obj = stage_two.build_side_view(context, image)
+    else:
+        item, img_obj = stage_three.build_custom_view(context, image)
+    item.name = entry.get('name', item.name)
+
+    # sheet views are cards over the one shared image
+    if image and 'crop' in entry:
+        img_obj = item.obj_img = images.make_card(img_obj, image, entry['crop'])
+
+    if view_type == 'SEQUENCE':
+        item.view_type = 'SEQUENCE'
+        for path in entry.get('frames', []):
+            item.frames.add().filepath = resolve(path, base_dir)
+        item["seq_start_angle"] = entry.get('start_angle', 0.0)
+        item["seq_reverse"] = entry.get('reverse', False)
+
+    # lens through the item props, their callbacks (or drivers) place the camera
+    if 'fov' in entry:
+        item.fov = entry['fov']
+        item.dist_off = entry['dist_off']
+
+    # master first, the image transform is stored in world space
+    master = item.obj_master
+    if master and 'rotation' in entry:
+        master.rotation_euler = entry['rotation']
+    if 'matrix' in entry:
+        context.view_layer.update()
+        img_obj.matrix_world = mathutils.Matrix(entry['matrix'])
+
+    for key, co in entry.get('landmarks', {}).items():
+        landmark = item.landmarks.add()
+        landmark.name = key
+        landmark.co = co
+
+    if view_type == 'SEQUENCE' and item.frames and master:
+        sequence.show_angle(props, item, math.degrees(master.rotation_euler.z))
+    return item, missing
+
+
+def build(op, context, data, base_dir):
+    # rebuild a manifest, as a new character when the active one already has views
+    # returns the number of images that could not be read, None when nothing was built
+    scene = context.scene
+    props = scene.orthometric
+    if data.get('version', 0) > VERSION:
+        op.report({'ERROR'}, f"Manifest version {data.get('version')} is newer than this add-on")
+        return None
+
+    if registry.character_views(props):
+        characters.add(scene, data.get('character') or "Character")
+    if not stage_one.import_assets(op, context):
+        return None
+
+    # anchors as they were calibrated against
+    anchors = data.get('anchors', {})
+    for key, obj in calibration.get_anchors():
+        if key in anchors:
+            world = obj.matrix_world.copy()
+            world.translation = anchors[key]
+            obj.matrix_world = world
+
+    settings = data.get('settings', {})
+    for key in SETTINGS:
+        if key in settings:
+            setattr(props, key, settings[key])
+
+    missing = 0
+    first = len(props.custom_views)
+    for entry in data.get('views', []):
+        _, lost = build_view(context, entry, base_dir)
+        missing += lost
+
+    built = len(props.custom_views) - first
+    if built:
+        props.active_view_index = first + min(max(0, data.get('active_view', 0)), built - 1)
+    if context.screen:
+        importers.show_textures(context)
+    stage_one.camera_viewports(context)
+    props.stage = 'START'
+    return missing
+
+
+class ORTHOMETRIC_OT_export_manifest(bpy.types.Operator):
+    # write the active character's views, settings and calibration to a json manifest
+    bl_idname = "orthometric.export_manifest"
+    bl_label = "Export Manifest"
+    bl_options = {'REGISTER'}
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    @classmethod
+    def poll(cls, context):
+        return bool(registry.character_views(context.scene.orthometric))
+
+    def execute(self, context):
+        path = bpy.path.ensure_ext(bpy.path.abspath(self.filepath), ".json")
+        data = export(context.scene, os.path.dirname(path))
+        try:
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=1)
+        except OSError as err:
+            self.report({'ERROR'}, f"Could not write {path}: {err}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Exported {len(data['views'])} views to {os.path.basename(path)}")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if not self.filepath:
+            entry = registry.character(context.scene.orthometric)
+            self.filepath = characters.clean_name(entry.name if entry else "orthometric") + ".json"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+
+class ORTHOMETRIC_OT_import_manifest(bpy.types.Operator):
+    # rebuild a character from a json manifest
+    bl_idname = "orthometric.import_manifest"
+    bl_label = "Import Manifest"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    def execute(self, context):
+        path = bpy.path.abspath(self.filepath)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as err:
+            self.report({'ERROR'}, f"Could not read {path}: {err}")
+            return {'CANCELLED'}
+
+        missing = build(self, context, data, os.path.dirname(path))
+        if missing is None:
+            return {'CANCELLED'}
+        if missing:
+            self.report({'WARNING'}, f"{missing} images could not be read, their views were built empty")
+        else:
+            self.report({'INFO'}, f"Built {len(data.get('views', []))} views from {os.path.basename(path)}")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
@@ -0,0 +1,199 @@
+import bpy
+import functools
+import json
+import os
+import time
+from collections import deque
+from bpy.app.handlers import persistent
+from . import residency
+
+# opt-in instrumentation (debug panel, "Profile"), off it costs one flag check per call
+# every ORTHOMETRIC_OT_* execute / invoke / modal and every update callback of __init__ is wrapped,
+# a call records its wall time and the reference image memory after it (measured once per outermost
+# execute / invoke, update callbacks and modal events take the last measured figure), depsgraph_update_post
+# counts the updates (and the objects in them) that follow a call until the next one starts or
+# SETTLE seconds pass, blender evaluates most of an operator's changes after it returned
+# the last MAX_RECORDS calls are kept, the panel sums them per name, dump writes them as json lines
+
+MAX_RECORDS = 2000
+SETTLE = 0.5
+OPERATOR_METHODS = ('execute', 'invoke', 'modal')
+
+_enabled = False
+_records = deque(maxlen=MAX_RECORDS)
+# record the depsgraph updates are counted for, objects seen in them
+_last = {'record': None, 'objects': set()}
+# instrumented calls running, operators calling operators only measure memory once
+_depth = {'calls': 0}
+
+
+def enabled():
+    return _enabled
+
+
+def _start(name, kind):
+    record = {'name': name, 'kind': kind, 'time': time.time(), 'ms': 0.0,
+              'depsgraph': 0, 'objects': 0, 'image_mb': 0.0, 'end': None}
+    _records.append(record)
+    _last['record'] = record
+    _last['objects'] = set()
+    return record, time.perf_counter()
+
+
+def _finish(record, started, context):
+    record['ms'] = (time.perf_counter() - started) * 1000.0
+    record['end'] = time.perf_counter()
+    scene = getattr(context, "scene", None) or bpy.context.scene
+    if not scene:
+        return
+    if record['kind'] == 'operator' and not _depth['calls']:
+        size = residency.measure(scene.orthometric)
+    else:
+        size = residency.loaded_bytes(scene.orthometric)
+    record['image_mb'] = size / 1048576
+
+
+def _call(fn, name, kind, context, *args):
+    if not _enabled:
+        return fn(*args)
+    record, started = _start(name, kind)
+    _depth['calls'] += 1
+    try:
+        return fn(*args)
+    finally:
+        _depth['calls'] -= 1
+        _finish(record, started, context)
+
+
+def _wrap(fn, name, kind):
+    # blender checks the argument count of update callbacks and operator methods,
+    # so the wrappers spell theirs out: (self, context) or (self, context, event)
+    if getattr(fn, "_om_profiled", False):
+        return fn
+    if fn.__code__.co_argcount == 3:
+        def wrapper(self, context, event):
+            return _call(fn, name, kind, context, self, context, event)
+    else:
+        def wrapper(self, context):
+            return _call(fn, name, kind, context, self, context)
+    functools.update_wrapper(wrapper, fn)
+    wrapper._om_profiled = True
+    return wrapper
+
+
+def timed(fn):
+    # decorator for property update callbacks
+    return _wrap(fn, fn.__name__, 'update')
+
+
+def instrument(cls):
+    # wrap an operator class's methods in place, before it is registered
+    if cls.__name__.startswith("ORTHOMETRIC_OT_"):
+        for method in OPERATOR_METHODS:
+            fn = cls.__dict__.get(method)
+            if fn:
+                kind = 'modal' if method == 'modal' else 'operator'
+                setattr(cls, method, _wrap(fn, f"{cls.bl_idname}.{method}", kind))
+    return cls
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    record = _last['record']
+    if record is None:
+        return
+    # still running or recently finished
+    if record['end'] is not None and time.perf_counter() - record['end'] > SETTLE:
+        return
+    record['depsgraph'] += 1
+    objects = _last['objects']
+    objects.update(update.id.name for update in depsgraph.updates if isinstance(update.id, bpy.types.Object))
+    record['objects'] = len(objects)
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+    handlers = bpy.app.handlers.depsgraph_update_post
+    if on and on_depsgraph_update not in handlers:
+        handlers.append(on_depsgraph_update)
+    elif not on and on_depsgraph_update in handlers:
+        handlers.remove(on_depsgraph_update)
+
+
+def reset():
+    _records.clear()
+    _last['record'] = None
+    _last['objects'] = set()
+
+
+def summary():
+    # per name: calls, total / max ms, depsgraph updates, objects, slowest first
+    rows = {}
+    for record in _records:
+        row = rows.setdefault(record['name'], {'name': record['name'], 'calls': 0, 'total': 0.0, 'max': 0.0,
+                                               'depsgraph': 0, 'objects': 0})
+        row['calls'] += 1
+        row['total'] += record['ms']
+        row['max'] = max(row['max'], record['ms'])
+        row['depsgraph'] += record['depsgraph']
+        row['objects'] = max(row['objects'], record['objects'])
+    return sorted(rows.values(), key=lambda row: row['total'], reverse=True)
+
+
+def dump(path):
+    # appends, one json object per call, so runs over time can be compared
+    blend = os.path.basename(bpy.data.filepath) or "untitled"
+    with open(path, 'a') as f:
+        for record in _records:
+            line = {key: value for key, value in record.items() if key != 'end'}
+            line['blend'] = blend
+            f.write(json.dumps(line) + "\n")
+    return len(_records)
+
+
+class ORTHOMETRIC_OT_toggle_profiling(bpy.types.Operator):
+    # start / stop recording operator and update callback timings
+    bl_idname = "orthometric.toggle_profiling"
+    bl_label = "Profile"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        enable(not _enabled)
+        return {'FINISHED'}
+
+
+class ORTHOMETRIC_OT_reset_profile(bpy.types.Operator):
+    bl_idname = "orthometric.reset_profile"
+    bl_label = "Reset Profile"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        reset()
+        return {'FINISHED'}
+
+
+class ORTHOMETRIC_OT_dump_profile(bpy.types.Operator):
+    # append the recorded calls to a json lines file
+    bl_idname = "orthometric.dump_profile"
+    bl_label = "Dump Profile"
+    bl_options = {'REGISTER'}
+
+    filepath: bpy.props.StringProperty(subtype="FILE_PATH")
+    filter_glob: bpy.props.StringProperty(default="*.jsonl", options={'HIDDEN'})
+
+    def execute(self, context):
+        path = bpy.path.ensure_ext(bpy.path.abspath(self.filepath), ".jsonl")
+        try:
+            count = dump(path)
+        except OSError as err:
+            self.report({'ERROR'}, f"Could not write {path}: {err}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Wrote {count} calls to {os.path.basename(path)}")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = "orthometric_profile.jsonl"
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
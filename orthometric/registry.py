@@ -0,0 +1,222 @@
+import bpy
+import math
+from bpy.app.handlers import persistent
+
+# view registry: every list item points straight at its rig objects
+# (PointerProperty, survives renames and .001 clashes, no name lookups)
+# and a small runtime cache finds the front/side item without walking the list.
+# the cache checks itself on every lookup and is rebuilt on file load
+
+ROLES = ('master', 'minor', 'cam', 'img')
+
+# names the rigs had before items held pointers, read once when an old file loads
+LEGACY_NAMES = {
+    ('FRONT', 'master'): "OM_Master_Front",
+    ('FRONT', 'cam'): "Ortho_Cam_Front",
+    ('FRONT', 'img'): "Ref_Img_Front",
+    ('SIDE', 'master'): "OM_Master_Side",
+    ('SIDE', 'cam'): "Ortho_Cam_Side",
+    ('SIDE', 'img'): "Ref_Img_Side",
+}
+
+# (character, view type) -> index in custom_views of the primary views (runtime only)
+_primary = {}
+
+# every view rig lives in its own child collection of this one, switching views
+# flips two collections instead of walking every rig
+PARENT_COLLECTION = "OrthoMetric"
+
+# appended from assets/heads.blend, one per character
+ASSET_COLLECTION = "OM_Assets"
+
+
+def view_obj(item, role):
+    # rig object of a view: 'master', 'minor', 'cam' or 'img'
+    return getattr(item, "obj_" + role) if item else None
+
+
+def set_rig(item, **objs):
+    # point a view at its rig objects, eg. set_rig(item, master=m, img=i)
+    for role, obj in objs.items():
+        setattr(item, "obj_" + role, obj)
+
+
+def rebuild(props):
+    _primary.clear()
+    for idx, item in enumerate(props.custom_views):
+        if item.view_type in ('FRONT', 'SIDE'):
+            _primary.setdefault((item.character, item.view_type), idx)
+
+
+def primary(props, view_type):
+    # the front or side item of the active character, None if there is none
+    key = (props.character_uid, view_type)
+    idx = _primary.get(key)
+    views = props.custom_views
+    if idx is None or idx >= len(views) or views[idx].view_type != view_type or views[idx].character != key[0]:
+        # list changed since the last lookup (add/remove/undo/other scene)
+        rebuild(props)
+        idx = _primary.get(key)
+        if idx is None:
+            return None
+    return views[idx]
+
+
+def primary_obj(props, view_type, role):
+    return view_obj(primary(props, view_type), role)
+
+
+## Characters
+
+def character(props):
+    # entry of the active character, None while the file has a single (unnamed) one
+    for entry in props.characters:
+        if entry.uid == props.character_uid:
+            return entry
+    return None
+
+
+def namespace(props):
+    # object name prefix of the active character, "" for the first one (plain names)
+    entry = character(props)
+    return entry.namespace if entry else ""
+
+
+def character_views(props):
+    # (index, item) of the active character's views
+    uid = props.character_uid
+    return [(idx, item) for idx, item in enumerate(props.custom_views) if item.character == uid]
+
+
+def nearest_view(props, idx):
+    # index of the active character's view closest before idx (after it if none), 0 without any
+    views = [i for i, _ in character_views(props)]
+    before = [i for i in views if i < idx]
+    if before:
+        return before[-1]
+    return views[0] if views else 0
+
+
+def asset_collection(props):
+    # cage + anchors of the active character, None until they are appended
+    entry = character(props)
+    if entry:
+        return entry.assets
+    return bpy.data.collections.get(ASSET_COLLECTION)
+
+
+def active(props):
+    # active view, None when the list is empty or the index is on another character's view
+    if not props.custom_views:
+        return None
+    item = props.custom_views[min(props.active_view_index, len(props.custom_views) - 1)]
+    return item if item.character == props.character_uid else None
+
+
+def view_angle(item):
+    # degrees from the front towards the side (+x): front 0, side 90, custom views from the master z
+    if item.view_type == 'FRONT':
+        return 0.0
+    if item.view_type == 'SIDE':
+        return 90.0
+    master = item.obj_master
+    if master is None:
+        return 0.0
+    return (180.0 - math.degrees(master.rotation_euler.z) + 180.0) % 360.0 - 180.0
+
+
+def next_serial(props):
+    # monotonic view number for object names, never reused after removals
+    props.view_serial += 1
+    return props.view_serial
+
+
+def migrate(props):
+    # files from before the pointers: resolve the stored names once
+    for item in props.custom_views:
+        for role in ROLES:
+            if getattr(item, "obj_" + role) is None:
+                name = getattr(item, "obj_name_" + role) or LEGACY_NAMES.get((item.view_type, role), "")
+                obj = bpy.data.objects.get(name)
+                if obj:
+                    setattr(item, "obj_" + role, obj)
+    props.view_serial = max(props.view_serial, len(props.custom_views))
+
+
+## View Collections
+
+def parent_collection(scene):
+    col = bpy.data.collections.get(PARENT_COLLECTION)
+    if col is None:
+        col = bpy.data.collections.new(PARENT_COLLECTION)
+    if col.name not in scene.collection.children:
+        scene.collection.children.link(col)
+    return col
+
+
+def new_view_collection(scene, name):
+    # child collection for one view rig, builders link the rig objects into it
+    # (under the active character's collection once there are several)
+    col = bpy.data.collections.new(name)
+    entry = character(scene.orthometric)
+    parent = entry.collection if entry and entry.collection else parent_collection(scene)
+    parent.children.link(col)
+    return col
+
+
+def view_collection(scene, item):
+    # the view's collection, rigs from before collections are moved into one here (once)
+    if item.collection is None:
+        master = item.obj_master
+        if master is None:
+            return None
+        col = new_view_collection(scene, f"OM_View_{item.name}")
+        for obj in [master] + list(master.children_recursive):
+            for old in list(obj.users_collection):
+                old.objects.unlink(obj)
+            col.objects.link(obj)
+            obj.hide_viewport = False
+        item.collection = col
+    return item.collection
+
+
+def show_view(scene, item):
+    # hide the view shown so far, show this one: two writes whatever the view count
+    props = scene.orthometric
+    col = view_collection(scene, item)
+    shown = props.shown_collection
+    if shown and shown != col:
+        shown.hide_viewport = True
+    if col:
+        col.hide_viewport = False
+    props.shown_collection = col
+
+
+def remove_view_collection(item):
+    # drop the view's collection once the rig is gone (keeps anything the user put in it)
+    col = item.collection
+    if col and not col.all_objects:
+        bpy.data.collections.remove(col)
+
+
+def migrate_collections(scene):
+    # rigs from before view collections: one collection each, only the active one shown
+    props = scene.orthometric
+    if all(item.collection for item in props.custom_views):
+        return
+    for item in props.custom_views:
+        col = view_collection(scene, item)
+        if col:
+            col.hide_viewport = True
+    props.shown_collection = None
+    if props.custom_views:
+        show_view(scene, active(props))
+
+
+@persistent
+def on_load_post(_):
+    for scene in bpy.data.scenes:
+        migrate(scene.orthometric)
+        migrate_collections(scene)
+    if bpy.context.scene:
+        rebuild(bpy.context.scene.orthometric)
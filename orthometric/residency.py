@@ -0,0 +1,105 @@
+import bpy
+from collections import OrderedDict
+from . import images
+
+# keeps the pixels of the active view (plus a few recently used ones) loaded and
+# frees the buffers of every other view image that has a file or packed data to come back from:
+# blender reloads those the next time the image is drawn or its pixels are read.
+# proxies are not packed (their pixels only exist in memory, a freed one comes back blank),
+# so they are never freed, they are small by design
+# the memory figure the panels show is measured when enforce or a load runs, not on every redraw
+
+# image names of recently shown views, most recent last (runtime only)
+_recent = OrderedDict()
+# scene name -> bytes of managed image pixels in memory, as of the last measure
+_measured = {}
+
+
+def image_bytes(image):
+    # decoded buffer size of a loaded image, 0 when its pixels are not in memory
+    # (checked first, asking a freed image for its size loads it)
+    if not image.has_data:
+        return 0
+    width, height = image.size
+    return width * height * image.channels * (4 if image.is_float else 1)
+
+
+def view_images(item):
+    # image datablocks a view shows
+    image = images.object_image(item.obj_img)
+    return [image] if image else []
+
+
+def managed_images(props):
+    # every image shown by a view, plus the originals behind proxies
+    managed = {}
+    for item in props.custom_views:
+        for image in view_images(item):
+            managed[image.name] = image
+            full = images.full_image(image)
+            managed[full.name] = full
+    return managed
+
+
+def reloadable(image):
+    # freeing is safe: blender can decode the pixels again
+    return not (images.is_proxy(image) and not image.packed_file)
+
+
+def touch(item):
+    for image in view_images(item):
+        _recent.pop(image.name, None)
+        _recent[image.name] = True
+
+
+def resident_bytes(props):
+    return sum(image_bytes(image) for image in managed_images(props).values())
+
+
+def measure(props):
+    _measured[props.id_data.name] = resident_bytes(props)
+    return _measured[props.id_data.name]
+
+
+def loaded_bytes(props):
+    # last measured figure, cheap enough for draw()
+    return _measured.get(props.id_data.name, 0)
+
+
+def enforce(props, active=None):
+    # free every managed image outside the active view + resident_views most recent,
+    # recent ones only stay while they fit in the memory budget. returns bytes freed
+    budget = props.image_budget * 1024 * 1024
+    keep = {image.name for image in view_images(active)} if active else set()
+    used = sum(image_bytes(bpy.data.images[name]) for name in keep)
+
+    recent = 0
+    for name in reversed(list(_recent)):
+        image = bpy.data.images.get(name)
+        if image is None:
+            del _recent[name]
+            continue
+        if name in keep:
+            continue
+        if recent >= props.resident_views or used + image_bytes(image) > budget:
+            break
+        keep.add(name)
+        used += image_bytes(image)
+        recent += 1
+
+    freed = kept = 0
+    for name, image in managed_images(props).items():
+        size = image_bytes(image)
+        if name not in keep and size and reloadable(image):
+            freed += size
+            image.buffers_free()
+        else:
+            kept += size
+    _measured[props.id_data.name] = kept
+    return freed
+
+
+def activate(props, item):
+    # active view changed: it becomes most recent, everything else is trimmed
+    touch(item)
+    return enforce(props, item)
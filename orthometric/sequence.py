@@ -0,0 +1,105 @@
+import bpy
+import os
+import re
+from collections import OrderedDict
+from . import images, loader
+
+# turntable views: one rig and image object, the frame shown follows the stage 3
+# z rotation. frames load on demand into a small lru cache, the neighbours of the
+# shown frame are read ahead on the loader's worker so scrubbing stays smooth
+
+# filepath -> image name of loaded frames, most recently shown last (runtime only)
+_cache = OrderedDict()
+# filepath -> images.prepare future of a frame being read ahead
+_ahead = {}
+
+# frames read ahead on each side of the shown one
+READ_AHEAD = 2
+
+
+def frame_files(directory, names):
+    # full paths in natural order, frame_2 before frame_10
+    def key(name):
+        return [int(token) if token.isdigit() else token.lower() for token in re.split(r'(\d+)', name)]
+    return [os.path.join(directory, name) for name in sorted(names, key=key)]
+
+
+def frame_index(item, angle):
+    # nearest frame to a z rotation in degrees, frames evenly cover 360
+    count = len(item.frames)
+    offset = angle - item.seq_start_angle
+    if item.seq_reverse:
+        offset = -offset
+    return int(round(offset * count / 360.0)) % count
+
+
+def _drop(image):
+    # remove a cached frame and the original behind it if nothing else uses them
+    full = images.full_image(image)
+    bpy.data.images.remove(image)
+    if full != image and full.users <= int(full.use_fake_user):
+        bpy.data.images.remove(full)
+
+
+def get_frame(filepath, max_edge=0):
+    # image of a frame, from the cache or loaded now
+    name = _cache.pop(filepath, None)
+    image = bpy.data.images.get(name) if name else None
+    if image is None:
+        future = _ahead.pop(filepath, None)
+        digest, decoded = future.result() if future else (None, None)
+        image = images.load_image(filepath, max_edge, digest, decoded)
+        if image is None:
+            return None
+    _cache[filepath] = image.name
+    return image
+
+
+def trim(capacity):
+    # evict least recently shown frames nothing displays until capacity is met
+    for filepath in list(_cache):
+        if len(_cache) <= capacity:
+            break
+        image = bpy.data.images.get(_cache[filepath])
+        if image and image.users:
+            continue
+        del _cache[filepath]
+        if image:
+            _drop(image)
+
+
+def read_ahead(item, index, max_edge=0):
+    count = len(item.frames)
+    wanted = set()
+    for step in range(1, READ_AHEAD + 1):
+        for near in (index - step, index + step):
+            wanted.add(item.frames[near % count].filepath)
+    for filepath in list(_ahead):
+        if filepath not in wanted:
+            _ahead.pop(filepath).cancel()
+    for filepath in wanted:
+        if filepath not in _cache and filepath not in _ahead:
+            _ahead[filepath] = loader.read_ahead(filepath, max_edge)
+
+
+def show_angle(props, item, angle):
+    # put the frame nearest to angle on the view's image object
+    img_obj = item.obj_img
+    if not (item.frames and img_obj):
+        return
+    index = frame_index(item, angle)
+    image = get_frame(item.frames[index].filepath, images.proxy_edge(props))
+    if image is None:
+        return
+    item.seq_frame = index
+    if images.object_image(img_obj) != image:
+        images.set_object_image(img_obj, image)
+    trim(props.seq_cache_size)
+    read_ahead(item, index, images.proxy_edge(props))
+
+
+def clear():
+    _cache.clear()
+    for future in _ahead.values():
+        future.cancel()
+    _ahead.clear()
@@ -0,0 +1,290 @@
+import bpy
+import json
+import math
+import mathutils
+import os
+import traceback
+from multiprocessing.connection import Client
+from . import calib_cache, client, images, importers, listener, loader, manifest, registry, stage_one, stage_two, stage_three, switcher
+
+# optional local command server for pipeline tools (lobby, "Command Server")
+# listens on a unix socket / named pipe only (client.default_address, owner only), never on the network
+# connection threads only parse json and queue the commands, a bpy.app.timers tick applies them on the
+# main thread in batches: every command runs on its own in the order it was sent, the view layer is
+# updated and the viewports redrawn once per batch instead of once per command
+# the connection thread answers each command once its batch ran (or gives up after listener.REPLY_TIMEOUT),
+# listener.py is the bpy-free transport, client.py is the reference client
+
+TICK = 0.1
+BATCH = 64
+
+
+class CommandError(Exception):
+    pass
+
+
+class _Report:
+    # stands in for an operator where shared code reports errors
+    def __init__(self):
+        self.errors = []
+
+    def report(self, kind, message):
+        if 'ERROR' in kind:
+            self.errors.append(message)
+
+    def error(self):
+        return "; ".join(self.errors) or "failed"
+
+
+## Commands
+
+def find_view(props, ref):
+    # (list index, item) from a position in the character's views (as list_views numbers them) or a name
+    views = registry.character_views(props)
+    if isinstance(ref, int) and not isinstance(ref, bool):
+        if 0 <= ref < len(views):
+            return views[ref]
+    elif isinstance(ref, str):
+        for idx, item in views:
+            if item.name == ref:
+                return idx, item
+    raise CommandError(f"No view {ref!r}")
+
+
+def check_file(path):
+    if not (isinstance(path, str) and os.path.isfile(path)):
+        raise CommandError(f"No image file {path!r}")
+    return path
+
+
+def cmd_ping(context, args):
+    return {'blender': bpy.app.version_string, 'views': len(registry.character_views(context.scene.orthometric))}
+
+
+def cmd_list_views(context, args):
+    props = context.scene.orthometric
+    return [{'view': pos, 'name': item.name, 'type': item.view_type,
+             'image': manifest.image_path(item.obj_img), 'active': idx == props.active_view_index}
+            for pos, (idx, item) in enumerate(registry.character_views(props))]
+
+
+BUILDERS = {'FRONT': stage_one.build_front_view, 'SIDE': stage_two.build_side_view,
+            'CUSTOM': stage_three.build_custom_view}
+
+
+def cmd_add_view(context, args):
+    # {"type": FRONT / SIDE / CUSTOM, "image": path, "name": .., "angle": degrees (custom)}
+    props = context.scene.orthometric
+    view_type = str(args.get('type', 'CUSTOM')).upper()
+    if view_type not in BUILDERS:
+        raise CommandError(f"Unknown view type {view_type!r}")
+    if view_type != 'CUSTOM' and registry.primary(props, view_type):
+        raise CommandError(f"There already is a {view_type.lower()} view")
+    path = check_file(args['image']) if args.get('image') else ""
+
+    reporter = _Report()
+    if not stage_one.import_assets(reporter, context):
+        raise CommandError(reporter.error())
+
+    item, _ = loader.build_view(context, BUILDERS[view_type], path)
+    if view_type == 'FRONT':
+        props.has_front = True
+    elif view_type == 'SIDE':
+        props.has_side = True
+    if args.get('name'):
+        item.name = args['name']
+    if view_type == 'CUSTOM' and item.obj_master and args.get('angle') is not None:
+        item.obj_master.rotation_euler.z = importers.master_z(float(args['angle']))
+    return {'view': len(registry.character_views(props)) - 1, 'name': item.name}
+
+
+def cmd_set_image(context, args):
+    # {"view": .., "image": path}, a cached calibration of the new image is restored
+    props = context.scene.orthometric
+    _, item = find_view(props, args.get('view'))
+    img_obj = item.obj_img
+    if not img_obj or img_obj.type != 'EMPTY' or item.view_type == 'SEQUENCE':
+        raise CommandError("Only image views can swap their image (not sheet cards or turntables)")
+    path = check_file(args.get('image'))
+
+    max_edge = images.proxy_edge(props)
+    if props.async_import:
+        loader.queue(img_obj, path, max_edge)
+        return {'queued': True}
+    image = images.load_image(path, max_edge)
+    if image is None:
+        raise CommandError(f"Could not read {path}")
+    images.set_object_image(img_obj, image)
+    return {'restored': calib_cache.restore_object(context.scene, img_obj, image)}
+
+
+def cmd_set_view(context, args):
+    # {"view": .., "name", "fov", "dist_off", "rotation": master xyz degrees, "matrix": image world 4x4,
+    #  "landmarks": {key: [u, v]}, "store": put the result in the calibration cache}, any subset
+    props = context.scene.orthometric
+    _, item = find_view(props, args.get('view'))
+    if 'name' in args:
+        item.name = args['name']
+    if 'fov' in args or 'dist_off' in args:
+        fov, dist_off = calib_cache.view_lens(props, item)
+        calib_cache.set_view_lens(props, item, float(args.get('fov', fov)), float(args.get('dist_off', dist_off)))
+
+    master = item.obj_master
+    if 'rotation' in args:
+        if not master:
+            raise CommandError("View has no master")
+        master.rotation_euler = [math.radians(a) for a in args['rotation']]
+    if 'matrix' in args:
+        # world space, against the master as just written
+        if 'rotation' in args:
+            context.view_layer.update()
+        item.obj_img.matrix_world = mathutils.Matrix(args['matrix'])
+    if 'landmarks' in args:
+        item.landmarks.clear()
+        for key, co in args['landmarks'].items():
+            landmark = item.landmarks.add()
+            landmark.name = key
+            landmark.co = co
+    if args.get('store'):
+        # written once for the whole batch (apply)
+        calib_cache.store(context.scene, item, write=False)
+    return {'name': item.name}
+
+
+def cmd_select_view(context, args):
+    props = context.scene.orthometric
+    idx, _ = find_view(props, args.get('view'))
+    switcher.switch(context, idx)
+    return {}
+
+
+def cmd_import_manifest(context, args):
+    path = bpy.path.abspath(args.get('path', ""))
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as err:
+        raise CommandError(f"Could not read {path}: {err}")
+    reporter = _Report()
+    missing = manifest.build(reporter, context, data, os.path.dirname(path))
+    if missing is None:
+        raise CommandError(reporter.error())
+    return {'views': len(data.get('views', [])), 'missing_images': missing}
+
+
+def cmd_export_manifest(context, args):
+    path = bpy.path.abspath(args.get('path', ""))
+    data = manifest.export(context.scene, os.path.dirname(path))
+    try:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1)
+    except OSError as err:
+        raise CommandError(f"Could not write {path}: {err}")
+    return {'views': len(data['views'])}
+
+
+COMMANDS = {
+    'ping': cmd_ping,
+    'list_views': cmd_list_views,
+    'add_view': cmd_add_view,
+    'set_image': cmd_set_image,
+    'set_view': cmd_set_view,
+    'select_view': cmd_select_view,
+    'import_manifest': cmd_import_manifest,
+    'export_manifest': cmd_export_manifest,
+}
+
+
+## Main thread
+
+def run(context, command):
+    handler = COMMANDS.get(command['cmd'])
+    if handler is None:
+        return {'ok': False, 'error': f"Unknown command {command['cmd']!r}"}
+    try:
+        return {'ok': True, 'result': handler(context, command)}
+    except CommandError as err:
+        return {'ok': False, 'error': str(err)}
+    except Exception as err:
+        # a broken command must not stop the server, the caller gets the traceback
+        return {'ok': False, 'error': f"Command {command['cmd']} failed: {err!r}",
+                'traceback': traceback.format_exc()}
+
+
+def apply(batch):
+    # run in order, one view layer update for the lot
+    with bpy.context.temp_override(**loader.window_override()):
+        context = bpy.context
+        replies = [(command, run(context, command), future) for command, future in batch]
+        # calibrations stored by the batch go to disk in one write
+        error = calib_cache.save()
+        for command, reply, future in replies:
+            if error and command.get('store') and reply['ok']:
+                reply['warning'] = error
+            future.set_result(reply)
+        context.view_layer.update()
+        switcher.redraw(context)
+
+
+def _tick():
+    batch = listener.take(BATCH)
+    if batch:
+        apply(batch)
+    return TICK if listener.running() else None
+
+
+## Start / stop
+
+def running():
+    return listener.running()
+
+
+def address():
+    return listener.address() or client.default_address()
+
+
+def start(path=None):
+    if listener.running():
+        return
+    path = path or client.default_address()
+    family = client.family(path)
+    if family == 'AF_UNIX' and os.path.exists(path):
+        # left over from a crash unless another blender answers on it
+        try:
+            Client(path, family).close()
+        except OSError:
+            os.remove(path)
+        else:
+            raise CommandError(f"{path} is in use by another Blender")
+
+    listener.start(path, family)
+    if family == 'AF_UNIX':
+        os.chmod(path, 0o600)
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=TICK, persistent=True)
+
+
+def stop():
+    listener.stop()
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
+
+
+class ORTHOMETRIC_OT_toggle_server(bpy.types.Operator):
+    # start / stop the local command server
+    bl_idname = "orthometric.toggle_server"
+    bl_label = "Command Server"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        if running():
+            stop()
+            self.report({'INFO'}, "Command server stopped")
+            return {'FINISHED'}
+        try:
+            start()
+        except (CommandError, OSError) as err:
+            self.report({'ERROR'}, f"Could not start the command server: {err}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Command server listening on {address()}")
+        return {'FINISHED'}
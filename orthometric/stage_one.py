@@ -1,10 +1,13 @@
 import bpy
 import math
 import os
+from . import analysis, calib_cache, calibration, drivers, factory, images, loader, registry
 
 def import_assets(self, context):
+    props = context.scene.orthometric
+    entry = registry.character(props)
 
-    if "OM_Assets" in bpy.data.collections:
+    if registry.asset_collection(props):
         return True
 
     # append assets from local blend file
@@ -24,12 +27,84 @@ def import_assets(self, context):
         
     for col in data_to.collections:
         if col is not None:
-            context.scene.collection.children.link(col)
+            # every character after the first gets its own copy, namespaced, under its collection
+            ns = entry.namespace if entry else ""
+            if entry:
+                entry.assets = col
+                (entry.collection or context.scene.collection).children.link(col)
+            else:
+                context.scene.collection.children.link(col)
             for obj in col.objects:
-                if obj.name in ["OM_Cage_Low_Poly", "OM_Anchor_TearDuct", "OM_Anchor_Chin"]:
+                base = obj.name.split(".")[0] # appended copies come in as .001
+                if base.startswith(calibration.ANCHOR_PREFIX):
+                    obj[calibration.ANCHOR_KEY] = base[len(calibration.ANCHOR_PREFIX):]
+                if ns:
+                    obj.name = ns + base
+                if base == "OM_Cage_Low_Poly" or base.startswith(calibration.ANCHOR_PREFIX):
                     obj.show_in_front = True 
+            if ns:
+                col.name = ns + registry.ASSET_COLLECTION
     return True
 
+def build_front_view(context, image=None):
+    # front rig: master -> camera & image empty, added to the view list
+    # returns (item, img_obj)
+    scene = context.scene
+    props = scene.orthometric
+
+    # whole rig goes in its own collection under OrthoMetric
+    ns = registry.namespace(props)
+    col = registry.new_view_collection(scene, ns + "OM_View_Front")
+
+    # master empty
+    master = factory.new_empty(ns + "OM_Master_Front", collection=col)
+
+    # camera setup
+    # fixed: use ratio formula for initial pos
+    # formula: y = (fl / 50.0) * (2.0 + offset)
+    base_dist = 2.0
+    ratio = props.focal_length_front / 50.0
+    calc_y = ratio * (base_dist + props.front_cam_y)
+    
+    cam_obj = factory.new_camera(ns + "Ortho_Cam_Front", props.focal_length_front,
+                                 (0, calc_y, 1.47), (math.radians(90), 0, math.radians(180)), col)
+    scene.camera = cam_obj
+
+    # image placed at y=0, not parented to cam
+    img_obj = factory.new_image_empty(ns + "Ref_Img_Front", image, (0, 0, 1.47),
+                                      (math.radians(90), 0, math.radians(180)), 0.9, col)
+    
+    # trigger update
+    props.focal_length_front = props.focal_length_front
+
+    # Master becomes supreme ruler of all
+    factory.set_parent(cam_obj, master, keep_transform=False)
+    factory.set_parent(img_obj, master)
+
+    # add to list
+    item = props.custom_views.add()
+    item.name = "Front View"
+    item.view_type = 'FRONT'
+    item.character = props.character_uid
+    registry.set_rig(item, master=master, cam=cam_obj, img=img_obj)
+    item.collection = col
+    if props.use_drivers:
+        drivers.drive_view(scene, item)
+    
+    # set active index to this new item
+    props.active_view_index = len(props.custom_views) - 1
+    return item, img_obj
+
+def camera_viewports(context):
+    # force every 3d viewport to look through the scene camera (none in background runs)
+    # viewports already there are left alone
+    if context.screen is None: return
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            region = area.spaces[0].region_3d
+            if region.view_perspective != 'CAMERA':
+                region.view_perspective = 'CAMERA'
+
 class ORTHOMETRIC_OT_init_front(bpy.types.Operator):
     # init front view & import assets
     bl_idname = "orthometric.init_front"
@@ -38,73 +113,18 @@ class ORTHOMETRIC_OT_init_front(bpy.types.Operator):
     
     filepath: bpy.props.StringProperty(subtype="FILE_PATH")
     def execute(self, context):
-        scene = context.scene
-        props = scene.orthometric
+        props = context.scene.orthometric
 
         if not import_assets(self, context):
             return {'CANCELLED'}
-        
-        # master empty
-        bpy.ops.object.empty_add(type='PLAIN_AXES', location=(0, 0, 0))
-        master = context.active_object
-        master.name = "OM_Master_Front"
-
-        # camera setup
-        cam_data = bpy.data.cameras.new(name="Ortho_Cam_Front")
-        cam_obj = bpy.data.objects.new("Ortho_Cam_Front", cam_data)
-        scene.collection.objects.link(cam_obj)
-        
-        # fixed: use ratio formula for initial pos
-        # formula: y = (fl / 50.0) * (2.0 + offset)
-        base_dist = 2.0
-        ratio = props.focal_length_front / 50.0
-        calc_y = ratio * (base_dist + props.front_cam_y)
-        
-        cam_obj.location = (0, calc_y, 1.47)
-        cam_obj.rotation_euler = (math.radians(90), 0, math.radians(180))
-        cam_data.lens = props.focal_length_front
-        scene.camera = cam_obj
 
         # image setup
         if not self.filepath: return {'CANCELLED'}
 
-        # image placed at y=0, not parented to cam
-        bpy.ops.object.empty_add(type='IMAGE', location=(0, 0, 1.47))
-        img_obj = context.active_object
-        img_obj.name = "Ref_Img_Front"
-        img_obj.rotation_euler = (math.radians(90), 0, math.radians(180))
-        img_obj.empty_display_size = 0.9
-        
-        try:
-            img_obj.data = bpy.data.images.load(self.filepath)
-        except:
-            pass
-        
-        # trigger update
-        props.focal_length_front = props.focal_length_front
+        loader.build_view(context, build_front_view, self.filepath)
 
         # force viewport to camera
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                area.spaces[0].region_3d.view_perspective = 'CAMERA'
-
-        img_obj.rotation_mode = 'XYZ'
-        img_obj.rotation_euler = (math.radians(90), 0, math.radians(180))
-
-        # Master becomes supreme ruler of all
-        cam_obj.parent = master
-        img_obj.parent = master
-        img_obj.matrix_parent_inverse = master.matrix_world.inverted()
-
-        # add to list
-        item = props.custom_views.add()
-        item.name = "Front View"
-        item.view_type = 'FRONT'
-        item.obj_name_master = master.name
-        item.obj_name_cam = cam_obj.name
-        
-        # set active index to this new item
-        props.active_view_index = len(props.custom_views) - 1
+        camera_viewports(context)
 
         props.stage = 'FRONT_SETUP'
         return {'FINISHED'}
@@ -122,15 +142,12 @@ class ORTHOMETRIC_OT_center_tool(bpy.types.Operator):
 
     def execute(self, context):
         props = context.scene.orthometric
-        img_obj = bpy.data.objects.get("Ref_Img_Front")
+        img_obj = registry.primary_obj(props, 'FRONT', 'img')
         if not img_obj: return {'CANCELLED'}
 
         # helper generated at 0, 0, -2.5
-        bpy.ops.object.empty_add(type='SINGLE_ARROW', location=(0, 0, -2.5))
-        helper = context.active_object
-        helper.name = "Helper_Center"
-        helper.rotation_euler = (0, 0, 0)
-        helper.scale = (10, 10, 10)
+        helper = factory.new_empty("Helper_Center", 'SINGLE_ARROW', (0, 0, -2.5),
+                                   scale=(10, 10, 10), collection=context.collection)
 
         # 0 = x, 1 = y, 2 = z
         helper.lock_location[1] = True
@@ -139,14 +156,24 @@ class ORTHOMETRIC_OT_center_tool(bpy.types.Operator):
         helper.lock_rotation[1] = True
         helper.lock_rotation[2] = True
         
-        bpy.ops.object.select_all(action='DESELECT')
-        helper.select_set(True)
-        context.view_layer.objects.active = helper
+        factory.select_only(context.view_layer, [helper])
         
         props.is_centering = True
         return {'FINISHED'}
 
 
+def center_image(img_obj, axis_x, master=None):
+    # move the image so its symmetry line (world x = axis_x) lands on x = 0
+    mat = img_obj.matrix_world.copy()
+    mat.translation.x -= axis_x
+    img_obj.matrix_world = mat
+
+    # master regains custody
+    if master and img_obj.parent != master:
+        img_obj.parent = master
+        img_obj.matrix_parent_inverse = master.matrix_world.inverted()
+
+
 class ORTHOMETRIC_OT_confirm_center(bpy.types.Operator):
     # confirm centering
     bl_idname = "orthometric.confirm_center"
@@ -155,32 +182,56 @@ class ORTHOMETRIC_OT_confirm_center(bpy.types.Operator):
 
     def execute(self, context):
         props = context.scene.orthometric
-        img_obj = bpy.data.objects.get("Ref_Img_Front")
+        img_obj = registry.primary_obj(props, 'FRONT', 'img')
         helper = bpy.data.objects.get("Helper_Center")
-        master = bpy.data.objects.get("OM_Master_Front")
+        master = registry.primary_obj(props, 'FRONT', 'master')
 
         if img_obj and helper:
-            img_obj.parent = helper
-            img_obj.matrix_parent_inverse = helper.matrix_world.inverted()
-            helper.location.x = 0
-            context.view_layer.update()
-            bpy.ops.object.select_all(action='DESELECT')
-            img_obj.select_set(True)
-            bpy.ops.object.parent_clear(type='CLEAR_KEEP_TRANSFORM')
+            center_image(img_obj, helper.matrix_world.translation.x, master)
+        if helper:
             bpy.data.objects.remove(helper)
-        
-        # master regains custody
-        if master:
-            img_obj.parent = master
-            img_obj.matrix_parent_inverse = master.matrix_world.inverted()
 
         props.is_centering = False
         return {'FINISHED'}
 
+
+class ORTHOMETRIC_OT_auto_center(bpy.types.Operator):
+    # find the symmetry line of the front image from its pixels and center on it
+    bl_idname = "orthometric.auto_center"
+    bl_label = "Auto Center"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        img_obj = registry.primary_obj(context.scene.orthometric, 'FRONT', 'img')
+        master = registry.primary_obj(context.scene.orthometric, 'FRONT', 'master')
+
+        if img_obj and images.is_loading(img_obj):
+            self.report({'ERROR'}, "Front image is still loading")
+            return {'CANCELLED'}
+        if not (img_obj and images.has_pixels(img_obj)):
+            self.report({'ERROR'}, "Front image has no pixels to analyse")
+            return {'CANCELLED'}
+
+        # bulk read, reduce, then score every mirror axis at once
+        pixels, _ = analysis.reduce_to(images.object_pixels(img_obj), analysis.ANALYSIS_EDGE)
+        axis, score = analysis.symmetry_axis(analysis.to_gray(pixels))
+        if not math.isfinite(axis):
+            self.report({'ERROR'}, "Image too small to find a symmetry line")
+            return {'CANCELLED'}
+
+        # a weak line is a guess, leave the image where it is
+        if score < analysis.MIN_SYMMETRY:
+            self.report({'WARNING'}, f"No clear symmetry line (score {score:.2f}), use Center Image")
+            return {'CANCELLED'}
+
+        center_image(img_obj, images.image_to_world(img_obj, axis, 0.5).x, master)
+        self.report({'INFO'}, f"Centered on symmetry line (score {score:.2f})")
+        return {'FINISHED'}
+
 ## Stage 1.1.3: Calibration
 
 class ORTHOMETRIC_OT_start_calibration(bpy.types.Operator):
-    # start stage 1.1.3: two-point calibration
+    # start stage 1.1.3: landmark calibration
     bl_idname = "orthometric.start_calibration"
     bl_label = "Start Calibration"
     bl_options = {'REGISTER', 'UNDO'}
@@ -188,41 +239,25 @@ class ORTHOMETRIC_OT_start_calibration(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.orthometric
         
-        # 1. get originals
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        
-        if not (orig_td and orig_chin):
-            self.report({'ERROR'}, "Missing Anchors (TearDuct or Chin)!")
+        # 1. dup every anchor in OM_Assets
+        if len(calibration.get_anchors()) < 2:
+            self.report({'ERROR'}, "Need at least 2 anchors (OM_Anchor_*) in OM_Assets!")
             return {'CANCELLED'}
-            
-        # 2. dup tearduct
-        dup_td = orig_td.copy()
-        if orig_td.data: dup_td.data = orig_td.data.copy()
-        dup_td.name = "OM_Dup_TearDuct"
-        context.collection.objects.link(dup_td)
-        dup_td.lock_location[1] = True
-        
-        # 3. dup chin
-        dup_chin = orig_chin.copy()
-        if orig_chin.data: dup_chin.data = orig_chin.data.copy()
-        dup_chin.name = "OM_Dup_Chin"
-        context.collection.objects.link(dup_chin)
-        dup_chin.lock_location[0] = True
-        dup_chin.lock_location[1] = True
-
-        # 4. select both
-        bpy.ops.object.select_all(action='DESELECT')
-        dup_td.select_set(True)
-        dup_chin.select_set(True)
-        context.view_layer.objects.active = dup_td
+
+        dups = calibration.spawn_dups(context, 'FRONT')
+
+        # landmarks are placed on the full resolution image, not the proxy
+        images.show_full(registry.primary_obj(props, 'FRONT', 'img'))
+
+        # 2. select all dups
+        factory.select_only(context.view_layer, dups)
         
         props.stage = 'FRONT_CALIBRATE'
-        self.report({'INFO'}, "Align the duplicates to the Image's Tear Duct and Chin")
+        self.report({'INFO'}, "Align the duplicates to their landmarks on the Image")
         return {'FINISHED'}
 
 class ORTHOMETRIC_OT_apply_calibration(bpy.types.Operator):
-    # apply scale and pos calibration based on 2 points
+    # apply scale and pos calibration based on all placed landmarks
     bl_idname = "orthometric.apply_calibration"
     bl_label = "Apply Calibration"
     bl_options = {'REGISTER', 'UNDO'}
@@ -231,85 +266,46 @@ class ORTHOMETRIC_OT_apply_calibration(bpy.types.Operator):
         scene = context.scene
         
         # get objs
-        fwd_img = bpy.data.objects.get("Ref_Img_Front")
-        
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        
-        dup_td = bpy.data.objects.get("OM_Dup_TearDuct")
-        dup_chin = bpy.data.objects.get("OM_Dup_Chin")
-
-        master = bpy.data.objects.get("OM_Master_Front")
-        
-        # helper2 gen at 0, 0, 1.47
-        bpy.ops.object.empty_add(type='SINGLE_ARROW', location=(0, 0, 1.47))
-        helper2 = context.active_object
-        helper2.name = "Helper2_Center"
+        fwd_img = registry.primary_obj(scene.orthometric, 'FRONT', 'img')
+        master = registry.primary_obj(scene.orthometric, 'FRONT', 'master')
 
-        if not (fwd_img and orig_td and orig_chin and dup_td and dup_chin):
+        if not fwd_img:
             self.report({'ERROR'}, "Missing calibration objects")
             return {'CANCELLED'}
-            
-        # parent dups to helper2
-        for obj in [dup_td, dup_chin, fwd_img]:
-            obj.parent = helper2
-            obj.matrix_parent_inverse = helper2.matrix_world.inverted()
-        
-        # calc dist between originals
-        dist_target = (orig_td.matrix_world.translation.xz - orig_chin.matrix_world.translation.xz).length
-        
-        # calc dist between dups (must use world translation)
-        dist_current = (dup_td.matrix_world.translation.xz - dup_chin.matrix_world.translation.xz).length
-        
-        if dist_current < 0.0001:
-            self.report({'ERROR'}, "Duplicates are too close together!")
+
+        # best fit over all placed dups (xz scale, z move about 0, 0, 1.47)
+        item = registry.primary(scene.orthometric, 'FRONT')
+        if not calibration.run_calibration(self, context, fwd_img, 'FRONT', item=item):
             return {'CANCELLED'}
-            
-        scale_factor = dist_target / dist_current
-        
-        # apply scale
-        helper2.scale.x *= scale_factor
-        helper2.scale.z *= scale_factor
-        
-        context.view_layer.update()
-        
-        # align avg pt of dups to avg pt of originals
-        mid_target = (orig_td.matrix_world.translation + orig_chin.matrix_world.translation) / 2
-        mid_current = (dup_td.matrix_world.translation + dup_chin.matrix_world.translation) / 2
-        
-        # calc offset vector
-        diff_vector = mid_target - mid_current
-        
-        # move helper2
-        helper2.location.z += diff_vector.z
-        
-        if fwd_img.parent:
-            # 1. save childs current world matrix
-            matrix_copy = fwd_img.matrix_world.copy()
-            # 2. clear parent relationship
-            fwd_img.parent = None
-
-            # 3. reapply saved world matrix
-            fwd_img.matrix_world = matrix_copy
-
-            # whatever you do do not edit this line below this is the most crucial thing in this entire fucking file my goodness
-            fwd_img.location.z = helper2.location.z
-            
-        # taking out the trash :]
-        bpy.data.objects.remove(dup_td, do_unlink=True)
-        bpy.data.objects.remove(dup_chin, do_unlink=True)
-        bpy.data.objects.remove(helper2, do_unlink=True)
-        
-        self.report({'INFO'}, "Calibration Complete!")
-        
+
         scene.orthometric.stage = 'FRONT_SETUP' 
 
-        if master:
-                fwd_img.parent = master
-                fwd_img.matrix_parent_inverse = master.matrix_world.inverted()
+        # master regains custody (only if it ever lost it)
+        if master and fwd_img.parent != master:
+            fwd_img.parent = master
+            fwd_img.matrix_parent_inverse = master.matrix_world.inverted()
+        error = calib_cache.store(scene, item)
+        if error:
+            self.report({'WARNING'}, error)
         
         return {'FINISHED'}
 
+def open_front(context):
+    # switch to front cam and controls
+    props = context.scene.orthometric
+    scene = context.scene
+    
+    # 1. switch ui stage back to setup
+    props.stage = 'FRONT_SETUP'
+    
+    # 2. set active cam
+    cam = registry.primary_obj(props, 'FRONT', 'cam')
+    if cam:
+        scene.camera = cam
+        
+    # 3. force viewport to camera
+    camera_viewports(context)
+
 class ORTHOMETRIC_OT_edit_front(bpy.types.Operator):
     # switch to front cam and controls
     bl_idname = "orthometric.edit_front"
@@ -317,22 +313,7 @@ class ORTHOMETRIC_OT_edit_front(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        props = context.scene.orthometric
-        scene = context.scene
-        
-        # 1. switch ui stage back to setup
-        props.stage = 'FRONT_SETUP'
-        
-        # 2. set active cam
-        cam = bpy.data.objects.get("Ortho_Cam_Front")
-        if cam:
-            scene.camera = cam
-            
-        # 3. force viewport to camera
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                area.spaces[0].region_3d.view_perspective = 'CAMERA'
-                
+        open_front(context)
         return {'FINISHED'}
 
 # stage 1 complete :]
@@ -347,6 +328,10 @@ class ORTHOMETRIC_OT_finish_stage_one(bpy.types.Operator):
         
         # mark front as done
         props.has_front = True
+        images.show_full(registry.primary_obj(props, 'FRONT', 'img'), False)
+        error = calib_cache.store(context.scene, registry.primary(props, 'FRONT'))
+        if error:
+            self.report({'WARNING'}, error)
         
         # return to lobby
         props.stage = 'START'
@@ -1,8 +1,67 @@
 import bpy
 import math
+import numpy as np
+from . import backgrounds, calib_cache, calibration, core, drivers, factory, images, loader, registry, sequence, stage_one, stage_two
 
 ## Stage 3 Initialization
 
+def build_custom_view(context, image=None):
+    # custom rig: Master -> Minor -> cam & img, added to the view list
+    # returns (item, img_obj)
+    scene = context.scene
+    props = scene.orthometric
+    
+    # 1. add entry to ui list
+    item = props.custom_views.add()
+    item.name = f"View {len(props.custom_views)}"
+    item.view_type = 'CUSTOM' # so the siblings can share the temp list
+    item.character = props.character_uid
+
+    # generate unique names (serial keeps counting after removals)
+    idx = registry.next_serial(props)
+    ns = registry.namespace(props)
+    n_master = f"{ns}OM_Master_{idx}"
+    n_minor = f"{ns}OM_Minor_{idx}"
+    n_cam = f"{ns}OM_Cam_{idx}"
+    n_img = f"{ns}OM_Img_{idx}"
+    col = registry.new_view_collection(scene, f"{ns}OM_View_{idx}")
+    
+    # 2. create heoirarchy
+    # a. master controller (rot) - centered at head height approx
+    master = factory.new_empty(n_master, 'SPHERE', (0, 0, 1.47), (math.radians(90), 0, math.radians(135)),
+                               0.5, collection=col)
+    master.show_name = True
+
+    # b. minor controller (calibration parent)
+    minor = factory.new_empty(n_minor, 'CUBE', (0, 0, 1.47), size=0.3, collection=col)
+    factory.set_parent(minor, master, keep_transform=False)
+    
+    # c. camera (child of minor)
+    # default pos relative to minor (local), 2 meters away
+    cam_obj = factory.new_camera(n_cam, location=(0, 0, 2.0), collection=col)
+    factory.set_parent(cam_obj, minor, keep_transform=False)
+    scene.camera = cam_obj
+
+    # d. image (child of minor)
+    # parented to minor keeping transform
+    img_obj = factory.new_image_empty(n_img, image, (0, 0, 1.47), (math.radians(90), 0, math.radians(135)),
+                                      collection=col)
+    factory.set_parent(img_obj, minor)
+    
+    # store refs
+    registry.set_rig(item, master=master, minor=minor, cam=cam_obj, img=img_obj)
+    item.collection = col
+    if props.use_drivers:
+        drivers.drive_view(scene, item)
+
+    # 3. setup init orientation
+    # align standard: cam at +y (2m), looking at 0.
+    cam_obj.location = (0, 0, 2.0)
+    cam_obj.rotation_euler = (0, 0, 0) 
+
+    props.active_view_index = len(props.custom_views) - 1
+    return item, img_obj
+
 class ORTHOMETRIC_OT_add_custom_view(bpy.types.Operator):
     # init and create new custom view hierarchy Master -> Minor -> cam & img
     bl_idname = "orthometric.add_custom_view"
@@ -12,77 +71,40 @@ class ORTHOMETRIC_OT_add_custom_view(bpy.types.Operator):
     filepath: bpy.props.StringProperty(subtype="FILE_PATH")
 
     def execute(self, context):
-        scene = context.scene
-        props = scene.orthometric
-        
-        # 1. add entry to ui list
-        item = props.custom_views.add()
-        item.name = f"View {len(props.custom_views)}"
-        item.view_type = 'CUSTOM' # so the siblings can share the temp list
-
-        # generate unique names
-        idx = len(props.custom_views)
-        n_master = f"OM_Master_{idx}"
-        n_minor = f"OM_Minor_{idx}"
-        n_cam = f"OM_Cam_{idx}"
-        n_img = f"OM_Img_{idx}"
-        
-        # 2. create heoirarchy
-        # a. master controller (rot) - centered at head height approx
-        bpy.ops.object.empty_add(type='SPHERE', location=(0, 0, 1.47))
-        master = context.active_object
-        master.name = n_master
-        master.show_name = True
-        master.empty_display_size = 0.5
-        master.rotation_euler = (math.radians(90),0,math.radians(135))
-
-        # b. minor controller (calibration parent)
-        bpy.ops.object.empty_add(type='CUBE', location=(0, 0, 1.47))
-        minor = context.active_object
-        minor.name = n_minor
-        minor.parent = master
-        minor.empty_display_size = 0.3
-        
-        # c. camera (child of minor)
-        cam_data = bpy.data.cameras.new(name=n_cam)
-        cam_obj = bpy.data.objects.new(n_cam, cam_data)
-        context.collection.objects.link(cam_obj)
-        cam_obj.parent = minor
-        # default pos relative to minor (local)
-        cam_obj.location = (0, 0, 2.0) # 2 meters away
-        cam_obj.rotation_euler = (0, 0, 0)
-        scene.camera = cam_obj
-
-        # d. image (child of minor)
-        if self.filepath:
-            bpy.ops.object.empty_add(type='IMAGE', location=(0, 0, 1.47))
-            img_obj = context.active_object
-            img_obj.name = n_img
-            
-            # reparent to minor keeping transform, then zero out
-            img_obj.parent = minor
-            img_obj.matrix_parent_inverse = minor.matrix_world.inverted()
-            img_obj.location = (0,0,1.47) 
-            img_obj.rotation_euler = (math.radians(90),0,math.radians(135))
-            
-            try:
-                img_obj.data = bpy.data.images.load(self.filepath)
-            except:
-                pass
-            
-            # store refs
-            item.obj_name_master = n_master
-            item.obj_name_minor = n_minor
-            item.obj_name_cam = n_cam
-            item.obj_name_img = n_img
-
-        # 3. setup init orientation
-        # align standard: cam at +y (2m), looking at 0.
-        cam_obj.location = (0, 0, 2.0)
-        cam_obj.rotation_euler = (0, 0, 0) 
-
-        props.active_view_index = len(props.custom_views) - 1
-        
+        loader.build_view(context, build_custom_view, self.filepath)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+class ORTHOMETRIC_OT_add_sequence_view(bpy.types.Operator):
+    # one custom rig showing a turntable image sequence, frame follows z rotation
+    bl_idname = "orthometric.add_sequence_view"
+    bl_label = "Add Turntable View"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    directory: bpy.props.StringProperty(subtype='DIR_PATH')
+    files: bpy.props.CollectionProperty(type=bpy.types.OperatorFileListElement)
+    filter_image: bpy.props.BoolProperty(default=True, options={'HIDDEN', 'SKIP_SAVE'})
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        paths = sequence.frame_files(self.directory, [f.name for f in self.files if f.name])
+        if len(paths) < 2:
+            self.report({'ERROR'}, "Select every frame of the turntable (2 or more images)")
+            return {'CANCELLED'}
+
+        item, img_obj = build_custom_view(context)
+        item.view_type = 'SEQUENCE'
+        item.name = f"Turntable {len(props.custom_views)}"
+        for path in paths:
+            item.frames.add().filepath = path
+
+        # first frame is shot from where the new rig looks, the update shows it
+        item.seq_start_angle = math.degrees(item.obj_master.rotation_euler.z)
+
+        self.report({'INFO'}, f"Turntable with {len(paths)} frames ({360 / len(paths):.1f} deg apart)")
         return {'FINISHED'}
 
     def invoke(self, context, event):
@@ -106,6 +128,8 @@ def del_hierarchy (obj):
     if data:
         if obj_type == 'CAMERA':
             bpy.data.cameras.remove(data) # Note for self: remopving image = bad cause image could be used elsewhere
+        elif obj_type == 'MESH' and data.users == 0:
+            bpy.data.meshes.remove(data) # sheet card quad, its image stays
 
 class ORTHOMETRIC_OT_remove_custom_view(bpy.types.Operator):
     # remove selected view and its hierarchy
@@ -116,6 +140,8 @@ class ORTHOMETRIC_OT_remove_custom_view(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.orthometric
         idx = props.active_view_index
+        if registry.active(props) is None:
+            return {'CANCELLED'}
 
         try:
             item = props.custom_views[idx]
@@ -126,26 +152,29 @@ class ORTHOMETRIC_OT_remove_custom_view(bpy.types.Operator):
             elif item.view_type == 'SIDE':
                 props.has_side = False
             
-            master_obj = bpy.data.objects.get(item.obj_name_master)
+            master_obj = item.obj_master
             if master_obj:
                 del_hierarchy(master_obj)
             else:
-                for n in [item.obj_name_minor, item.obj_name_cam, item.obj_name_img]:
-                    obj = bpy.data.objects.get(n)
+                for obj in [item.obj_minor, item.obj_cam, item.obj_img]:
                     if obj: bpy.data.objects.remove(obj, do_unlink=True)
+            registry.remove_view_collection(item)
 
             props.custom_views.remove(idx)
-            props.active_view_index = max(0, idx - 1)
+            # saved view indices of the other characters shift with the list
+            for entry in props.characters:
+                if entry.active_view_index > idx:
+                    entry.active_view_index -= 1
+            props.active_view_index = registry.nearest_view(props, idx)
+
+            # custom view drivers point at list indices, which just moved
+            if props.use_drivers:
+                drivers.apply(context.scene)
 
         except IndexError:
             pass
         return {'FINISHED'}
 
-def hide_hierarchy(obj, hide_value):
-    obj.hide_viewport = hide_value
-    for child in obj.children:
-        hide_hierarchy(child, hide_value)
-
 class ORTHOMETRIC_OT_enter_config(bpy.types.Operator):
     # enter config mode for selected view
     bl_idname = "orthometric.enter_config"
@@ -154,46 +183,40 @@ class ORTHOMETRIC_OT_enter_config(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.orthometric
         
-        if len(props.custom_views) == 0:
+        item = registry.active(props)
+        if item is None:
             return {'CANCELLED'}
 
-        item = props.custom_views[props.active_view_index]
-
-        for view_item in props.custom_views:
-            master = bpy.data.objects.get(view_item.obj_name_master)
-            if master:
-                # hide master & children if not the active item and vice versa
-                if view_item != item:
-                    master.hide_viewport = True
-                    for child in master.children:
-                        hide_hierarchy(child, True)
-                else:
-                    master.hide_viewport = False
-                    for child in master.children:
-                        hide_hierarchy(child, False)
+        # only this view's collection visible
+        registry.show_view(context.scene, item)
 
         # Branch logic to view type
         if item.view_type == 'FRONT':
-            return bpy.ops.orthometric.edit_front()
+            stage_one.open_front(context)
+            return {'FINISHED'}
         
         elif item.view_type == 'SIDE':
-            return bpy.ops.orthometric.edit_side()
+            stage_two.open_side(context)
+            return {'FINISHED'}
         
         # 1. switch cam
-        cam = bpy.data.objects.get(item.obj_name_cam)
+        cam = item.obj_cam
         if cam:
             context.scene.camera = cam
             
         # 2. viewport to cam
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                area.spaces[0].region_3d.view_perspective = 'CAMERA'
+        stage_one.camera_viewports(context)
         
         # 3. sync sliders to current master rot
-        master = bpy.data.objects.get(item.obj_name_master)
+        master = item.obj_master
         if master:
             props.stage_3_rot_x = math.degrees(master.rotation_euler.x)
             props.stage_3_rot_z = math.degrees(master.rotation_euler.z)
+            if props.use_drivers:
+                drivers.drive_master(context.scene, item)
+
+        if item.view_type == 'SEQUENCE':
+            sequence.show_angle(props, item, props.stage_3_rot_z)
 
         props.stage = 'STAGE_3_SETUP'
         return {'FINISHED'}
@@ -204,11 +227,22 @@ class ORTHOMETRIC_OT_finish_stage_three(bpy.types.Operator):
     bl_label = "Return to Lobby"
     
     def execute(self, context):
-        context.scene.orthometric.stage = 'START'
+        props = context.scene.orthometric
+        if props.custom_views:
+            item = registry.active(props)
+            images.show_full(registry.view_obj(item, 'img'), False)
+            drivers.release_master(props, item)
+            error = calib_cache.store(context.scene, item)
+            if error:
+                self.report({'WARNING'}, error)
+        props.stage = 'START'
         return {'FINISHED'}
 
 ## Stage 3 Calibration
 
+# stage 3 dups get their own suffix eg. OM_Dup_Chin_S3
+DUP_SUFFIX = "_S3"
+
 class ORTHOMETRIC_OT_start_calibration_s3(bpy.types.Operator):
     # start calibration for custom view
     bl_idname = "orthometric.start_calibration_s3"
@@ -217,26 +251,16 @@ class ORTHOMETRIC_OT_start_calibration_s3(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.orthometric
         
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        if not (orig_td and orig_chin): return {'CANCELLED'}
-        
-        dup_td = orig_td.copy()
-        dup_td.name = "OM_Dup_TearDuct_S3"
-        context.collection.objects.link(dup_td)
-        
-        dup_chin = orig_chin.copy()
-        dup_chin.name = "OM_Dup_Chin_S3"
-        context.collection.objects.link(dup_chin)
+        if len(calibration.get_anchors()) < 2: return {'CANCELLED'}
         
         # ensure unlocked movement (x, y, z)
-        for obj in [dup_td, dup_chin]:
-            obj.lock_location = (False, False, False)
+        dups = calibration.spawn_dups(context, 'CUSTOM', DUP_SUFFIX)
+
+        # landmarks are placed on the full resolution image, not the proxy
+        if props.custom_views:
+            images.show_full(registry.view_obj(registry.active(props), 'img'))
         
-        bpy.ops.object.select_all(action='DESELECT')
-        dup_td.select_set(True)
-        dup_chin.select_set(True)
-        context.view_layer.objects.active = dup_td
+        factory.select_only(context.view_layer, dups)
         
         props.stage = 'STAGE_3_CALIBRATE'
         return {'FINISHED'}
@@ -248,37 +272,90 @@ class ORTHOMETRIC_OT_apply_calibration_s3(bpy.types.Operator):
     
     def execute(self, context):
         props = context.scene.orthometric
-        item = props.custom_views[props.active_view_index]
-        
-        img_obj = bpy.data.objects.get(item.obj_name_img)
-        dup_td = bpy.data.objects.get("OM_Dup_TearDuct_S3")
-        dup_chin = bpy.data.objects.get("OM_Dup_Chin_S3")
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        
-        if not (img_obj and dup_td and dup_chin): return {'CANCELLED'}
-        
-        # 1. scale
-        dist_target = (orig_td.matrix_world.translation - orig_chin.matrix_world.translation).length
-        dist_current = (dup_td.matrix_world.translation - dup_chin.matrix_world.translation).length
-        scale_factor = dist_target / dist_current if dist_current > 0 else 1.0
+        item = registry.active(props)
+        img_obj = registry.view_obj(item, 'img')
+        if not img_obj: return {'CANCELLED'}
         
-        img_obj.scale *= scale_factor
-        context.view_layer.update()
-        
-        # 2. pos (x, y, z translation)
-        mid_target = (orig_td.matrix_world.translation + orig_chin.matrix_world.translation) / 2
-        mid_dup = (dup_td.matrix_world.translation + dup_chin.matrix_world.translation) / 2
-        
-        # calc full 3d diff
-        diff = mid_target - mid_dup
-        
-        # apply full diff to image
-        img_obj.matrix_world.translation += diff
-        
-        # cleanup
-        bpy.data.objects.remove(dup_td, do_unlink=True)
-        bpy.data.objects.remove(dup_chin, do_unlink=True)
+        # best fit over all placed dups (uniform scale about the image origin, xyz move)
+        if not calibration.run_calibration(self, context, img_obj, 'CUSTOM', DUP_SUFFIX,
+                                           pivot=img_obj.matrix_world.translation, item=item):
+            return {'CANCELLED'}
+        error = calib_cache.store(context.scene, item)
+        if error:
+            self.report({'WARNING'}, error)
         
         props.stage = 'STAGE_3_SETUP'
-        return {'FINISHED'}
\ No newline at end of file
+        return {'FINISHED'}
+
+## Joint Solve
+
+class ORTHOMETRIC_OT_solve_all(bpy.types.Operator):
+    # re-fit every calibrated view together against the shared landmarks
+    bl_idname = "orthometric.solve_all"
+    bl_label = "Solve All Views"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        # disabled empties of inactive views are not re-evaluated, the solve reads their matrix_world
+        if props.image_display == 'CAMERA':
+            backgrounds.refresh_matrices(props)
+
+        count, keys, residuals, names = calibration.solve_all_views(
+            context, orient=props.solve_view_rotation, rotate=props.calib_solve_rotation,
+            anchor_weight=props.solve_anchor_weight)
+
+        if count == 0:
+            self.report({'ERROR'}, "No calibrated views to solve, calibrate at least one view first")
+            return {'CANCELLED'}
+
+        view, landmark = divmod(int(residuals.argmax()), residuals.shape[1])
+        self.report({'INFO'}, f"Solved {count} views. Worst: {names[view]} / {keys[landmark]} ({residuals.max():.4f})")
+        return {'FINISHED'}
+
+
+## Lens Estimate
+
+class ORTHOMETRIC_OT_estimate_lens(bpy.types.Operator):
+    # estimate focal length & distance of the active custom view from its landmarks
+    bl_idname = "orthometric.estimate_lens"
+    bl_label = "Estimate Lens"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        item = registry.active(props)
+        if item is None: return {'CANCELLED'}
+
+        solved = calibration.estimate_view_lens(item, rotate=props.calib_solve_rotation)
+        if solved is None:
+            self.report({'ERROR'}, "Calibrate this view with at least 3 landmarks first")
+            return {'CANCELLED'}
+
+        result, normal = solved
+        if not result.ok:
+            self.report({'ERROR'}, "Landmarks lack depth spread, add eg. nose tip and ear anchors")
+            return {'CANCELLED'}
+
+        img_obj = item.obj_img
+        cam_obj = item.obj_cam
+
+        # slide the camera along its local z to the solved distance
+        img_mat = calibration.world_matrix(img_obj)
+        current = float(normal @ (np.array(cam_obj.matrix_world.translation) - img_mat[:3, 3]))
+        axis_len = cam_obj.parent.matrix_world.col[2].to_3d().length if cam_obj.parent else 1.0
+        local_z = cam_obj.location.z + (result.distance - current) / axis_len
+
+        # lens & offset within their slider ranges, written through the props so callbacks / drivers place the camera
+        dist_prop = item.bl_rna.properties['dist_off']
+        fov, dist_off = core.framing_lens(local_z, offset_min=dist_prop.soft_min, offset_max=dist_prop.soft_max)
+        calib_cache.set_view_lens(props, item, fov, dist_off)
+        calibration.write_world_matrix(img_obj, core.apply_transform(result.fit.matrix, img_mat))
+
+        reached = core.dolly_distance(fov, dist_off)
+        if abs(reached - local_z) > 1e-4 * max(local_z, 1.0):
+            self.report({'WARNING'}, f"Focal length {fov:.1f}mm, {result.distance:.3f}m is past the lens / offset range, "
+                                     f"camera left {abs(reached - local_z) * axis_len:.3f}m off")
+            return {'FINISHED'}
+        self.report({'INFO'}, f"Focal length {fov:.1f}mm at {result.distance:.3f}m (rms {result.rms:.4f})")
+        return {'FINISHED'}
@@ -1,8 +1,57 @@
 import bpy
 import math
+import numpy as np
+from . import analysis, calib_cache, calibration, core, drivers, factory, images, loader, registry, stage_one
 
 ## Stage 2 Initialization
 
+def build_side_view(context, image=None):
+    # side rig: master -> camera & image empty, added to the view list
+    # returns (item, img_obj)
+    scene = context.scene
+    props = scene.orthometric
+
+    # whole rig goes in its own collection under OrthoMetric
+    ns = registry.namespace(props)
+    col = registry.new_view_collection(scene, ns + "OM_View_Side")
+
+    # master empty
+    master = factory.new_empty(ns + "OM_Master_Side", collection=col)
+
+    # camera
+    # side view positioning
+    # cam placed at +x looking towards -x
+    base_dist = 2.0
+    # simple initial placement, rotation (90 x, 0 y, 90 z) to look down -x axis
+    cam_obj = factory.new_camera(ns + "Ortho_Cam_Side", props.focal_length_side,
+                                 (base_dist, 0, 1.47), (math.radians(90), 0, math.radians(90)), col)
+    scene.camera = cam_obj
+
+    # image placed at 0, 0, 1.47 (centered), rot matches cam
+    img_obj = factory.new_image_empty(ns + "Ref_Img_Side", image, (0, 0, 1.47),
+                                      (math.radians(90), 0, math.radians(90)), 0.9, col)
+    
+    # trigger update
+    props.focal_length_side = props.focal_length_side
+
+    # Master becomes supreme ruler of all
+    factory.set_parent(cam_obj, master, keep_transform=False)
+    factory.set_parent(img_obj, master)
+
+    # add to list
+    item = props.custom_views.add()
+    item.name = "Side View"
+    item.view_type = 'SIDE'
+    item.character = props.character_uid
+    registry.set_rig(item, master=master, cam=cam_obj, img=img_obj)
+    item.collection = col
+    if props.use_drivers:
+        drivers.drive_view(scene, item)
+    
+    # set active index to this new item
+    props.active_view_index = len(props.custom_views) - 1
+    return item, img_obj
+
 class ORTHOMETRIC_OT_init_side(bpy.types.Operator):
     # init side view & import assets
     bl_idname = "orthometric.init_side"
@@ -12,71 +61,21 @@ class ORTHOMETRIC_OT_init_side(bpy.types.Operator):
     filepath: bpy.props.StringProperty(subtype="FILE_PATH")
 
     def execute(self, context):
-        scene = context.scene
-        props = scene.orthometric
-
-        # master empty
-        bpy.ops.object.empty_add(type='PLAIN_AXES', location=(0, 0, 0))
-        master = context.active_object
-        master.name = "OM_Master_Side"
-
-        # camera
-        cam_data = bpy.data.cameras.new(name="Ortho_Cam_Side")
-        cam_obj = bpy.data.objects.new("Ortho_Cam_Side", cam_data)
-        scene.collection.objects.link(cam_obj)
-        
-        # side view positioning
-        # cam placed at +x looking towards -x
-        base_dist = 2.0
-        # simple initial placement
-        cam_obj.location = (base_dist, 0, 1.47)
-        # rotation (90 x, 0 y, 90 z) to look down -x axis
-        cam_obj.rotation_euler = (math.radians(90), 0, math.radians(90))
-        cam_data.lens = props.focal_length_side
-        scene.camera = cam_obj
+        props = context.scene.orthometric
 
         # image
         if not self.filepath: return {'CANCELLED'}
 
-        # image placed at 0, 0, 1.47 (centered)
-        bpy.ops.object.empty_add(type='IMAGE', location=(0, 0, 1.47))
-        img_obj = context.active_object
-        img_obj.name = "Ref_Img_Side"
-        # rot matches cam
-        img_obj.rotation_euler = (math.radians(90), 0, math.radians(90))
-        img_obj.empty_display_size = 0.9
-        
-        try:
-            img_obj.data = bpy.data.images.load(self.filepath)
-        except:
-            pass
-        
-        # trigger update
-        props.focal_length_side = props.focal_length_side
+        props.stage = 'SIDE_SETUP'
 
-        # viewport
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                area.spaces[0].region_3d.view_perspective = 'CAMERA'
-
-        img_obj.rotation_mode = 'XYZ'
-
-        # Master becomes supreme ruler of all
-        cam_obj.parent = master
-        img_obj.parent = master
-        img_obj.matrix_parent_inverse = master.matrix_world.inverted()
-
-        # add to list
-        item = props.custom_views.add()
-        item.name = "Side View"
-        item.view_type = 'SIDE'
-        item.obj_name_master = master.name
-        item.obj_name_cam = cam_obj.name
-        
-        # set active index to this new item
-        props.active_view_index = len(props.custom_views) - 1
+        # propose the height match as soon as the pixels are there, when the front is
+        then = None
+        if props.auto_align_side and registry.primary_obj(props, 'FRONT', 'img'):
+            then = align_on_load
+        loader.build_view(context, build_side_view, self.filepath, then)
 
-        props.stage = 'SIDE_SETUP'
+        # viewport
+        stage_one.camera_viewports(context)
         return {'FINISHED'}
 
     def invoke(self, context, event):
@@ -93,7 +92,7 @@ class ORTHOMETRIC_OT_mirror_side(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        img_obj = bpy.data.objects.get("Ref_Img_Side")
+        img_obj = registry.primary_obj(context.scene.orthometric, 'SIDE', 'img')
         if not img_obj: return {'CANCELLED'}
 
         # rotate 180 degrees
@@ -101,10 +100,76 @@ class ORTHOMETRIC_OT_mirror_side(bpy.types.Operator):
         
         return {'FINISHED'}
 
+## Auto Height Alignment
+
+def image_profile(img_obj):
+    # vertical feature profile of a view image with the world z of each row
+    pixels, _ = analysis.reduce_to(images.object_pixels(img_obj), analysis.ANALYSIS_EDGE)
+    profile = analysis.vertical_profile(analysis.to_gray(pixels))
+    heights = images.row_heights(img_obj, len(profile))
+    if heights[0] > heights[-1]:
+        profile, heights = profile[::-1], heights[::-1]
+    return profile, heights
+
+def auto_align_side(op, context):
+    # match side image height/scale to the calibrated front by profile correlation
+    # and pre-place the dups where that match puts them, user only confirms
+    props = context.scene.orthometric
+    front = registry.primary_obj(props, 'FRONT', 'img')
+    side = registry.primary_obj(props, 'SIDE', 'img')
+
+    if any(obj and images.is_loading(obj) for obj in (front, side)):
+        op.report({'ERROR'}, "Front or side image is still loading")
+        return False
+    if not (front and side and images.has_pixels(front) and images.has_pixels(side)):
+        op.report({'ERROR'}, "Need front and side images with pixels")
+        return False
+
+    anchors = calibration.get_anchors()
+    if len(anchors) < 2:
+        op.report({'ERROR'}, "Need at least 2 anchors (OM_Anchor_*) in OM_Assets!")
+        return False
+
+    pivot = np.array(core.HEAD_PIVOT)
+    scale, shift, score = analysis.match_profiles(*image_profile(front), *image_profile(side), pivot=pivot[2])
+
+    # start calibration with the dups at the inverse of the proposed transform
+    calibration.remove_dups([key for key, _ in anchors])
+    dups = calibration.spawn_dups(context, 'SIDE')
+    images.show_full(side)
+    for dup, (key, anchor) in zip(dups, anchors):
+        target = np.array(anchor.matrix_world.translation)
+        placed = pivot + (target - pivot - (0.0, 0.0, shift)) / scale
+        dup.location = (target[0], placed[1], placed[2])
+
+    factory.select_only(context.view_layer, dups)
+
+    props.stage = 'SIDE_CALIBRATE'
+    op.report({'INFO'}, f"Proposed side scale {scale:.3f}, height {shift:+.3f} (match {score:.2f}), check the dups and Apply")
+    return True
+
+def align_on_load(image):
+    # side image attached: run the auto align if the side setup is still open
+    context = bpy.context
+    if context.scene.orthometric.stage != 'SIDE_SETUP': return
+    context.view_layer.update()
+    bpy.ops.orthometric.auto_align_side()
+
+class ORTHOMETRIC_OT_auto_align_side(bpy.types.Operator):
+    # propose side image height & scale from the calibrated front image
+    bl_idname = "orthometric.auto_align_side"
+    bl_label = "Auto Align to Front"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        if not auto_align_side(self, context):
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
 ## Stage 2.1.3: Calibration
 
 class ORTHOMETRIC_OT_start_calibration_side(bpy.types.Operator):
-    # start stage 2.1.3: two-point calibration (side)
+    # start stage 2.1.3: landmark calibration (side)
     bl_idname = "orthometric.start_calibration_side"
     bl_label = "Start Calibration"
     bl_options = {'REGISTER', 'UNDO'}
@@ -112,42 +177,26 @@ class ORTHOMETRIC_OT_start_calibration_side(bpy.types.Operator):
     def execute(self, context):
         props = context.scene.orthometric
         
-        # 1. get originals
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        
-        if not (orig_td and orig_chin):
-            self.report({'ERROR'}, "Missing Anchors (TearDuct or Chin)!")
-            return {'CANCELLED'}
-            
-        # 2. dup tearduct
-        dup_td = orig_td.copy()
-        if orig_td.data: dup_td.data = orig_td.data.copy()
-        dup_td.name = "OM_Dup_TearDuct"
-        context.collection.objects.link(dup_td)
-        # side view: move in y and z. lock x.
-        dup_td.lock_location[0] = True 
-        
-        # 3. dup chin
-        dup_chin = orig_chin.copy()
-        if orig_chin.data: dup_chin.data = orig_chin.data.copy()
-        dup_chin.name = "OM_Dup_Chin"
-        context.collection.objects.link(dup_chin)
+        # 1. dup every anchor in OM_Assets
         # side view: move in y and z. lock x.
-        dup_chin.lock_location[0] = True
+        if len(calibration.get_anchors()) < 2:
+            self.report({'ERROR'}, "Need at least 2 anchors (OM_Anchor_*) in OM_Assets!")
+            return {'CANCELLED'}
 
-        # 4. select both
-        bpy.ops.object.select_all(action='DESELECT')
-        dup_td.select_set(True)
-        dup_chin.select_set(True)
-        context.view_layer.objects.active = dup_td
+        dups = calibration.spawn_dups(context, 'SIDE')
+
+        # landmarks are placed on the full resolution image, not the proxy
+        images.show_full(registry.primary_obj(props, 'SIDE', 'img'))
+
+        # 2. select all dups
+        factory.select_only(context.view_layer, dups)
         
         props.stage = 'SIDE_CALIBRATE'
-        self.report({'INFO'}, "Align the duplicates to the Image's Tear Duct and Chin (Side View)")
+        self.report({'INFO'}, "Align the duplicates to their landmarks on the Image (Side View)")
         return {'FINISHED'}
 
 class ORTHOMETRIC_OT_apply_calibration_side(bpy.types.Operator):
-    # apply scale and pos calibration based on 2 points (side view)
+    # apply scale and pos calibration based on all placed landmarks (side view)
     bl_idname = "orthometric.apply_calibration_side"
     bl_label = "Apply Calibration"
     bl_options = {'REGISTER', 'UNDO'}
@@ -156,85 +205,27 @@ class ORTHOMETRIC_OT_apply_calibration_side(bpy.types.Operator):
         scene = context.scene
         
         # get objects
-        side_img = bpy.data.objects.get("Ref_Img_Side")
-        
-        orig_td = bpy.data.objects.get("OM_Anchor_TearDuct")
-        orig_chin = bpy.data.objects.get("OM_Anchor_Chin")
-        
-        dup_td = bpy.data.objects.get("OM_Dup_TearDuct")
-        dup_chin = bpy.data.objects.get("OM_Dup_Chin")
-
-        master = bpy.data.objects.get("OM_Master_Side")
-        
-        # helper2 generated at 0, 0, 1.47
-        bpy.ops.object.empty_add(type='SINGLE_ARROW', location=(0, 0, 1.47))
-        helper2 = context.active_object
-        helper2.name = "Helper2_Center_Side"
+        side_img = registry.primary_obj(scene.orthometric, 'SIDE', 'img')
+        master = registry.primary_obj(scene.orthometric, 'SIDE', 'master')
 
-        if not (side_img and orig_td and orig_chin and dup_td and dup_chin):
+        if not side_img:
             self.report({'ERROR'}, "Missing calibration objects")
             return {'CANCELLED'}
-            
-        # parent dups to helper2
-        for obj in [dup_td, dup_chin, side_img]:
-            obj.parent = helper2
-            obj.matrix_parent_inverse = helper2.matrix_world.inverted()
-        
-        # calc dist between originals
-        dist_target = (orig_td.matrix_world.translation - orig_chin.matrix_world.translation).length
-        
-        # calc dist between dups
-        dist_current = (dup_td.matrix_world.translation - dup_chin.matrix_world.translation).length
-        
-        if dist_current < 0.0001:
-            self.report({'ERROR'}, "Duplicates are too close together!")
-            return {'CANCELLED'}
-            
-        scale_factor = dist_target / dist_current
-        
-        # apply scale (side view affects y and z dimensions primarily)
-        helper2.scale = (scale_factor, scale_factor, scale_factor)
-        
-        # force scene update
-        context.view_layer.update()
-        
-        # align avg pt of dups to avg pt of originals
-        mid_target = (orig_td.matrix_world.translation + orig_chin.matrix_world.translation) / 2
-        mid_current = (dup_td.matrix_world.translation + dup_chin.matrix_world.translation) / 2
-        
-        # calc offset vector
-        diff_vector = mid_target - mid_current
-        
-        # side view calibration logic
-        # apply translation to y (depth) and z (height)
-        helper2.location.y += diff_vector.y
-        helper2.location.z += diff_vector.z
-        
-        if side_img.parent:
-            # 1. save childs current world matrix
-            matrix_copy = side_img.matrix_world.copy()
-            # 2. clear parent relationship
-            side_img.parent = None
-
-            # 3. reapply saved world matrix
-            side_img.matrix_world = matrix_copy
 
-            # apply final pos from helper to image directly
-            side_img.location.y = helper2.location.y
-            side_img.location.z = helper2.location.z
+        # best fit over all placed dups (uniform scale, yz move about 0, 0, 1.47)
+        item = registry.primary(scene.orthometric, 'SIDE')
+        if not calibration.run_calibration(self, context, side_img, 'SIDE', item=item):
+            return {'CANCELLED'}
 
-        
-        # master becomes regains custody
-        if master:
+        # master regains custody (only if it ever lost it)
+        if master and side_img.parent != master:
             side_img.parent = master
             side_img.matrix_parent_inverse = master.matrix_world.inverted()
-
-        # taking out the trash :]
-        bpy.data.objects.remove(dup_td, do_unlink=True)
-        bpy.data.objects.remove(dup_chin, do_unlink=True)
-        bpy.data.objects.remove(helper2, do_unlink=True)
-        
-        self.report({'INFO'}, "Side Calibration Complete!")
+        error = calib_cache.store(scene, item)
+        if error:
+            self.report({'WARNING'}, error)
+        else:
+            self.report({'INFO'}, "Side Calibration Complete!")
         
         scene.orthometric.stage = 'SIDE_SETUP' 
         
@@ -253,6 +244,10 @@ class ORTHOMETRIC_OT_finish_stage_two(bpy.types.Operator):
         
         # mark side as done
         props.has_side = True
+        images.show_full(registry.primary_obj(props, 'SIDE', 'img'), False)
+        error = calib_cache.store(context.scene, registry.primary(props, 'SIDE'))
+        if error:
+            self.report({'WARNING'}, error)
         
         # return to lobby
         props.stage = 'START'
@@ -261,6 +256,22 @@ class ORTHOMETRIC_OT_finish_stage_two(bpy.types.Operator):
         return {'FINISHED'}
 
 
+def open_side(context):
+    # switch to side cam and controls
+    props = context.scene.orthometric
+    scene = context.scene
+    
+    # 1. switch ui stage back to setup
+    props.stage = 'SIDE_SETUP'
+    
+    # 2. set active cam
+    cam = registry.primary_obj(props, 'SIDE', 'cam')
+    if cam:
+        scene.camera = cam
+        
+    # 3. force viewport to camera
+    stage_one.camera_viewports(context)
+
 class ORTHOMETRIC_OT_edit_side(bpy.types.Operator):
     # switch to side cam and controls
     bl_idname = "orthometric.edit_side"
@@ -268,22 +279,7 @@ class ORTHOMETRIC_OT_edit_side(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        props = context.scene.orthometric
-        scene = context.scene
-        
-        # 1. switch ui stage back to setup
-        props.stage = 'SIDE_SETUP'
-        
-        # 2. set active cam
-        cam = bpy.data.objects.get("Ortho_Cam_Side")
-        if cam:
-            scene.camera = cam
-            
-        # 3. force viewport to camera
-        for area in context.screen.areas:
-            if area.type == 'VIEW_3D':
-                area.spaces[0].region_3d.view_perspective = 'CAMERA'
-                
+        open_side(context)
         return {'FINISHED'}
 
 ## Stage 3 / Additional-views logic (RETIRED WORKING ON REMOVING)
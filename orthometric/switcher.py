@@ -0,0 +1,176 @@
+import bpy
+import math
+from bpy.app.handlers import persistent
+from . import drivers, registry, residency, sequence, stage_one
+
+# fast view switching for the cycle operator / pie menu
+# each view gets a snapshot (camera, collection, stage, master) built once and reused,
+# a switch compares the snapshot with the one being left and only writes what differs:
+# two collection flips, maybe the scene camera and the stage, the stage 3 sliders of custom views
+# (the list index is written without its update callback, which would redo all of it)
+
+STAGES = {'FRONT': 'FRONT_SETUP', 'SIDE': 'SIDE_SETUP'}
+
+# stages a switch can leave, calibration in progress keeps its view
+SWITCHABLE = {'START', 'FRONT_SETUP', 'SIDE_SETUP', 'STAGE_3_SETUP'}
+
+# runtime only, rebuilt when the list changes
+_snapshots = []
+
+
+def snapshot(scene, item):
+    return {
+        'collection': registry.view_collection(scene, item),
+        'cam': item.obj_cam,
+        'master': item.obj_master,
+        'stage': STAGES.get(item.view_type, 'STAGE_3_SETUP'),
+        'sequence': item.view_type == 'SEQUENCE',
+        'character': item.character,
+    }
+
+
+def snapshots(scene):
+    props = scene.orthometric
+    views = props.custom_views
+    stale = len(_snapshots) != len(views) or any(
+        snap['master'] != item.obj_master for snap, item in zip(_snapshots, views))
+    if stale:
+        _snapshots[:] = [snapshot(scene, item) for item in views]
+    return _snapshots
+
+
+def invalidate():
+    _snapshots.clear()
+
+
+@persistent
+def on_load_post(_):
+    # snapshots hold objects of the file being closed
+    invalidate()
+
+
+def switch(context, index, stage=None):
+    # make view index active and open its controls, stage overrides the view's own (esc back to lobby)
+    scene = context.scene
+    props = scene.orthometric
+    snaps = snapshots(scene)
+    if not 0 <= index < len(snaps):
+        return False
+    old_index = props.active_view_index
+    old = snaps[old_index] if old_index < len(snaps) else None
+    new = snaps[index]
+    item = props.custom_views[index]
+    stage = stage or new['stage']
+
+    # leaving a driven stage 3 master: keep its rotation
+    if props.use_drivers and old and props.stage == 'STAGE_3_SETUP' and (
+            old['master'] != new['master'] or stage != 'STAGE_3_SETUP'):
+        drivers.release_master(props, props.custom_views[old_index])
+
+    props["active_view_index"] = index
+    registry.show_view(scene, item)
+    residency.activate(props, item)
+    if new['cam'] and scene.camera != new['cam']:
+        scene.camera = new['cam']
+
+    if props.stage != stage:
+        props.stage = stage
+
+    if stage == 'STAGE_3_SETUP' and new['master']:
+        # sliders follow the master, written raw so the master is not written back
+        rot = new['master'].rotation_euler
+        props["stage_3_rot_x"] = math.degrees(rot.x)
+        props["stage_3_rot_z"] = math.degrees(rot.z)
+        if new['sequence']:
+            sequence.show_angle(props, item, props.stage_3_rot_z)
+        if props.use_drivers:
+            drivers.drive_master(scene, item)
+
+    stage_one.camera_viewports(context)
+    return True
+
+
+def neighbour(props, delta):
+    # next / previous view of the active character, wrapping around
+    snaps = snapshots(props.id_data)
+    count = len(snaps)
+    index = props.active_view_index
+    for _ in range(count):
+        index = (index + delta) % count
+        if snaps[index]['character'] == props.character_uid:
+            return index
+    return props.active_view_index
+
+
+def redraw(context):
+    # list / panel follow the raw index write
+    if context.screen is None: return
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
+
+
+class ORTHOMETRIC_OT_cycle_view(bpy.types.Operator):
+    # hotkey view cycling: step with the arrows / wheel while the hotkey modifiers are held,
+    # releasing them keeps the view, esc / right click goes back
+    bl_idname = "orthometric.cycle_view"
+    bl_label = "Cycle Views"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    direction: bpy.props.EnumProperty(
+        items=[('NEXT', "Next", ""), ('PREV', "Previous", "")],
+        default='NEXT'
+    )
+    index: bpy.props.IntProperty(default=-1, options={'SKIP_SAVE'}) # jump straight to a view (pie menu)
+
+    @classmethod
+    def poll(cls, context):
+        props = context.scene.orthometric
+        return registry.active(props) is not None and props.stage in SWITCHABLE
+
+    def step(self, context, delta):
+        props = context.scene.orthometric
+        switch(context, neighbour(props, delta))
+        context.area.header_text_set(f"View: {props.custom_views[props.active_view_index].name}  "
+                                     f"(arrows / wheel: cycle, release: keep, esc: back)")
+        redraw(context)
+
+    def execute(self, context):
+        props = context.scene.orthometric
+        if self.index >= 0:
+            index = self.index
+        else:
+            index = neighbour(props, 1 if self.direction == 'NEXT' else -1)
+        switch(context, index)
+        redraw(context)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if self.index >= 0 or context.area is None or context.area.type != 'VIEW_3D':
+            return self.execute(context)
+        props = context.scene.orthometric
+        self._start = (props.active_view_index, props.stage)
+        snapshots(context.scene)
+        self.step(context, 1 if self.direction == 'NEXT' else -1)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.value == 'PRESS' and event.type in {'RIGHT_ARROW', 'DOWN_ARROW', 'WHEELDOWNMOUSE', 'TAB'}:
+            self.step(context, 1)
+        elif event.value == 'PRESS' and event.type in {'LEFT_ARROW', 'UP_ARROW', 'WHEELUPMOUSE'}:
+            self.step(context, -1)
+        elif event.value == 'PRESS' and event.type in {'ESC', 'RIGHTMOUSE'}:
+            switch(context, *self._start)
+            return self.finish(context, {'CANCELLED'})
+        elif event.type in {'LEFT_CTRL', 'RIGHT_CTRL', 'LEFT_ALT', 'RIGHT_ALT'} and event.value == 'RELEASE':
+            return self.finish(context, {'FINISHED'})
+        elif event.value == 'PRESS' and event.type in {'LEFTMOUSE', 'RET', 'SPACE'}:
+            return self.finish(context, {'FINISHED'})
+        return {'RUNNING_MODAL'}
+
+    def finish(self, context, result):
+        context.area.header_text_set(None)
+        redraw(context)
+        return result
+
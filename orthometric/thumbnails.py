@@ -0,0 +1,49 @@
+import bpy
+import bpy.utils.previews
+from . import images
+
+# view list thumbnails from one bpy.utils.previews collection
+# keyed by the source file, each is made once (blender builds it off the ui thread)
+# and served as an icon id on every redraw after that
+
+_previews = None
+
+
+def view_source(item):
+    # file the view shows: first frame of a turntable, the original behind a proxy, "" for generated images
+    if item.view_type == 'SEQUENCE':
+        return item.frames[0].filepath if item.frames else ""
+    image = images.full_image(images.object_image(item.obj_img))
+    if image is None or image.name == images.PLACEHOLDER_NAME:
+        return ""
+    return image.filepath
+
+
+def icon(item):
+    # icon id of the view's thumbnail, 0 when there is none (yet)
+    if _previews is None:
+        return 0
+    path = bpy.path.abspath(view_source(item))
+    if not path:
+        return 0
+    preview = _previews.get(path)
+    if preview is None:
+        preview = _previews.load(path, path, 'IMAGE')
+    return preview.icon_id
+
+
+def clear():
+    if _previews is not None:
+        _previews.clear()
+
+
+def register():
+    global _previews
+    _previews = bpy.utils.previews.new()
+
+
+def unregister():
+    global _previews
+    if _previews is not None:
+        bpy.utils.previews.remove(_previews)
+        _previews = None
@@ -1,16 +1,137 @@
 import bpy
+import os
+from . import images, loader, profiler, registry, residency, server, thumbnails
+
+VIEW_ICONS = {'FRONT': 'AXIS_FRONT', 'SIDE': 'AXIS_SIDE', 'SEQUENCE': 'RENDER_ANIMATION', 'CUSTOM': 'CAMERA_DATA'}
 
 class ORTHOMETRIC_UL_view_list(bpy.types.UIList):
-    # list of custom views
+    # list of custom views, filtered & sorted in filter_items (one pass over the list per redraw)
+    filter_type: bpy.props.EnumProperty(
+        name="Type",
+        items=[('ALL', "All", ""), ('FRONT', "Front", ""), ('SIDE', "Side", ""),
+               ('CUSTOM', "Custom", ""), ('SEQUENCE', "Turntable", "")],
+        default='ALL'
+    )
+    use_angle_range: bpy.props.BoolProperty(name="Angle Range", default=False)
+    angle_min: bpy.props.FloatProperty(name="From", default=-180.0, min=-180.0, max=180.0)
+    angle_max: bpy.props.FloatProperty(name="To", default=180.0, min=-180.0, max=180.0)
+    sort_by: bpy.props.EnumProperty(
+        name="Sort",
+        items=[('INDEX', "Order", "Order views were added"), ('NAME', "Name", ""),
+               ('TYPE', "Type", ""), ('ANGLE', "Angle", "Angle from the front")],
+        default='INDEX'
+    )
+    show_thumbnails: bpy.props.BoolProperty(name="Thumbnails", default=True)
+
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
         # allow renaming directly oNLY FOR CUSTOM TYPES
         if self.layout_type in {'DEFAULT', 'COMPACT'}:
-            if item.view_type == 'CUSTOM':
-                layout.prop(item, "name", text="", emboss=False, icon='CAMERA_DATA')
+            thumb = thumbnails.icon(item) if self.show_thumbnails else 0
+            kwargs = {'icon_value': thumb} if thumb else {'icon': VIEW_ICONS[item.view_type]}
+            if item.view_type in ('CUSTOM', 'SEQUENCE'):
+                layout.prop(item, "name", text="", emboss=False, **kwargs)
             else:
-                layout.label(text=item.name, icon='CAMERA_DATA')
+                layout.label(text=item.name, **kwargs)
+            layout.alignment = 'CENTER'
+            layout.label(text="", icon=VIEW_ICONS[item.view_type])
+        elif self.layout_type == 'GRID':
             layout.alignment = 'CENTER'
-            layout.label(text="", icon='CAMERA_DATA')
+            thumb = thumbnails.icon(item)
+            if thumb:
+                layout.label(text="", icon_value=thumb)
+            else:
+                layout.label(text="", icon=VIEW_ICONS[item.view_type])
+
+    def draw_filter(self, context, layout):
+        row = layout.row(align=True)
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "use_filter_invert", text="", icon='ARROW_LEFTRIGHT')
+        row = layout.row(align=True)
+        row.prop(self, "filter_type", text="")
+        row.prop(self, "sort_by", text="")
+        row.prop(self, "use_filter_sort_reverse", text="", icon='SORT_DESC')
+        row = layout.row(align=True)
+        row.prop(self, "use_angle_range", text="", icon='DRIVER_ROTATIONAL_DIFFERENCE')
+        sub = row.row(align=True)
+        sub.active = self.use_angle_range
+        sub.prop(self, "angle_min")
+        sub.prop(self, "angle_max")
+        layout.prop(self, "show_thumbnails")
+
+    def filter_items(self, context, data, propname):
+        views = getattr(data, propname)
+        helpers = bpy.types.UI_UL_list
+
+        # name first (blender's helper), then type / angle on the same flags
+        if self.filter_name:
+            flags = helpers.filter_items_by_name(self.filter_name, self.bitflag_filter_item, views, "name")
+        else:
+            flags = [self.bitflag_filter_item] * len(views)
+
+        angles = None
+        if self.use_angle_range or self.sort_by == 'ANGLE':
+            angles = [registry.view_angle(item) for item in views]
+
+        for idx, item in enumerate(views):
+            if not flags[idx]:
+                continue
+            if item.character != data.character_uid:
+                # other characters' views
+                flags[idx] = 0
+            elif self.filter_type != 'ALL' and item.view_type != self.filter_type:
+                flags[idx] = 0
+            elif self.use_angle_range and not self.angle_min <= angles[idx] <= self.angle_max:
+                flags[idx] = 0
+
+        if self.sort_by == 'NAME':
+            order = helpers.sort_items_by_name(views, "name")
+        elif self.sort_by == 'TYPE':
+            order = helpers.sort_items_helper(list(enumerate(item.view_type for item in views)), key=lambda entry: entry[1])
+        elif self.sort_by == 'ANGLE':
+            order = helpers.sort_items_helper(list(enumerate(angles)), key=lambda entry: entry[1])
+        else:
+            order = []
+        return flags, order
+
+class ORTHOMETRIC_MT_view_pie(bpy.types.Menu):
+    # jump to any view, the pie holds 8, cycling reaches the rest
+    bl_label = "OrthoMetric Views"
+    bl_idname = "ORTHOMETRIC_MT_view_pie"
+
+    def draw(self, context):
+        props = context.scene.orthometric
+        pie = self.layout.menu_pie()
+        for idx, item in registry.character_views(props)[:8]:
+            op = pie.operator("orthometric.cycle_view", text=item.name, icon=VIEW_ICONS[item.view_type],
+                              depress=idx == props.active_view_index)
+            op.index = idx
+
+def draw_residuals(layout, props):
+    # per landmark error of the last calibration, worst one highlighted
+    if not props.landmark_residuals:
+        return
+    box = layout.box()
+    box.label(text="Last Calibration Residuals", icon='DRIVER_DISTANCE')
+    worst = max(props.landmark_residuals, key=lambda entry: entry.error)
+    col = box.column(align=True)
+    for entry in props.landmark_residuals:
+        row = col.row()
+        row.alert = entry == worst
+        row.label(text=entry.name)
+        row.prop(entry, "error", text="", emboss=False)
+
+def draw_resolution(layout, props):
+    # proxy / full resolution swap of the active view, hidden when it has no proxy
+    if not props.custom_views:
+        return
+    image = images.object_image(registry.view_obj(registry.active(props), 'img'))
+    if images.is_proxy(image):
+        layout.operator("orthometric.full_resolution", text="Full Resolution", icon='ZOOM_IN')
+    elif image and images.proxy_image(image) != image:
+        layout.operator("orthometric.full_resolution", text="Back to Proxy", icon='ZOOM_OUT')
+
+def draw_calibration_options(layout, props):
+    layout.prop(props, "calib_solve_rotation")
 
 class ORTHOMETRIC_PT_main(bpy.types.Panel):
     bl_label = "SS Vantage Suite: OrthoMetric Tools"
@@ -23,8 +144,34 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
         layout = self.layout
         props = context.scene.orthometric
 
+        # background image loads
+        progress = loader.progress()
+        if progress:
+            done, total = progress
+            layout.progress(factor=done / total, text=f"Loading images {done}/{total}")
+        failures = loader.failures()
+        if failures:
+            box = layout.box()
+            box.alert = True
+            row = box.row()
+            row.label(text=f"{len(failures)} images could not be loaded", icon='ERROR')
+            row.operator("orthometric.clear_load_errors", text="", icon='X')
+            for filepath, reason in failures[-3:]:
+                box.label(text=f"{os.path.basename(filepath)}: {reason}")
+
         # stage 0: lobby
         if props.stage == 'START':
+            # characters of a lineup, each with its own views & anchors
+            box = layout.box()
+            row = box.row()
+            if props.characters:
+                row.template_list("UI_UL_list", "characters", props, "characters", props, "active_character_index", rows=2)
+            else:
+                row.label(text="Single Character", icon='USER')
+            col = row.column(align=True)
+            col.operator("orthometric.add_character", icon='ADD', text="")
+            col.operator("orthometric.remove_character", icon='REMOVE', text="")
+
             if not (props.has_front and props.has_side):
                 box = layout.box()
                 box.label(text="Primary Views:")
@@ -40,6 +187,26 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
 
                 box.separator()
 
+            # import settings
+            box = layout.box()
+            box.prop(props, "async_import")
+            row = box.row(align=True)
+            row.prop(props, "use_proxies")
+            sub = row.row(align=True)
+            sub.active = props.use_proxies
+            sub.prop(props, "proxy_max_edge")
+            row = box.row(align=True)
+            row.prop(props, "resident_views")
+            row.prop(props, "image_budget")
+            box.label(text=f"Loaded: {residency.loaded_bytes(props) / 1048576:.0f} MB", icon='MEMORY')
+            box.prop(props, "use_drivers", icon='DRIVER')
+            box.prop(props, "image_display")
+            row = box.row(align=True)
+            row.prop(props, "use_calibration_cache")
+            row.operator("orthometric.clear_calibration_cache", text="", icon='TRASH')
+            box.operator("orthometric.toggle_server", icon='LINKED', depress=server.running(),
+                         text="Command Server: On" if server.running() else "Command Server: Off")
+
             # unified view list
             box = layout.box()
             box.label(text="Views:")
@@ -48,10 +215,26 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
             
             col = row.column(align=True)
             col.operator("orthometric.add_custom_view", icon='ADD', text="")
+            col.operator("orthometric.add_sequence_view", icon='RENDER_ANIMATION', text="")
             col.operator("orthometric.remove_custom_view", icon='REMOVE', text="")
+            col.separator()
+            col.operator("orthometric.import_sheet", icon='IMAGE_REFERENCE', text="")
+            col.operator("orthometric.import_batch", icon='FILE_FOLDER', text="")
+            col.operator("orthometric.import_manifest", icon='IMPORT', text="")
+            col.operator("orthometric.export_manifest", icon='EXPORT', text="")
             
-            if len(props.custom_views) > 0:
+            if registry.active(props):
                 box.operator("orthometric.enter_config", text="Enter Configuration", icon='PREFERENCES')
+
+                # joint solve over every calibrated view
+                box = layout.box()
+                box.label(text="Joint Calibration", icon='CON_SAMEVOL')
+                col = box.column(align=True)
+                col.prop(props, "solve_view_rotation")
+                col.prop(props, "calib_solve_rotation")
+                col.prop(props, "solve_anchor_weight", slider=True)
+                box.operator("orthometric.solve_all", text="Solve All", icon='FILE_REFRESH')
+                draw_residuals(layout, props)
         
         ## Front Controller
         if props.stage in ['FRONT_SETUP', 'FRONT_CALIBRATE']:
@@ -73,23 +256,29 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
             
             if not props.is_centering:
                 col = box.column(align=True)
-                col.operator("orthometric.center_tool", text="Center Image", icon='TRANSFORM_ORIGINS')
+                row = col.row(align=True)
+                row.operator("orthometric.auto_center", text="Auto Center", icon='MOD_MIRROR')
+                row.operator("orthometric.center_tool", text="Manual", icon='TRANSFORM_ORIGINS')
                 col.operator("orthometric.start_calibration", text="Start Calibration", icon='TRACKING_FORWARDS')
+                draw_resolution(col, props)
             else:
                 # centering mode
                 box.alert = True
                 box.label(text="Move 'Helper_Center' to X symmetry line")
                 box.operator("orthometric.confirm_center", text="Confirm Centering")
 
+            draw_residuals(layout, props)
+
         # 4. calibration wizard
         elif props.stage == 'FRONT_CALIBRATE':
             box = layout.box()
             box.label(text="Calibration Active", icon='PREFERENCES')
             
             msg = box.column(align=True)
-            msg.label(text="Align anchors to Tear Duct & Chin")
+            msg.label(text="Align duplicates to their landmarks")
             
             box.separator()
+            draw_calibration_options(box, props)
             box.operator("orthometric.apply_calibration", text="Apply & Reset", icon='CHECKMARK')
 
         ## Side Controller
@@ -114,6 +303,11 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
             col.operator("orthometric.mirror_side", text="Mirror Image", icon='MOD_MIRROR')
             col.separator()
             col.operator("orthometric.start_calibration_side", text="Start Calibration", icon='TRACKING_FORWARDS')
+            col.operator("orthometric.auto_align_side", text="Auto Align to Front", icon='ALIGN_MIDDLE')
+            col.prop(props, "auto_align_side")
+            draw_resolution(col, props)
+
+            draw_residuals(layout, props)
 
         # 4. calibration wizard
         elif props.stage == 'SIDE_CALIBRATE':
@@ -124,6 +318,7 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
             msg.label(text="Align anchors to Image")
             
             box.separator()
+            draw_calibration_options(box, props)
             box.operator("orthometric.apply_calibration_side", text="Apply & Reset", icon='CHECKMARK')
         
 
@@ -142,22 +337,76 @@ class ORTHOMETRIC_PT_main(bpy.types.Panel):
             col.prop(props, "stage_3_rot_z", text="Z Rotation")
             
             # 3. cam controls (local)
-            if len(props.custom_views) > 0:
-                item = props.custom_views[props.active_view_index]
+            item = registry.active(props)
+            if item:
                 
                 box = layout.box()
                 box.label(text="Camera Settings (Local)")
                 box.prop(item, "fov", slider=True) 
                 box.prop(item, "dist_off", slider=True, text="Distance Offset")
+                box.operator("orthometric.estimate_lens", text="Estimate from Landmarks", icon='VIEW_CAMERA')
+
+                # turntable frame mapping
+                if item.view_type == 'SEQUENCE':
+                    box = layout.box()
+                    box.label(text=f"Turntable: frame {item.seq_frame + 1}/{len(item.frames)}", icon='RENDER_ANIMATION')
+                    col = box.column(align=True)
+                    col.prop(item, "seq_start_angle")
+                    col.prop(item, "seq_reverse")
+                    col.prop(props, "seq_cache_size")
 
             # 4. calibration
             if props.stage == 'STAGE_3_SETUP':
                 box = layout.box()
                 box.label(text="Calibration", icon='TRACKING')
                 box.operator("orthometric.start_calibration_s3", text="Start Calibration", icon='TRACKING_FORWARDS')
+                draw_resolution(box, props)
+
+                draw_residuals(layout, props)
                 
             elif props.stage == 'STAGE_3_CALIBRATE':
                 box = layout.box()
                 box.alert = True
                 box.label(text="Align Duplicates (X,Y,Z)")
-                box.operator("orthometric.apply_calibration_s3", text="Apply Calibration", icon='CHECKMARK')
\ No newline at end of file
+                draw_calibration_options(box, props)
+                box.operator("orthometric.apply_calibration_s3", text="Apply Calibration", icon='CHECKMARK')
+
+class ORTHOMETRIC_PT_debug(bpy.types.Panel):
+    # per operator / update callback timings, collapsed by default
+    bl_label = "Debug"
+    bl_idname = "ORTHOMETRIC_PT_debug"
+    bl_parent_id = "ORTHOMETRIC_PT_main"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'SS: OrthoMetric'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    # slowest names shown
+    ROWS = 12
+
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.orthometric
+
+        row = layout.row(align=True)
+        row.operator("orthometric.toggle_profiling", icon='TIME', depress=profiler.enabled(),
+                     text="Profiling: On" if profiler.enabled() else "Profiling: Off")
+        row.operator("orthometric.reset_profile", icon='X', text="")
+        row.operator("orthometric.dump_profile", icon='EXPORT', text="")
+        layout.label(text=f"Images: {residency.loaded_bytes(props) / 1048576:.0f} MB", icon='MEMORY')
+
+        rows = profiler.summary()
+        if not rows:
+            return
+        col = layout.column(align=True)
+        header = col.row()
+        for text in ("Name", "Calls", "Total ms", "Max ms", "Updates", "Objects"):
+            header.label(text=text)
+        for entry in rows[:self.ROWS]:
+            line = col.row()
+            line.label(text=entry['name'].replace("orthometric.", ""))
+            line.label(text=str(entry['calls']))
+            line.label(text=f"{entry['total']:.1f}")
+            line.label(text=f"{entry['max']:.1f}")
+            line.label(text=str(entry['depsgraph']))
+            line.label(text=str(entry['objects']))
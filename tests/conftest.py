@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the bpy-free modules (core, analysis, client) are imported on their own,
+# importing them through the package would run its __init__, which needs blender
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "orthometric"))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import analysis
+
+
+## match_profiles
+
+def bumps(z):
+    # a profile with features at known heights: chin, mouth, nose, eyes, brow
+    features = [(1.0, 1.65), (0.6, 1.58), (0.8, 1.5), (0.5, 1.42), (0.7, 1.33)]
+    return sum(weight * np.exp(-((z - height) / 0.01) ** 2) for weight, height in features)
+
+
+PIVOT = 1.47
+
+
+def test_match_profiles_recovers_scale_and_shift():
+    ref_z = np.linspace(1.2, 1.8, 300)
+    moving_z = np.linspace(1.25, 1.75, 250)
+    # a moving row at z lands on pivot + scale * (z - pivot) + shift
+    scale, shift = 1.2, 0.03
+    moving = bumps(PIVOT + scale * (moving_z - PIVOT) + shift)
+    found, moved, score = analysis.match_profiles(bumps(ref_z), ref_z, moving, moving_z, pivot=PIVOT)
+    assert found == pytest.approx(scale, abs=0.02)
+    assert moved == pytest.approx(shift, abs=0.005)
+    assert score > 0.9
+
+
+def test_match_profiles_unrelated_scores_low():
+    ref_z = np.linspace(1.2, 1.8, 300)
+    moving_z = np.linspace(1.25, 1.75, 250)
+    noise = np.random.default_rng(3).normal(size=moving_z.size)
+    *_, score = analysis.match_profiles(bumps(ref_z), ref_z, noise, moving_z, pivot=PIVOT)
+    assert score < 0.5
+
+
+## find_panels
+
+def sheet(boxes, height=400, width=600):
+    # white sheet with a dark drawing in each (x0, y0, x1, y1) pixel box, y from the top
+    pixels = np.ones((height, width, 3), np.float32)
+    for x0, y0, x1, y1 in boxes:
+        pixels[y0:y1, x0:x1] = 0.2
+    return pixels
+
+
+def test_find_panels_known_boxes():
+    boxes = [(40, 30, 260, 180), (40, 220, 260, 370), (330, 60, 560, 340)]
+    panels = analysis.find_panels(sheet(boxes))
+    # left band top to bottom, then the right band; v from the bottom
+    expected = [(x0 / 600, 1 - y1 / 400, x1 / 600, 1 - y0 / 400) for x0, y0, x1, y1 in boxes]
+    assert len(panels) == len(expected)
+    for panel, rect in zip(panels, expected):
+        # each grows by a margin of half a gap at most
+        assert panel[0] <= rect[0] and panel[1] <= rect[1]
+        assert panel[2] >= rect[2] and panel[3] >= rect[3]
+        assert panel == pytest.approx(rect, abs=0.01)
+
+
+def test_find_panels_blank_sheet():
+    assert analysis.find_panels(sheet([])) == []
+
+
+## symmetry_axis
+
+def mirrored(axis, height=120, width=200):
+    # blobs placed in pairs around a vertical axis at the given fraction of the width
+    y, x = np.mgrid[:height, :width] + 0.5
+    gray = np.zeros((height, width), np.float32)
+    for dx, cy, radius in [(30, 40, 8), (25, 80, 10), (50, 60, 6)]:
+        for side in (1, -1):
+            gray += np.exp(-((x - axis * width - side * dx) ** 2 + (y - cy) ** 2) / radius ** 2)
+    return gray
+
+
+def test_symmetry_axis_found():
+    axis, score = analysis.symmetry_axis(mirrored(0.42))
+    assert axis == pytest.approx(0.42, abs=0.005)
+    assert score >= analysis.MIN_SYMMETRY
+
+
+def test_symmetry_axis_flat_image_below_threshold():
+    # nothing to mirror, Auto Center must not move the image
+    _, score = analysis.symmetry_axis(np.full((120, 200), 0.5, np.float32))
+    assert score < analysis.MIN_SYMMETRY
+
+
+def test_symmetry_axis_asymmetric_image_below_threshold():
+    noise = np.random.default_rng(5).random((120, 200)).astype(np.float32)
+    _, score = analysis.symmetry_axis(noise)
+    assert score < analysis.MIN_SYMMETRY
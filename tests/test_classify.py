@@ -0,0 +1,47 @@
+import pytest
+
+import analysis
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("front.jpg", ('FRONT', 0.0)),
+    ("Frontal_Neutral.png", ('FRONT', 0.0)),
+    ("side.jpg", ('SIDE', 90.0)),
+    ("head_profile.tif", ('SIDE', 90.0)),
+    ("misc.jpg", ('CUSTOM', None)),
+])
+def test_plain_words(name, expected):
+    assert analysis.classify(name) == expected
+
+
+# the same pose must give the same view whatever order its words come in
+@pytest.mark.parametrize("names, expected", [
+    (("front_3q.jpg", "3q_front.jpg"), ('CUSTOM', 45.0)),
+    (("front_threequarter.jpg", "threequarter_front.jpg"), ('CUSTOM', 45.0)),
+    (("front_angle30.jpg", "angle30_front.jpg"), ('CUSTOM', 30.0)),
+    (("side_back.jpg", "back_side.jpg"), ('CUSTOM', 180.0)),
+    (("profile_rot_-45.jpg", "rot_-45_profile.jpg"), ('CUSTOM', -45.0)),
+    (("front_angle0.jpg", "angle0_front.jpg"), ('FRONT', 0.0)),
+    (("side_90deg.jpg", "90deg_side.jpg"), ('SIDE', 90.0)),
+])
+def test_explicit_angle_beats_front_side_words(names, expected):
+    for name in names:
+        assert analysis.classify(name) == expected, name
+
+
+def test_metadata_text():
+    assert analysis.classify("IMG_0042.jpg", "three quarter 3q") == ('CUSTOM', 45.0)
+    assert analysis.classify("IMG_0042.jpg", "front") == ('FRONT', 0.0)
+    assert analysis.classify("front.jpg", "yaw 60") == ('CUSTOM', 60.0)
+
+
+# angle words and numbers inside other tokens are not angles
+@pytest.mark.parametrize("name, expected", [
+    ("IMG_1045deg.jpg", ('CUSTOM', None)),
+    ("triangle3_front.jpg", ('FRONT', 0.0)),
+    ("carrot_2_side.jpg", ('SIDE', 90.0)),
+    ("angle1234.jpg", ('CUSTOM', None)),
+    ("rotation90.jpg", ('CUSTOM', None)),
+])
+def test_no_angle_inside_words(name, expected):
+    assert analysis.classify(name) == expected
@@ -0,0 +1,283 @@
+import numpy as np
+import pytest
+
+import core
+
+
+ANCHOR_A = (-0.1, 0.0, 1.6)
+ANCHOR_B = (0.1, 0.0, 1.4)
+
+
+def dups(scale, offset, pivot=core.HEAD_PIVOT):
+    # anchors as the image shows them before a calibration that scales by scale about pivot, then moves
+    pivot = np.array(pivot)
+    inverse = [pivot + (np.array(anchor) - offset - pivot) / scale for anchor in (ANCHOR_A, ANCHOR_B)]
+    return inverse[0], inverse[1]
+
+
+## solve_two_point / calibrate
+
+def test_two_point_recovers_scale_and_offset():
+    dup_a, dup_b = dups(2.0, np.array([0.05, 0.0, -0.02]))
+    scale, offset = core.solve_two_point(ANCHOR_A, ANCHOR_B, dup_a, dup_b)
+    assert scale == pytest.approx(2.0)
+    assert offset == pytest.approx([0.05, 0.0, -0.02])
+
+    mid = np.array(core.HEAD_PIVOT) + scale * ((dup_a + dup_b) / 2 - core.HEAD_PIVOT) + offset
+    assert mid == pytest.approx((np.array(ANCHOR_A) + np.array(ANCHOR_B)) / 2)
+
+
+def test_two_point_move_axes():
+    dup_a, dup_b = dups(1.0, np.array([0.3, 0.2, 0.1]))
+    _, offset = core.solve_two_point(ANCHOR_A, ANCHOR_B, dup_a, dup_b, move_axes=(0, 0, 1))
+    assert offset[:2] == pytest.approx([0.0, 0.0])
+    assert offset[2] == pytest.approx(0.1)
+
+
+def test_two_point_batched():
+    cases = [dups(s, np.array([0.0, 0.0, dz])) for s, dz in ((0.5, 0.1), (1.0, 0.0), (3.0, -0.2))]
+    dup_a = np.stack([a for a, _ in cases])
+    dup_b = np.stack([b for _, b in cases])
+    scale, offset = core.solve_two_point(ANCHOR_A, ANCHOR_B, dup_a, dup_b)
+    assert scale.shape == (3,)
+    assert offset.shape == (3, 3)
+    assert scale == pytest.approx([0.5, 1.0, 3.0])
+    assert offset[:, 2] == pytest.approx([0.1, 0.0, -0.2])
+
+
+def test_two_point_coincident_dups_is_nan():
+    scale, offset = core.solve_two_point(ANCHOR_A, ANCHOR_B, (0, 0, 1.5), (0, 0, 1.5))
+    assert np.isnan(scale)
+
+
+def test_calibrate_moves_dups_onto_anchors():
+    dup_a, dup_b = dups(1.5, np.array([0.0, 0.0, 0.08]))
+    matrices = np.eye(4)
+    new, scale = core.calibrate(matrices, ANCHOR_A, ANCHOR_B, dup_a, dup_b, 'CUSTOM')
+    assert scale == pytest.approx(1.5)
+    # the dups ride along with the image
+    for dup, anchor in ((dup_a, ANCHOR_A), (dup_b, ANCHOR_B)):
+        assert (new @ np.append(dup, 1.0))[:3] == pytest.approx(anchor)
+
+
+def test_calibrate_front_keeps_depth():
+    dup_a, dup_b = dups(2.0, np.zeros(3))
+    new, _ = core.calibrate(np.eye(4), ANCHOR_A, ANCHOR_B, dup_a, dup_b, 'FRONT')
+    # front views scale on x / z only and never move sideways or in depth
+    assert new[1, 1] == pytest.approx(1.0)
+    assert new[0, 3] == pytest.approx(0.0)
+    assert new[1, 3] == pytest.approx(0.0)
+
+
+def test_calibrate_batched_leaves_unsolved_rows():
+    dup_a, dup_b = dups(2.0, np.zeros(3))
+    dup_a = np.stack([dup_a, (0, 0, 1.5)])
+    dup_b = np.stack([dup_b, (0, 0, 1.5)])
+    matrices = np.broadcast_to(np.eye(4), (2, 4, 4))
+    new, scale = core.calibrate(matrices, ANCHOR_A, ANCHOR_B, dup_a, dup_b)
+    assert new.shape == (2, 4, 4)
+    assert scale[0] == pytest.approx(2.0)
+    assert np.isnan(scale[1])
+    assert new[1] == pytest.approx(np.eye(4))
+
+
+## fit_similarity
+
+def similarity(points, scale, angle, offset, basis, pivot=core.HEAD_PIVOT):
+    # scale and rotate in the basis plane about pivot, then move
+    basis = np.array(basis)
+    cos, sin = np.cos(angle), np.sin(angle)
+    rel = np.array(points) - pivot
+    uv = rel @ basis.T
+    uv = scale * (uv @ np.array([[cos, sin], [-sin, cos]]))
+    rest = rel - (rel @ basis.T) @ basis
+    return pivot + uv @ basis + rest + offset
+
+
+SRC = np.array([(-0.05, 0.0, 1.6), (0.05, 0.0, 1.6), (0.0, 0.0, 1.5), (-0.04, 0.0, 1.4), (0.04, 0.0, 1.4)])
+
+
+def test_fit_similarity_without_rotation():
+    dst = similarity(SRC, 1.8, 0.0, (0.02, 0.0, -0.03), FRONT)
+    fit = core.fit_similarity(SRC, dst, FRONT)
+    assert fit.scale == pytest.approx(1.8)
+    assert fit.angle == 0.0
+    assert fit.residuals == pytest.approx(np.zeros(len(SRC)), abs=1e-9)
+
+
+def test_fit_similarity_with_rotation():
+    dst = similarity(SRC, 0.7, 0.2, (0.0, 0.0, 0.05), FRONT)
+    fit = core.fit_similarity(SRC, dst, FRONT, rotate=True)
+    assert fit.scale == pytest.approx(0.7)
+    assert fit.angle == pytest.approx(0.2)
+    moved = (fit.matrix[:3, :3] @ SRC.T).T + fit.matrix[:3, 3]
+    assert moved == pytest.approx(dst)
+
+
+def test_fit_similarity_two_landmarks_matches_two_point():
+    dup_a, dup_b = dups(2.5, np.array([0.01, 0.0, 0.04]))
+    fit = core.fit_similarity(np.stack([dup_a, dup_b]), np.array([ANCHOR_A, ANCHOR_B]), FRONT)
+    scale, _ = core.solve_two_point(ANCHOR_A, ANCHOR_B, dup_a, dup_b, dist_axes=(1, 0, 1))
+    assert fit.scale == pytest.approx(scale)
+
+
+def test_fit_similarity_zero_weight_ignores_landmark():
+    dst = similarity(SRC, 1.2, 0.0, np.zeros(3), FRONT)
+    dst[0] += (0.5, 0.0, 0.5)
+    weights = np.ones(len(SRC))
+    weights[0] = 0.0
+    fit = core.fit_similarity(SRC, dst, FRONT, weights=weights)
+    assert fit.scale == pytest.approx(1.2)
+    assert fit.residuals[1:] == pytest.approx(np.zeros(len(SRC) - 1), abs=1e-9)
+
+
+def test_fit_similarity_batched():
+    scales = np.array([0.5, 1.0, 2.0])
+    angles = np.array([0.0, 0.1, -0.3])
+    dst = np.stack([similarity(SRC, s, a, np.zeros(3), FRONT) for s, a in zip(scales, angles)])
+    src = np.broadcast_to(SRC, dst.shape)
+    fit = core.fit_similarity(src, dst, FRONT, rotate=True)
+    assert fit.matrix.shape == (3, 4, 4)
+    assert fit.scale.shape == fit.angle.shape == (3,)
+    assert fit.offset.shape == (3, 3)
+    assert fit.residuals.shape == (3, len(SRC))
+    assert fit.scale == pytest.approx(scales)
+    assert fit.angle == pytest.approx(angles)
+
+
+def test_fit_similarity_single_point_is_degenerate():
+    # one landmark has no spread to scale by: nan scale, identity transform
+    fit = core.fit_similarity(SRC[:1], SRC[:1] + (0.1, 0.0, 0.1), FRONT, rotate=True)
+    assert np.isnan(fit.scale)
+    assert fit.angle == 0.0
+    assert fit.offset == pytest.approx(np.zeros(3))
+    assert fit.matrix == pytest.approx(np.eye(4))
+
+
+## solve_joint
+
+PIVOT = np.array(core.HEAD_PIVOT)
+FRONT = core.view_basis('FRONT')
+SIDE = core.view_basis('SIDE')
+# a head's landmarks with depth, so a free view's orientation is observable
+HEAD = PIVOT + np.array([(-0.04, -0.02, 0.05), (0.04, -0.02, 0.05), (0.0, -0.1, 0.0), (-0.03, -0.03, -0.06),
+                         (0.03, -0.03, -0.06), (-0.07, 0.03, 0.0), (0.07, 0.03, 0.0)])
+
+
+def observe(axes, scale, offset=np.zeros(3), shown_on=None):
+    # photo features of HEAD: projected onto the plane of axes, shrunk by 1 / scale about the pivot, moved by -offset,
+    # drawn on the plane of shown_on (the orientation the view has now) when it differs
+    coords = (HEAD - PIVOT) @ axes.T / scale
+    return PIVOT + coords @ (axes if shown_on is None else shown_on) - offset
+
+
+def joint(features, view_types, orient=None, anchors=HEAD, weights=None, **kwargs):
+    views = len(view_types)
+    bases = np.stack([core.view_basis(t) if t != 'CUSTOM' else FRONT for t in view_types])
+    axes = [core.VIEW_AXES[t] for t in view_types]
+    if weights is None:
+        weights = np.ones((views, len(anchors)))
+    return core.solve_joint(np.stack(features), weights, anchors, bases, np.broadcast_to(PIVOT, (views, 3)),
+                            np.array([a['scale_axes'] for a in axes]), np.array([a['move_axes'] for a in axes]),
+                            orient=orient, **kwargs)
+
+
+def test_joint_recovers_view_scales():
+    result = joint([observe(FRONT, 1.5, np.array([0.0, 0.0, 0.02])), observe(SIDE, 0.8, np.array([0.0, 0.01, -0.03]))],
+                   ['FRONT', 'SIDE'])
+    assert result.residuals == pytest.approx(np.zeros((2, len(HEAD))), abs=1e-9)
+    assert result.landmarks == pytest.approx(HEAD)
+    front, side = result.transforms
+    # front scales on x / z only, side uniformly
+    assert np.diag(front)[:3] == pytest.approx([1.5, 1.0, 1.5])
+    assert np.diag(side)[:3] == pytest.approx([0.8, 0.8, 0.8])
+    assert result.rotations == pytest.approx(np.broadcast_to(np.eye(3), (2, 3, 3)))
+
+
+def test_joint_recovers_custom_orientation():
+    # a 3/4 photo shot 30 degrees round, its view still faces front
+    angle = np.radians(30)
+    true_axes = np.array([(np.cos(angle), np.sin(angle), 0.0), (0.0, 0.0, 1.0)])
+    features = [observe(FRONT, 1.0), observe(SIDE, 1.0), observe(true_axes, 1.2, shown_on=FRONT)]
+    result = joint(features, ['FRONT', 'SIDE', 'CUSTOM'], orient=[False, False, True], rotate=True)
+
+    assert result.residuals == pytest.approx(np.zeros((3, len(HEAD))), abs=1e-9)
+    rotation = result.rotations[2]
+    assert rotation @ FRONT[0] == pytest.approx(true_axes[0])
+    assert rotation @ FRONT[1] == pytest.approx(true_axes[1])
+    # in-plane scale of the custom view
+    linear = result.transforms[2][:3, :3]
+    assert np.linalg.norm(linear @ true_axes[0]) == pytest.approx(1.2)
+
+
+def test_joint_orientation_needs_enough_landmarks():
+    # below MIN_ORIENT_LANDMARKS marks a free view keeps its orientation
+    angle = np.radians(30)
+    true_axes = np.array([(np.cos(angle), np.sin(angle), 0.0), (0.0, 0.0, 1.0)])
+    weights = np.ones((2, len(HEAD)))
+    weights[1, core.MIN_ORIENT_LANDMARKS - 1:] = 0.0
+    result = joint([observe(FRONT, 1.0), observe(true_axes, 1.0, shown_on=FRONT)], ['FRONT', 'CUSTOM'],
+                   orient=[False, True], weights=weights)
+    assert result.rotations[1] == pytest.approx(np.eye(3))
+
+
+def test_joint_single_anchor_is_degenerate():
+    # one shared landmark has no spread to scale by: every view stays where it is
+    anchors = HEAD[:1]
+    features = [anchors + (0.01, 0.0, 0.02), anchors - (0.0, 0.01, 0.03)]
+    result = joint(features, ['FRONT', 'SIDE'], anchors=anchors)
+    assert np.all(np.isfinite(result.transforms))
+    assert result.transforms == pytest.approx(np.broadcast_to(np.eye(4), (2, 4, 4)))
+    assert result.landmarks.shape == (1, 3)
+    assert result.residuals.shape == (2, 1)
+
+
+## estimate_distance
+
+def test_estimate_distance_recovers_camera():
+    plane_point = np.array(core.HEAD_PIVOT)
+    normal = np.cross(FRONT[0], FRONT[1])
+    # a face with depth towards the camera
+    landmarks = plane_point + np.array([
+        (-0.04, 0.0, 0.03), (0.04, 0.0, 0.03), (0.0, 0.0, 0.0), (-0.03, 0.0, -0.05), (0.03, 0.0, -0.05),
+        (-0.07, 0.0, 0.0), (0.07, 0.0, 0.0)]) + np.outer([0.02, 0.02, 0.1, 0.03, 0.03, -0.04, -0.04], normal)
+    true_distance = 0.6
+    camera = plane_point + true_distance * normal
+
+    # what the photo shows: the perspective projection, at some scale on the image plane
+    x_t = (landmarks - plane_point) @ FRONT.T
+    x_n = (landmarks - plane_point) @ normal
+    proj = x_t * (true_distance / (true_distance - x_n))[:, None]
+    features = plane_point + 1.3 * proj @ FRONT
+
+    result = core.estimate_distance(landmarks, features, plane_point, FRONT, camera)
+    assert result.ok
+    assert result.distance == pytest.approx(true_distance, rel=0.02)
+    assert result.rms < 1e-3
+
+
+def test_estimate_distance_flat_landmarks_not_ok():
+    plane_point = np.array(core.HEAD_PIVOT)
+    normal = np.cross(FRONT[0], FRONT[1])
+    result = core.estimate_distance(SRC, SRC, plane_point, FRONT, plane_point + 2.0 * normal)
+    assert not result.ok
+
+
+def test_framing_lens_clamps():
+    lens, offset = core.framing_lens(core.BASE_DIST)
+    assert lens == pytest.approx(core.BASE_LENS)
+    assert offset == pytest.approx(0.0)
+    lens, offset = core.framing_lens(20.0)
+    assert lens == 200.0
+    # the dolly rule still puts the camera at the distance
+    assert core.dolly_distance(lens, offset) == pytest.approx(20.0)
+
+
+def test_framing_lens_keeps_offset_in_range():
+    lens, offset = core.framing_lens(100.0, offset_min=-2.0, offset_max=5.0)
+    assert lens == 200.0
+    assert offset == 5.0
+    assert core.dolly_distance(lens, offset) < 100.0
+    lens, offset = core.framing_lens(0.1, offset_min=-1.0)
+    assert lens == 10.0
+    assert offset == -1.0
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+import client
+import listener
+
+
+@pytest.fixture
+def address():
+    # short path, unix socket paths are limited to ~100 characters
+    folder = tempfile.mkdtemp(prefix="om")
+    path = os.path.join(folder, "test.sock")
+    listener.start(path, client.family(path))
+    yield path
+    listener.stop()
+    os.rmdir(folder)
+
+
+class Scene:
+    # stands in for blender: named views, an active one, and the order commands ran in
+    def __init__(self):
+        self.views = [{'name': "A"}, {'name': "B"}]
+        self.active = 0
+        self.ran = []
+
+    def find(self, ref):
+        if ref is None:
+            return self.views[self.active]
+        if isinstance(ref, int):
+            return self.views[ref]
+        return next(view for view in self.views if view['name'] == ref)
+
+    def run(self, command):
+        self.ran.append(command['cmd'])
+        try:
+            if command['cmd'] == 'select_view':
+                self.active = self.views.index(self.find(command['view']))
+                return {'ok': True, 'result': {}}
+            if command['cmd'] == 'set_view':
+                view = self.find(command.get('view'))
+                fields = {key: value for key, value in command.items() if key not in ('cmd', 'view')}
+                # world matrix written against the rotation as it is at that point
+                if 'matrix' in fields:
+                    view['matrix_rotation'] = view.get('rotation')
+                view.update(fields)
+                return {'ok': True, 'result': {'name': view['name']}}
+            return {'ok': True, 'result': command}
+        except StopIteration:
+            return {'ok': False, 'error': f"No view {command.get('view')!r}"}
+
+
+def ticking(scene, batches, stop):
+    # stands in for the server's timer: take a batch, run it in order, answer each command
+    while not stop.is_set():
+        batch = listener.take(64)
+        if not batch:
+            stop.wait(0.01)
+            continue
+        batches.append([command for command, _ in batch])
+        for command, future in batch:
+            future.set_result(scene.run(command))
+
+
+@pytest.fixture
+def scene():
+    return Scene()
+
+
+@pytest.fixture
+def tick(scene):
+    batches, stop = [], threading.Event()
+    thread = threading.Thread(target=ticking, args=(scene, batches, stop), daemon=True)
+    thread.start()
+    yield batches
+    stop.set()
+    thread.join()
+
+
+def test_single_command_round_trip(address, tick):
+    reply = client.send({'cmd': 'ping'}, address)
+    assert reply == {'ok': True, 'result': {'cmd': 'ping'}}
+
+
+def test_batch_runs_every_command_in_order(address, tick, scene):
+    commands = [
+        {'cmd': 'set_view', 'view': 0, 'fov': 40},
+        {'cmd': 'set_view', 'view': 1, 'fov': 60},
+        {'cmd': 'set_view', 'view': 0, 'dist_off': 1.5},
+        {'cmd': 'select_view', 'view': 0},
+        {'cmd': 'select_view', 'view': 1},
+    ]
+    replies = client.send(commands, address)
+    assert len(replies) == 5 and all(reply['ok'] for reply in replies)
+    # nothing merged or reordered, however the ticks split it
+    assert [command for batch in tick for command in batch] == commands
+    assert scene.ran == ['set_view', 'set_view', 'set_view', 'select_view', 'select_view']
+
+
+def test_edit_lands_on_the_view_selected_before_it(address, tick, scene):
+    client.send([
+        {'cmd': 'select_view', 'view': 0},
+        {'cmd': 'set_view', 'fov': 35},
+        {'cmd': 'select_view', 'view': 1},
+    ], address)
+    assert scene.views[0].get('fov') == 35
+    assert 'fov' not in scene.views[1]
+    assert scene.active == 1
+
+
+def test_rename_then_old_name(address, tick, scene):
+    replies = client.send([
+        {'cmd': 'set_view', 'view': "A", 'name': "Front"},
+        {'cmd': 'set_view', 'view': "A", 'fov': 80},
+    ], address)
+    assert replies[0]['ok']
+    # the second command runs after the rename, its old name is gone
+    assert not replies[1]['ok']
+    assert 'fov' not in scene.views[0]
+
+
+def test_matrix_then_rotation_keeps_order(address, tick, scene):
+    client.send([
+        {'cmd': 'set_view', 'view': 0, 'matrix': "M"},
+        {'cmd': 'set_view', 'view': 0, 'rotation': [0, 0, 90]},
+    ], address)
+    # the matrix was written before the rotation changed
+    assert scene.views[0]['matrix_rotation'] is None
+    assert scene.views[0]['rotation'] == [0, 0, 90]
+
+
+def test_bad_input(address, tick):
+    replies = client.send([{'cmd': 'ping'}, ["not", "a", "command"], {'name': "no cmd"}], address)
+    assert replies[0]['ok']
+    assert not replies[1]['ok'] and not replies[2]['ok']
+    assert "cmd" in replies[1]['error']
+
+
+def test_invalid_json(address, tick):
+    with client.Client(address, client.family(address)) as conn:
+        conn.send_bytes(b"{not json")
+        reply = conn.recv_bytes()
+    assert b"Invalid json" in reply
+
+
+def test_reply_timeout_drops_command(address, monkeypatch):
+    # no tick: blender busy, the client gets an error instead of hanging and the command is dropped
+    monkeypatch.setattr(listener, "REPLY_TIMEOUT", 0.2)
+    reply = client.send({'cmd': 'ping'}, address)
+    assert not reply['ok']
+    assert "did not answer" in reply['error']
+    assert listener.take(64) == []
+
+
+def test_stop_answers_waiting_clients(address):
+    replies = []
+    thread = threading.Thread(target=lambda: replies.append(client.send({'cmd': 'ping'}, address)))
+    thread.start()
+    # wait until the command is queued
+    while listener._queue.empty():
+        time.sleep(0.01)
+    listener.stop()
+    thread.join(5)
+    assert replies == [{'ok': False, 'error': "Server stopped"}]